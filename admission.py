@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+"""
+Healthcare Fraud Detection - Admission Control
+Per-endpoint concurrency limits with bounded FIFO queues and queue deadlines, so
+the scoring service sheds load with 429/503 + Retry-After instead of timing out
+"""
+
+import asyncio
+import math
+import os
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+
+from fastapi import HTTPException
+
+# Endpoint -> (max concurrent requests, max queued requests, max seconds queued)
+DEFAULT_LIMITS = {
+    'predict': (8, 64, 2.0),
+    'bulk': (2, 4, 10.0),
+}
+
+
+class EndpointGate:
+    """Concurrency slots and a bounded wait queue for one endpoint.
+
+    All state is touched from the event loop thread only, so no locking is needed.
+    A released slot is handed straight to the oldest live waiter.
+    """
+
+    def __init__(self, name, max_concurrent, max_queue, queue_timeout):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+
+        self.in_flight = 0
+        self.admitted = 0
+        self.rejected_queue_full = 0
+        self.rejected_timeout = 0
+        self.avg_service_time = 0.0
+        self._waiters = deque()
+
+    @property
+    def queue_depth(self):
+        return sum(1 for waiter in self._waiters if not waiter.done())
+
+    def retry_after(self):
+        """Seconds until a slot is likely free, from the smoothed service time"""
+        backlog = self.queue_depth + 1
+        estimate = self.avg_service_time * backlog / self.max_concurrent
+        return max(1, math.ceil(estimate))
+
+    def _reject(self, status_code, detail):
+        raise HTTPException(status_code=status_code, detail=detail,
+                            headers={'Retry-After': str(self.retry_after())})
+
+    async def acquire(self):
+        if self.in_flight < self.max_concurrent and not self.queue_depth:
+            self.in_flight += 1
+            self.admitted += 1
+            return
+
+        if self.queue_depth >= self.max_queue:
+            self.rejected_queue_full += 1
+            self._reject(429, f"Too many pending '{self.name}' requests")
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(waiter, timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            # The slot may have been handed over just as the deadline hit
+            if not (waiter.done() and not waiter.cancelled()):
+                self.rejected_timeout += 1
+                self._reject(503, f"Timed out waiting for '{self.name}' capacity")
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            raise
+        finally:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+        self.admitted += 1
+
+    def release(self, service_time=None):
+        if service_time is not None:
+            # Exponentially weighted so Retry-After tracks current load
+            self.avg_service_time = 0.8 * self.avg_service_time + 0.2 * service_time
+
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(True)
+                return
+        self.in_flight -= 1
+
+    def stats(self):
+        return {
+            'in_flight': self.in_flight,
+            'queue_depth': self.queue_depth,
+            'max_concurrent': self.max_concurrent,
+            'max_queue': self.max_queue,
+            'queue_timeout': self.queue_timeout,
+            'admitted': self.admitted,
+            'rejected_queue_full': self.rejected_queue_full,
+            'rejected_timeout': self.rejected_timeout,
+            'avg_service_ms': self.avg_service_time * 1000,
+        }
+
+
+class AdmissionController:
+    """Admission gates for each scoring endpoint"""
+
+    def __init__(self, limits=None):
+        limits = limits or DEFAULT_LIMITS
+        self.gates = {name: EndpointGate(name, *limit) for name, limit in limits.items()}
+
+    @classmethod
+    def from_env(cls, defaults=None):
+        """Defaults overridable per endpoint, e.g. FRAUD_BULK_MAX_CONCURRENT=4"""
+        limits = {}
+        for name, (concurrent, queued, timeout) in (defaults or DEFAULT_LIMITS).items():
+            prefix = f'FRAUD_{name.upper()}_'
+            limits[name] = (
+                int(os.environ.get(f'{prefix}MAX_CONCURRENT', concurrent)),
+                int(os.environ.get(f'{prefix}MAX_QUEUE', queued)),
+                float(os.environ.get(f'{prefix}QUEUE_TIMEOUT', timeout)),
+            )
+        return cls(limits)
+
+    @asynccontextmanager
+    async def slot(self, name):
+        """Hold one concurrency slot of an endpoint for the duration of the block"""
+        gate = self.gates[name]
+        await gate.acquire()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            gate.release(time.perf_counter() - start)
+
+    def stats(self):
+        return {name: gate.stats() for name, gate in self.gates.items()}
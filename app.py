@@ -1,9 +1,22 @@
-from fastapi import FastAPI
+import runtime_config
+
+# Split the cores between scoring workers, model threads and BLAS before numpy loads
+THREAD_BUDGET = runtime_config.configure('serving')
+
+from fastapi import FastAPI, Header, HTTPException, Query, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-from typing import List
-import pickle
-import pandas as pd
+from fastapi.responses import PlainTextResponse
+from pydantic import BaseModel, Field
+from typing import Dict, List, Optional
+import os
+import numpy as np
+
+import request_profiler
+from admission import AdmissionController
+from explainers import input_mean, make_explainer
+from model_registry import ModelRegistry
+from provider_index import INDEX_PATH, ProviderIndex
+from scheduler import PriorityScheduler
 
 app = FastAPI(title="Healthcare Fraud Detection API", description="API for predicting healthcare fraud with SHAP explainability")
 
@@ -16,13 +29,29 @@ app.add_middleware(
     allow_headers=["*"],  # Allows all headers
 )
 
-# Load the best model
-with open('./models/best_model.pkl', 'rb') as f:
-    model = pickle.load(f)
+# Load the model registry; the primary model serves traffic, challengers are shadow-scored
+registry = ModelRegistry.from_config()
+model = runtime_config.set_model_threads(registry.primary.model, THREAD_BUDGET.model_threads)
+
+# Cheapest exact explainer for the primary model; a pickled SHAP explainer built for
+# this exact model artifact is the last resort
+explainer = make_explainer(model, registry.primary.feature_names,
+                           background_mean=input_mean(registry.primary.transformer),
+                           model_path=registry.primary.path)
+
+# Per-endpoint concurrency limits and bounded queues; overload fails fast with 429/503
+admission = AdmissionController.from_env()
+
+# Interactive checks run ahead of bulk slices; bulk tenants share capacity by weight
+scheduler = PriorityScheduler.from_env(workers=THREAD_BUDGET.scheduler_workers)
+BULK_SLICE_SIZE = int(os.environ.get('FRAUD_BULK_SLICE_SIZE', 64))
 
-# Load SHAP explainer
-with open('./models/shap_explainer.pkl', 'rb') as f:
-    explainer = pickle.load(f)
+# Similar-provider search for investigators; available once provider_index.py has built it.
+# Each uvicorn worker holds its own copy, so with several workers the index is read-only
+# here and updated offline (provider_index.py, batch_score.py --index) instead
+provider_index = ProviderIndex.load(INDEX_PATH) if os.path.exists(INDEX_PATH) else None
+PROVIDER_INDEX_WRITABLE = THREAD_BUDGET.uvicorn_workers == 1
+MAX_SIMILAR_PROVIDERS = 100
 
 # Define input model based on aggregated features
 class PredictionInput(BaseModel):
@@ -37,54 +66,236 @@ class PredictionInput(BaseModel):
     OPAnnualReimbursementAmt: float
     OPAnnualDeductibleAmt: float
 
+class SimilarProvidersQuery(BaseModel):
+    features: Dict[str, float]
+    k: int = Field(10, ge=1, le=MAX_SIMILAR_PROVIDERS)
+    label: Optional[str] = 'Yes'
+
+class IndexedProvider(BaseModel):
+    provider: str
+    features: Dict[str, float]
+    label: Optional[str] = None
+    probability: Optional[float] = None
+
+LIVE_FIELDS = list(PredictionInput.__fields__)
+
+# SHAP entries that move less than this between live updates are not resent
+LIVE_SHAP_TOLERANCE = float(os.environ.get('FRAUD_LIVE_SHAP_TOLERANCE', 1e-6))
+
+def start_profile(endpoint, profile, admin_token):
+    # Profiling is opt-in per request; unprofiled requests only pay for this check
+    if not profile:
+        return None
+    if not request_profiler.is_authorized(admin_token):
+        raise HTTPException(status_code=403, detail="Profiling requires a valid admin token")
+    try:
+        return request_profiler.RequestProfile(endpoint)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
 @app.post("/predict")
-def predict(input_data: PredictionInput):
-    # Convert to DataFrame
-    data = pd.DataFrame([input_data.dict()])
+async def predict(input_data: PredictionInput, profile: bool = False,
+                  x_admin_token: Optional[str] = Header(default=None)):
+    async with admission.slot("predict"):
+        profiler = start_profile("predict", profile, x_admin_token)
+        if profiler is None:
+            return await scheduler.run_interactive(score_single, input_data)
+
+        try:
+            result = await scheduler.run_interactive(profiler.wrap(score_single), input_data)
+        finally:
+            profile_summary = profiler.finish()
+        return dict(result, profile=profile_summary)
+
+@app.post("/bulk")
+async def predict_bulk(providers: List[PredictionInput], profile: bool = False,
+                       x_tenant: str = Header(default='default'),
+                       x_admin_token: Optional[str] = Header(default=None)):
+    async with admission.slot("bulk"):
+        records = [provider.dict() for provider in providers]
+        slices = [records[i:i + BULK_SLICE_SIZE] for i in range(0, len(records), BULK_SLICE_SIZE)]
+        # Nothing may run between taking the profiling lock and the try that releases it
+        profiler = start_profile("bulk", profile, x_admin_token)
+        if profiler is None:
+            return bulk_response(await scheduler.run_bulk(x_tenant, score_slice, slices))
+
+        try:
+            parts = await scheduler.run_bulk(x_tenant, profiler.wrap(score_slice), slices)
+            result = bulk_response(parts)
+        finally:
+            profile_summary = profiler.finish()
+        return dict(result, profile=profile_summary)
+
+@app.get("/admin/profiles/{profile_id}", response_class=PlainTextResponse)
+def get_profile(profile_id: str, x_admin_token: Optional[str] = Header(default=None)):
+    if not request_profiler.is_authorized(x_admin_token):
+        raise HTTPException(status_code=403, detail="Admin token required")
+    folded = request_profiler.load_folded(profile_id)
+    if folded is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return folded
+
+def parse_live_update(fields):
+    # Coerce a partial update from the live channel, rejecting fields the model does not take
+    if not isinstance(fields, dict):
+        raise ValueError("'set' must be an object of field values")
+    unknown = [name for name in fields if name not in LIVE_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    try:
+        values = {name: float(value) for name, value in fields.items()}
+    except (TypeError, ValueError):
+        raise ValueError("Field values must be numbers")
+    # float() accepts "nan" and "inf", which the model cannot score
+    non_finite = [name for name, value in values.items() if not np.isfinite(value)]
+    if non_finite:
+        raise ValueError(f"Field values must be finite: {', '.join(non_finite)}")
+    return values
+
+@app.websocket("/ws/live")
+async def live_check(websocket: WebSocket):
+    # One session per open check page: the schema goes out once, then each message
+    # carries only the changed fields and gets back the score and the SHAP entries that moved
+    await websocket.accept()
+    await websocket.send_json({
+        "type": "schema",
+        "fields": LIVE_FIELDS,
+        "feature_names": registry.primary.feature_names,
+    })
+
+    values = {}
+    last_shap = None
+    last_base = None
+    try:
+        while True:
+            try:
+                message = await websocket.receive_json()
+            except ValueError:
+                message = None
+            if not isinstance(message, dict):
+                # Invalid JSON and valid JSON that is not an object get the same reply
+                await websocket.send_json({"type": "error", "status": 400,
+                                           "detail": "Messages must be JSON objects"})
+                continue
+            request_id = message.get("id")
+
+            if message.get("type") == "reset":
+                values, last_shap, last_base = {}, None, None
+                await websocket.send_json({"type": "reset", "id": request_id})
+                continue
+
+            try:
+                values.update(parse_live_update(message.get("set") or {}))
+            except ValueError as e:
+                await websocket.send_json({"type": "error", "id": request_id, "status": 422, "detail": str(e)})
+                continue
+
+            missing = [name for name in LIVE_FIELDS if name not in values]
+            if missing:
+                await websocket.send_json({"type": "pending", "id": request_id, "missing": missing})
+                continue
+
+            try:
+                async with admission.slot("predict"):
+                    result = await scheduler.run_interactive(score_single, PredictionInput(**values))
+            except HTTPException as e:
+                await websocket.send_json({
+                    "type": "error",
+                    "id": request_id,
+                    "status": e.status_code,
+                    "detail": e.detail,
+                    "retry_after": int((e.headers or {}).get('Retry-After', 1)),
+                })
+                continue
+            except Exception as e:
+                # A message that fails to score must not end the session
+                await websocket.send_json({"type": "error", "id": request_id, "status": 500,
+                                           "detail": f"Scoring failed: {e}"})
+                continue
+
+            # Send only the SHAP entries that changed since the last score on this session
+            shap_values = np.asarray(result["shap_values"], dtype=float)
+            if last_shap is None or last_shap.shape != shap_values.shape:
+                changed = np.arange(len(shap_values))
+            else:
+                changed = np.flatnonzero(np.abs(shap_values - last_shap) > LIVE_SHAP_TOLERANCE)
+            last_shap = shap_values
+
+            response = {
+                "type": "score",
+                "id": request_id,
+                "prediction": result["prediction"],
+                "probability": result["probability"],
+                "shap_updates": [[int(i), float(shap_values[i])] for i in changed],
+            }
+            if result["base_value"] != last_base:
+                response["base_value"] = last_base = result["base_value"]
+            await websocket.send_json(response)
+    except WebSocketDisconnect:
+        pass
+
+def score_single(input_data: PredictionInput):
+    # Build the model matrix directly from the request, in the model's feature order
+    records = [input_data.dict()]
+    data = registry.primary.transform(records)
 
     # Make prediction
     prediction = model.predict(data)[0]
     probability = model.predict_proba(data)[0][1]
 
+    # Score challengers in the background
+    registry.shadow(records, [probability])
+
     # SHAP explanation
-    shap_values = explainer(data)
+    attributions = explainer.explain(data)
 
     # Return result
     return {
         "prediction": int(prediction),
         "probability": float(probability),
-        "shap_values": shap_values.values.tolist()[0],  # For the single sample
-        "base_value": float(shap_values.base_values[0]),
-        "feature_names": data.columns.tolist()
+        "shap_values": attributions.values[0].tolist(),  # For the single sample
+        "base_value": float(attributions.base_values[0]),
+        "feature_names": registry.primary.feature_names,
+        "explanation_method": attributions.method,
     }
 
-@app.post("/bulk")
-def predict_bulk(providers: List[PredictionInput]):
-    # Convert list of providers to DataFrame
-    data = pd.DataFrame([provider.dict() for provider in providers])
+def score_slice(records):
+    # Build the model matrix directly from the request, in the model's feature order
+    data = registry.primary.transform(records)
     
     # Make predictions
     predictions = model.predict(data)
     probabilities = model.predict_proba(data)[:, 1]
+
+    # Score challengers in the background
+    registry.shadow(records, probabilities)
     
-    # SHAP explanations for all providers
-    shap_values = explainer(data)
+    # SHAP explanations for this slice
+    attributions = explainer.explain(data)
+    return predictions, probabilities, attributions.values, attributions.base_values
+
+def bulk_response(parts):
+    # Stitch the slices back together in request order
+    predictions = np.concatenate([part[0] for part in parts]) if parts else np.empty(0)
+    probabilities = np.concatenate([part[1] for part in parts]) if parts else np.empty(0)
+    shap_values = np.concatenate([part[2] for part in parts]) if parts else np.empty((0, 0))
+    base_values = np.concatenate([np.ravel(part[3]) for part in parts]) if parts else np.empty(0)
     
     # Prepare results
     results = []
-    for i in range(len(providers)):
+    for i in range(len(predictions)):
         results.append({
             "provider_index": i,
             "prediction": int(predictions[i]),
             "probability": float(probabilities[i]),
-            "shap_values": shap_values.values[i].tolist(),
-            "base_value": float(shap_values.base_values[i]),
+            "shap_values": shap_values[i].tolist(),
+            "base_value": float(base_values[i]),
         })
     
     # Summary statistics
     fraud_count = sum(predictions)
     total_count = len(predictions)
-    avg_probability = float(probabilities.mean())
+    avg_probability = float(probabilities.mean()) if total_count > 0 else 0.0
     
     return {
         "results": results,
@@ -94,13 +305,86 @@ def predict_bulk(providers: List[PredictionInput]):
             "fraud_rate": float(fraud_count / total_count) if total_count > 0 else 0,
             "average_probability": avg_probability,
         },
-        "feature_names": data.columns.tolist()
+        "feature_names": registry.primary.feature_names,
+        "explanation_method": explainer.method,
     }
 
+def require_index():
+    if provider_index is None:
+        raise HTTPException(status_code=503, detail="Similar-provider index not built; run provider_index.py")
+    return provider_index
+
+@app.get("/providers/{provider_id}/similar")
+def similar_providers(provider_id: str, k: int = Query(10, ge=1, le=MAX_SIMILAR_PROVIDERS),
+                      label: Optional[str] = 'Yes'):
+    # label=Yes returns confirmed fraud providers only; label=any searches every provider
+    neighbours = require_index().similar_to(provider_id, k=k, label=None if label == 'any' else label)
+    if neighbours is None:
+        raise HTTPException(status_code=404, detail=f"Provider {provider_id} is not indexed")
+    return {"provider": provider_id, "neighbours": neighbours}
+
+@app.post("/providers/similar")
+def similar_to_features(query: SimilarProvidersQuery):
+    label = None if query.label == 'any' else query.label
+    neighbours = require_index().search_features([query.features], k=query.k, label=label)[0]
+    return {"neighbours": neighbours}
+
+@app.post("/providers/index")
+def index_providers(providers: List[IndexedProvider], x_admin_token: Optional[str] = Header(default=None)):
+    # Newly scored or newly confirmed providers join the index without a rebuild
+    if not request_profiler.is_authorized(x_admin_token):
+        raise HTTPException(status_code=403, detail="Admin token required")
+    index = require_index()
+    if not PROVIDER_INDEX_WRITABLE:
+        raise HTTPException(status_code=409, detail="The index is read-only with several uvicorn workers; "
+                                                    "update it with provider_index.py or batch_score.py --index")
+    added = index.add([provider.features for provider in providers],
+                      providers=[provider.provider for provider in providers],
+                      labels=[provider.label for provider in providers],
+                      probabilities=[np.nan if provider.probability is None else provider.probability
+                                     for provider in providers])
+    return {"added": added, "updated": len(providers) - added, "index": index.stats()}
+
+@app.get("/providers/index/stats")
+def provider_index_stats():
+    return require_index().stats()
+
+@app.get("/admission/stats")
+def admission_stats():
+    return admission.stats()
+
+@app.get("/scheduler/stats")
+def scheduler_stats():
+    return scheduler.stats()
+
+@app.get("/shadow/stats")
+def shadow_stats():
+    return registry.stats()
+
+@app.on_event("startup")
+def limit_threadpool():
+    # Scoring runs on the scheduler; Starlette's pool only serves the light sync endpoints
+    from anyio import to_thread
+    to_thread.current_default_thread_limiter().total_tokens = THREAD_BUDGET.starlette_threads
+
+@app.get("/runtime/budget")
+def runtime_budget():
+    return THREAD_BUDGET.as_dict()
+
+@app.on_event("shutdown")
+def shutdown():
+    scheduler.close()
+    registry.close()
+    if provider_index is not None and provider_index.modified:
+        provider_index.save(INDEX_PATH)
+
 @app.get("/")
 def read_root():
     return {"message": "Healthcare Fraud Detection API is running"}
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
+    if THREAD_BUDGET.uvicorn_workers > 1:
+        uvicorn.run("app:app", host="0.0.0.0", port=8000, workers=THREAD_BUDGET.uvicorn_workers)
+    else:
+        uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
@@ -0,0 +1,213 @@
+# -*- coding: utf-8 -*-
+"""
+Healthcare Fraud Detection - Offline Batch Scoring
+Streams provider features through the trained optimal model in chunks, using a
+process pool, and writes predictions incrementally so large runs can resume
+"""
+
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from feature_binning import BinnedModel
+from feature_transformer import ProviderFeatureTransformer
+from provider_index import ProviderIndex
+from runtime_config import available_cpus
+
+# Model data loaded once per worker process by the pool initializer
+_model_data = None
+
+
+def load_model_data(model_path, binned=False):
+    """Load the model and fitted feature transformer saved by optimal_model.py.
+
+    With binned=True the tree model is also compiled to lookup tables over
+    split-point bin codes, and chunks are scored from the codes.
+    """
+    model_data = joblib.load(model_path)
+    if 'transformer' not in model_data:
+        # Artifacts from before the transformer was saved only carry a scaler
+        model_data['transformer'] = ProviderFeatureTransformer.from_legacy(
+            model_data['feature_names'], model_data.get('scaler'))
+    model = model_data['model']
+    # Each worker process scores its own chunk; avoid nested thread pools
+    if hasattr(model, 'n_jobs'):
+        model.set_params(n_jobs=1)
+    if binned:
+        model_data['binned'] = BinnedModel.from_model(model, len(model_data['transformer'].feature_names))
+    return model_data
+
+
+def score_providers(model_data, features):
+    """Score a provider feature frame and return it in fraud_predictions.csv layout"""
+    X = model_data['transformer'].transform(features)
+    if 'binned' in model_data:
+        probabilities = model_data['binned'].predict_proba(X)[:, 1]
+    else:
+        probabilities = model_data['model'].predict_proba(X)[:, 1]
+
+    return pd.DataFrame({
+        'Provider': features['Provider'].values,
+        'PotentialFraud': np.where(probabilities >= 0.5, 'Yes', 'No'),
+        'FraudProbability': probabilities,
+    })
+
+
+def _init_worker(model_path, binned=False):
+    global _model_data
+    _model_data = load_model_data(model_path, binned)
+
+
+def _score_chunk(index, chunk):
+    return index, score_providers(_model_data, chunk)
+
+
+class ChunkWriter:
+    """Appends scored chunks to a CSV file or a directory of Parquet parts.
+
+    Progress is checkpointed after every chunk so an interrupted run can resume.
+    For CSV the checkpoint also records the file size, and a partially written
+    chunk is truncated away on resume.
+    """
+
+    def __init__(self, output_path, resume=True):
+        self.output_path = output_path
+        self.parquet = output_path.endswith('.parquet')
+        self.progress_path = f'{output_path}.progress.json'
+        self.chunks_done = 0
+        self.rows_done = 0
+        self.bytes_done = 0
+
+        if resume and os.path.exists(self.progress_path):
+            with open(self.progress_path) as f:
+                progress = json.load(f)
+            self.chunks_done = progress['chunks_done']
+            self.rows_done = progress['rows_done']
+            self.bytes_done = progress.get('bytes_done', 0)
+            if not self.parquet and os.path.exists(output_path):
+                with open(output_path, 'r+b') as f:
+                    f.truncate(self.bytes_done)
+        elif not self.parquet and os.path.exists(output_path):
+            os.remove(output_path)
+
+        if self.parquet:
+            os.makedirs(output_path, exist_ok=True)
+
+    def write(self, predictions):
+        if self.parquet:
+            part_path = os.path.join(self.output_path, f'part-{self.chunks_done:05d}.parquet')
+            predictions.to_parquet(part_path, index=False)
+        else:
+            predictions.to_csv(self.output_path, mode='a', index=False,
+                               header=self.chunks_done == 0)
+            self.bytes_done = os.path.getsize(self.output_path)
+
+        self.chunks_done += 1
+        self.rows_done += len(predictions)
+
+        tmp_path = f'{self.progress_path}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump({'chunks_done': self.chunks_done, 'rows_done': self.rows_done,
+                       'bytes_done': self.bytes_done}, f)
+        os.replace(tmp_path, self.progress_path)
+
+
+def score_file(input_path, output_path, model_path='optimal_fraud_model.pkl',
+               chunksize=50000, workers=None, resume=True, index_path=None, binned=False):
+    """Score a provider feature CSV chunk by chunk and write predictions incrementally.
+
+    With index_path, every scored provider is also added to that similar-provider
+    index. The index is saved before each chunk's progress checkpoint, so a
+    resumed run never skips providers that are missing from it. binned=True
+    scores tree models from split-point bin codes (see feature_binning.py).
+    """
+    workers = workers or available_cpus()
+    writer = ChunkWriter(output_path, resume=resume)
+    index = ProviderIndex.load(index_path) if index_path else None
+
+    if writer.rows_done:
+        print(f"Resuming after chunk {writer.chunks_done} ({writer.rows_done} rows already scored)")
+
+    # Skip rows that were already scored without parsing them into frames
+    reader = pd.read_csv(input_path, chunksize=chunksize,
+                         skiprows=range(1, writer.rows_done + 1))
+
+    start = time.perf_counter()
+    rows_scored = 0
+    max_in_flight = workers * 2
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(model_path, binned)) as pool:
+        pending = {}
+        next_index = writer.chunks_done
+        submit_index = writer.chunks_done
+        exhausted = False
+
+        while not exhausted or pending:
+            # Keep a bounded number of chunks in flight to cap memory use
+            while not exhausted and len(pending) < max_in_flight:
+                chunk = next(reader, None)
+                if chunk is None:
+                    exhausted = True
+                    break
+                pending[submit_index] = (chunk if index is not None else None,
+                                         pool.submit(_score_chunk, submit_index, chunk))
+                submit_index += 1
+
+            if not pending:
+                break
+
+            # Write chunks strictly in input order
+            chunk, future = pending.pop(next_index)
+            _, predictions = future.result()
+            if index is not None:
+                # Labels come from a PotentialFraud column when present; providers
+                # without one keep the label they already have in the index.
+                # Save before the checkpoint: re-adding a chunk after a crash is harmless,
+                # skipping one is not
+                index.add(chunk, probabilities=predictions['FraudProbability'].to_numpy())
+                index.save(index_path)
+            writer.write(predictions)
+            next_index += 1
+            rows_scored += len(predictions)
+
+            elapsed = time.perf_counter() - start
+            print(f"Chunk {writer.chunks_done}: {writer.rows_done} rows total, "
+                  f"{rows_scored / elapsed:,.0f} rows/s")
+
+    elapsed = time.perf_counter() - start
+    rate = rows_scored / elapsed if elapsed > 0 else 0.0
+    print(f"\nScored {rows_scored} rows in {elapsed:.1f}s ({rate:,.0f} rows/s)")
+    print(f"Predictions written to {output_path}")
+    if index is not None:
+        print(f"Similar-provider index updated: {index.stats()['providers']} providers in {index_path}")
+
+    return {'rows_scored': rows_scored, 'seconds': elapsed, 'rows_per_second': rate}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Batch-score provider features with the optimal fraud model')
+    parser.add_argument('input', help='CSV of provider features (as produced by create_provider_features)')
+    parser.add_argument('output', help='Output .csv file or .parquet directory')
+    parser.add_argument('--model', default='optimal_fraud_model.pkl', help='Path to the saved model data')
+    parser.add_argument('--chunksize', type=int, default=50000, help='Rows per chunk')
+    parser.add_argument('--workers', type=int, default=None, help='Worker processes (default: usable CPUs)')
+    parser.add_argument('--no-resume', action='store_true', help='Start over instead of resuming')
+    parser.add_argument('--index', default=None,
+                        help='Similar-provider index to add the scored providers to')
+    parser.add_argument('--binned', action='store_true',
+                        help='Score tree models from split-point bin codes via lookup tables')
+    args = parser.parse_args()
+
+    score_file(args.input, args.output, model_path=args.model, chunksize=args.chunksize,
+               workers=args.workers, resume=not args.no_resume, index_path=args.index, binned=args.binned)
+
+
+if __name__ == "__main__":
+    main()
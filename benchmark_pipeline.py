@@ -0,0 +1,213 @@
+# -*- coding: utf-8 -*-
+"""
+Healthcare Fraud Detection - Training Pipeline Scaling Benchmark
+Runs each stage of the provider-level training pipeline on synthetic data at
+several sizes and records wall time and peak RSS per stage to JSON. Each scale
+runs in its own process so memory from one size never inflates the next. Pass
+--baseline to flag stages that got slower or bigger than a previous run.
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import synthetic_data
+
+DEFAULT_SCALES = [1, 10, 100]
+DEFAULT_DATA_ROOT = './synthetic'
+
+
+def current_rss_mb():
+    """Resident memory right now, from /proc on Linux or the peak elsewhere"""
+    try:
+        with open('/proc/self/statm') as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf('SC_PAGE_SIZE') / 1024 ** 2
+    except (OSError, ValueError, IndexError):
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 1024 ** 2 if sys.platform == 'darwin' else peak / 1024
+
+
+class StageMeter:
+    """Wall time and sampled peak RSS of the code inside a with-block"""
+
+    def __init__(self, name, results, interval=0.01):
+        self.name = name
+        self.results = results
+        self.interval = interval
+        self._stop = threading.Event()
+        self._peak = 0.0
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            self._peak = max(self._peak, current_rss_mb())
+
+    def __enter__(self):
+        self._start_rss = self._peak = current_rss_mb()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        self._start = time.perf_counter()
+        print(f"  {self.name}...", flush=True)
+        return self
+
+    def __exit__(self, *exc):
+        wall = time.perf_counter() - self._start
+        self._stop.set()
+        self._thread.join()
+        end_rss = current_rss_mb()
+        self._peak = max(self._peak, end_rss)
+        self.results.append({
+            'stage': self.name,
+            'wall_seconds': wall,
+            'peak_rss_mb': self._peak,
+            'start_rss_mb': self._start_rss,
+            'end_rss_mb': end_rss,
+        })
+        print(f"    {wall:.2f}s, peak RSS {self._peak:.0f} MB", flush=True)
+
+
+def ensure_data(data_dir, scale, seed=42):
+    """Generate the synthetic CSVs for a scale unless they are already there"""
+    names = [name for files in synthetic_data.SPLIT_FILES.values() for name in files.values()]
+    if all(os.path.exists(os.path.join(data_dir, name)) for name in names):
+        return 0.0
+    start = time.perf_counter()
+    synthetic_data.generate(data_dir, scale, seed)
+    return time.perf_counter() - start
+
+
+def run_scale(data_dir):
+    """Run every pipeline stage once on one data directory; returns per-stage measurements"""
+    import numpy as np
+    import optimal_model
+    from sklearn.ensemble import RandomForestClassifier
+
+    stages = []
+    with StageMeter('load', stages):
+        train = optimal_model.load_split('train', data_dir)
+        test = optimal_model.load_split('test', data_dir)
+    rows = {'train_claims': int(len(train[2]) + len(train[3])),
+            'test_claims': int(len(test[2]) + len(test[3])),
+            'train_providers': int(len(train[0]))}
+
+    with StageMeter('merge_aggregate', stages):
+        train_features = optimal_model.create_provider_features(*train)
+        test_features = optimal_model.create_provider_features(*test)
+    del train, test
+
+    with StageMeter('prepare', stages):
+        X_train, y_train, X_test, feature_cols, transformer = optimal_model.prepare_features(
+            train_features, test_features)
+    y_train = np.asarray(y_train)
+
+    with StageMeter('smote', stages):
+        try:
+            from imblearn.over_sampling import SMOTE
+            X_fit, y_fit = SMOTE(random_state=42).fit_resample(X_train, y_train)
+        except ImportError:
+            print("    imbalanced-learn not available, skipping SMOTE")
+            X_fit, y_fit = X_train, y_train
+
+    with StageMeter('fit', stages):
+        # Same forest as evaluate_models, fitted once instead of per CV fold
+        model = RandomForestClassifier(n_estimators=200, max_depth=10, min_samples_split=10,
+                                       random_state=42, n_jobs=optimal_model.THREAD_BUDGET.model_threads)
+        model.fit(X_fit, y_fit)
+
+    rows['features'] = len(feature_cols)
+    return {'rows': rows, 'stages': stages}
+
+
+def _run_in_subprocess(data_dir):
+    """Run one scale in a fresh interpreter and return its measurements"""
+    output = subprocess.run([sys.executable, __file__, '--single', data_dir],
+                            check=True, stdout=subprocess.PIPE, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def compare(results, baseline, tolerance=0.25):
+    """Stages whose wall time or peak RSS grew more than `tolerance` over the baseline"""
+    previous = {(run['scale'], stage['stage']): stage
+                for run in baseline['runs'] for stage in run['stages']}
+    regressions = []
+    for run in results['runs']:
+        for stage in run['stages']:
+            before = previous.get((run['scale'], stage['stage']))
+            if before is None:
+                continue
+            for metric in ('wall_seconds', 'peak_rss_mb'):
+                if before[metric] > 0 and stage[metric] > before[metric] * (1 + tolerance):
+                    regressions.append({
+                        'scale': run['scale'], 'stage': stage['stage'], 'metric': metric,
+                        'baseline': before[metric], 'current': stage[metric],
+                    })
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure how each training stage scales with data size')
+    parser.add_argument('--scales', type=float, nargs='+', default=DEFAULT_SCALES,
+                        help='Multiples of the original data size')
+    parser.add_argument('--data-root', default=DEFAULT_DATA_ROOT, help='Where synthetic data is kept')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', default=None, help='Results JSON (default: benchmarks/pipeline-<time>.json)')
+    parser.add_argument('--baseline', default=None, help='Earlier results to check for regressions')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='Allowed relative growth over the baseline')
+    parser.add_argument('--single', default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.single:
+        # Child process: progress goes to stderr, the last stdout line is the result
+        sys.stdout, real_stdout = sys.stderr, sys.stdout
+        result = run_scale(args.single)
+        real_stdout.write(json.dumps(result) + '\n')
+        return result
+
+    import runtime_config
+    results = {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': sys.version.split()[0],
+        'cpus': runtime_config.available_cpus(),
+        'seed': args.seed,
+        'runs': [],
+    }
+    for scale in args.scales:
+        data_dir = os.path.join(args.data_root, f'{scale:g}x')
+        print(f"\n=== Scale {scale:g}x ({data_dir}) ===")
+        generate_seconds = ensure_data(data_dir, scale, args.seed)
+        run = _run_in_subprocess(data_dir)
+        results['runs'].append(dict(run, scale=scale, generate_seconds=generate_seconds))
+
+    output = args.output or os.path.join('benchmarks', f"pipeline-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            results['regressions'] = compare(results, json.load(f), args.tolerance)
+
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2)
+
+    print("\n=== Summary ===")
+    for run in results['runs']:
+        timings = ', '.join(f"{s['stage']} {s['wall_seconds']:.1f}s/{s['peak_rss_mb']:.0f}MB"
+                            for s in run['stages'])
+        print(f"{run['scale']:g}x: {timings}")
+    print(f"Results saved to {output}")
+
+    for regression in results.get('regressions', []):
+        print(f"REGRESSION {regression['scale']:g}x {regression['stage']} {regression['metric']}: "
+              f"{regression['baseline']:.2f} -> {regression['current']:.2f}")
+    if results.get('regressions'):
+        sys.exit(1)
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+# -*- coding: utf-8 -*-
+"""
+Healthcare Fraud Detection - Explainer Factory
+Picks the cheapest exact attribution method for a loaded model. Linear models
+get closed-form coefficient x (value - background mean) attributions, tree
+ensembles get one TreeSHAP explainer that is reused for every call, and a
+generic SHAP explainer is only used for anything else. Every method returns
+the same Attributions result.
+"""
+
+import importlib.util
+import os
+import pickle
+import weakref
+
+import numpy as np
+import scipy.sparse as sp
+
+SHAP_AVAILABLE = importlib.util.find_spec('shap') is not None
+
+# Pickled generic explainers and the model artifact each was built for; one is
+# only valid for that exact model
+PICKLED_EXPLAINERS = {
+    './models/best_model.pkl': './models/shap_explainer.pkl',
+}
+
+
+class Attributions:
+    """Per-feature attributions for a batch of rows, whatever method produced them"""
+
+    def __init__(self, values, base_values, feature_names, method):
+        self.values = values
+        self.base_values = base_values
+        self.feature_names = feature_names
+        self.method = method
+
+
+def _positive_class(values, base_values):
+    """Reduce shap output to the fraud class: (rows, features) values and (rows,) bases"""
+    values = np.asarray(values, dtype=np.float64)
+    base_values = np.asarray(base_values, dtype=np.float64)
+    if values.ndim == 3:
+        values = values[:, :, 1]
+    if base_values.ndim == 2:
+        base_values = base_values[:, 1]
+    return values, np.broadcast_to(base_values, (len(values),)).copy()
+
+
+def _dense(X):
+    return X.toarray() if sp.issparse(X) else np.asarray(X)
+
+
+class LinearExplainer:
+    """Exact attributions for a binary linear model in log-odds space.
+
+    For f(x) = w.x + b the contribution of feature j is w_j * (x_j - mean_j) and
+    the base value is f(mean), so each row's values add up to its log-odds.
+    """
+
+    method = 'linear'
+
+    def __init__(self, model, feature_names=None, background_mean=None):
+        self.coef = np.asarray(model.coef_, dtype=np.float64).ravel()
+        self.mean = (np.zeros_like(self.coef) if background_mean is None
+                     else np.asarray(background_mean, dtype=np.float64).ravel())
+        self.base_value = float(np.ravel(model.intercept_)[0] + self.coef @ self.mean)
+        self.feature_names = feature_names
+
+    def explain(self, X):
+        if sp.issparse(X):
+            values = X.multiply(self.coef).toarray() - self.coef * self.mean
+        else:
+            values = (np.asarray(X, dtype=np.float64) - self.mean) * self.coef
+        return Attributions(values, np.full(len(values), self.base_value), self.feature_names, self.method)
+
+
+class TreeExplainer:
+    """TreeSHAP, with the shap explainer built once for the model"""
+
+    method = 'tree'
+
+    def __init__(self, model, feature_names=None):
+        import shap
+
+        self.explainer = shap.TreeExplainer(model)
+        self.feature_names = feature_names
+
+    def explain(self, X):
+        result = self.explainer(_dense(X))
+        values, base_values = _positive_class(result.values, result.base_values)
+        return Attributions(values, base_values, self.feature_names, self.method)
+
+
+class GenericExplainer:
+    """Model-agnostic SHAP explainer; slow, so only used when nothing exact applies"""
+
+    method = 'generic'
+
+    def __init__(self, explainer, feature_names=None):
+        self.explainer = explainer
+        self.feature_names = feature_names
+
+    def explain(self, X):
+        result = self.explainer(_dense(X))
+        values, base_values = _positive_class(result.values, result.base_values)
+        return Attributions(values, base_values, self.feature_names, self.method)
+
+
+def is_linear(model):
+    """Binary linear classifier with a single coefficient row (LogisticRegression and friends)"""
+    coef = getattr(model, 'coef_', None)
+    return coef is not None and hasattr(model, 'intercept_') and np.ndim(coef) == 2 and len(coef) == 1
+
+
+def input_mean(transformer):
+    """Training mean of a transformer's model inputs, or None when it has no statistics"""
+    if transformer is None or transformer.mean is None:
+        return None
+    # Standardized inputs have zero training mean by construction
+    return np.zeros_like(transformer.mean) if transformer.scaling else transformer.mean
+
+
+def pickled_explainer_path(model_path):
+    """Pickled explainer built for the model artifact at model_path, or None"""
+    if model_path is None:
+        return None
+    model_path = os.path.abspath(model_path)
+    for built_for, path in PICKLED_EXPLAINERS.items():
+        if os.path.abspath(built_for) == model_path and os.path.exists(path):
+            return path
+    return None
+
+
+def make_explainer(model, feature_names=None, background_mean=None, background=None,
+                   model_path=None):
+    """Cheapest exact explainer for the model.
+
+    background_mean: training mean of the model inputs, the reference point for
+                     linear attributions (zeros if omitted)
+    background:      sample of model inputs for the generic explainer
+    model_path:      artifact the model was loaded from; a pickled explainer in
+                     PICKLED_EXPLAINERS is the last resort, and only for that artifact
+    """
+    if is_linear(model):
+        return LinearExplainer(model, feature_names, background_mean)
+
+    if SHAP_AVAILABLE:
+        import shap
+
+        try:
+            return TreeExplainer(model, feature_names)
+        except Exception as e:
+            # shap signals unsupported model types with plain exceptions
+            print(f"TreeSHAP does not support {type(model).__name__} ({e}); using a generic explainer")
+
+        if background is not None:
+            def fraud_probability(X):
+                return model.predict_proba(X)[:, 1]
+
+            return GenericExplainer(shap.Explainer(fraud_probability, _dense(background)), feature_names)
+
+    fallback_path = pickled_explainer_path(model_path)
+    if fallback_path is not None:
+        with open(fallback_path, 'rb') as f:
+            return GenericExplainer(pickle.load(f), feature_names)
+
+    reason = ('no background data and no pickled explainer built for this model' if SHAP_AVAILABLE
+              else 'shap is not installed')
+    raise ValueError(f"No explainer available for {type(model).__name__}: {reason}")
+
+
+# Explainers built by get_explainer, dropped together with their model
+_explainers = weakref.WeakKeyDictionary()
+
+
+def get_explainer(model, feature_names=None, **kwargs):
+    """make_explainer, cached per model object so TreeSHAP is built only once"""
+    explainer = _explainers.get(model)
+    if explainer is None:
+        explainer = _explainers[model] = make_explainer(model, feature_names, **kwargs)
+    return explainer
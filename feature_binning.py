@@ -0,0 +1,336 @@
+# -*- coding: utf-8 -*-
+"""
+Healthcare Fraud Detection - Split-Point Feature Binning
+Tree models only ever compare a feature against their own split thresholds, so
+each feature value can be replaced by the number of thresholds below it without
+changing any prediction. Codes are uint8 when every feature has at most 254
+thresholds and uint16 otherwise; the largest code is reserved for missing (NaN)
+values. BinnedModel flattens a forest, gradient boosting model or XGBoost
+booster into node lookup tables and scores all trees at once straight from the
+codes, giving the same predictions as the model. Missing values follow each
+split's learned missing direction, or are rejected for models that reject them.
+"""
+
+import argparse
+import os
+import time
+
+import numpy as np
+
+# Rows scored per block, so the (trees x rows) node matrix stays small
+BLOCK_ROWS = 4096
+
+# Threshold index of leaves: no code exceeds it, so a leaf always steps to itself
+LEAF_THRESHOLD = np.iinfo(np.int32).max
+
+
+class FeatureBinner:
+    """Maps float features to split-point bin codes.
+
+    strict=False (scikit-learn, left if x <= t): code = #thresholds < x
+    strict=True  (XGBoost, left if x < t):       code = #thresholds <= x
+    Either way a node with threshold index j sends a row left iff code <= j.
+    NaN gets ``missing_code``, the largest value of the code dtype.
+    """
+
+    def __init__(self, edges, strict=False):
+        self.edges = [np.asarray(e) for e in edges]
+        self.strict = strict
+        # One more code than thresholds per feature, plus the missing code
+        max_codes = max((len(e) for e in self.edges), default=0) + 2
+        self.dtype = np.uint8 if max_codes <= 256 else np.uint16
+        self.missing_code = np.iinfo(self.dtype).max
+
+    @property
+    def n_features(self):
+        return len(self.edges)
+
+    def transform(self, X):
+        """Bin codes for a float matrix whose columns are in model feature order"""
+        X = np.asarray(X, dtype=np.float32)
+        codes = np.empty(X.shape, dtype=self.dtype)
+        side = 'right' if self.strict else 'left'
+        for j, edges in enumerate(self.edges):
+            # Compare in the threshold dtype, exactly as the model does
+            codes[:, j] = np.searchsorted(edges, X[:, j].astype(edges.dtype), side=side)
+        codes[np.isnan(X)] = self.missing_code
+        return codes
+
+    def threshold_index(self, feature, threshold):
+        return int(np.searchsorted(self.edges[feature], threshold))
+
+
+def _sklearn_trees(model):
+    """(tree_ objects, leaf value function, link, NaN support) for the supported scikit-learn models"""
+    from sklearn.ensemble import (ExtraTreesClassifier, GradientBoostingClassifier,
+                                  RandomForestClassifier)
+    from sklearn.tree import DecisionTreeClassifier
+
+    if isinstance(model, (RandomForestClassifier, ExtraTreesClassifier, DecisionTreeClassifier)):
+        trees = [model] if isinstance(model, DecisionTreeClassifier) else model.estimators_
+        n_trees = len(trees)
+
+        def leaf_values(tree):
+            # Averaged class-1 fractions of the leaves give predict_proba directly
+            counts = tree.value[:, 0, :]
+            return counts[:, 1] / counts.sum(axis=1) / n_trees
+
+        # Trees from scikit-learn 1.3+ route NaN by each split's missing_go_to_left
+        supports_missing = all(hasattr(t.tree_, 'missing_go_to_left') for t in trees)
+        return [t.tree_ for t in trees], leaf_values, 'identity', supports_missing
+
+    if isinstance(model, GradientBoostingClassifier):
+        if model.estimators_.shape[1] != 1:
+            raise ValueError("Only binary GradientBoostingClassifier models can be binned")
+        learning_rate = model.learning_rate
+
+        def leaf_values(tree):
+            return tree.value[:, 0, 0] * learning_rate
+
+        # predict_proba rejects NaN, so the binned model does too
+        return [t.tree_ for t in model.estimators_[:, 0]], leaf_values, 'logistic', False
+
+    raise ValueError(f"{type(model).__name__} cannot be compiled to lookup tables")
+
+
+class BinnedModel:
+    """All trees of a binary tree ensemble as flat node arrays over bin codes.
+
+    Trees are stored breadth-first with each node's two children adjacent, so a
+    step down is ``child[node] + (code > threshold[node])``: three small table
+    gathers and one code gather per level, for all trees and rows at once.
+    Leaves point to themselves and never go right, so rows that reach a leaf
+    early stay put; trees are ordered deepest first so each level only steps
+    the trees that are still that deep.
+
+    The missing code is above every threshold index, so missing values go right
+    unless ``missing_left`` says otherwise; that correction costs one more gather
+    and only runs on blocks that contain missing values. ``missing_left`` is
+    None for models that reject NaN, and so does ``predict_proba``.
+
+    This is vectorized NumPy, not compiled traversal. On a few hundred rows it is
+    about 3x faster than scikit-learn forests, but against native XGBoost or
+    gradient boosting it ranges from par to about 2x slower; for those the
+    payoff is the compact table, not speed.
+    """
+
+    def __init__(self, binner, feature, threshold, child, value, roots, trees_below, link,
+                 missing_left=None, base=0.0):
+        self.binner = binner
+        self.feature = feature
+        self.threshold = threshold
+        self.child = child
+        self.value = value
+        self.missing_left = missing_left
+        self.roots = roots
+        self.trees_below = trees_below
+        self.link = link
+        self.base = base
+
+    @classmethod
+    def from_model(cls, model, n_features=None):
+        n_features = n_features or getattr(model, 'n_features_in_', None)
+        if hasattr(model, 'get_booster'):
+            binned = cls._from_xgboost(model.get_booster(), n_features)
+        else:
+            binned = cls._from_sklearn(model, n_features)
+        binned._calibrate(model, n_features)
+        return binned
+
+    @classmethod
+    def _from_sklearn(cls, model, n_features):
+        trees, leaf_values, link, supports_missing = _sklearn_trees(model)
+
+        thresholds = [[] for _ in range(n_features)]
+        for tree in trees:
+            internal = tree.children_left >= 0
+            for f, t in zip(tree.feature[internal], tree.threshold[internal]):
+                thresholds[f].append(t)
+        binner = FeatureBinner([np.unique(np.asarray(t, dtype=np.float64)) for t in thresholds])
+
+        nodes = []
+        for tree in trees:
+            missing_left = tree.missing_go_to_left.astype(bool) if supports_missing else None
+            nodes.append((tree.feature, tree.threshold, tree.children_left,
+                          tree.children_right, leaf_values(tree), missing_left))
+        return cls._flatten(binner, nodes, link)
+
+    @classmethod
+    def _from_xgboost(cls, booster, n_features):
+        frame = booster.trees_to_dataframe()
+        names = booster.feature_names or [f'f{i}' for i in range(n_features)]
+        position = {name: i for i, name in enumerate(names)}
+
+        internal = frame['Feature'] != 'Leaf'
+        thresholds = [[] for _ in range(len(names))]
+        for name, split in zip(frame.loc[internal, 'Feature'], frame.loc[internal, 'Split']):
+            thresholds[position[name]].append(split)
+        binner = FeatureBinner([np.unique(np.asarray(t, dtype=np.float32)) for t in thresholds],
+                               strict=True)
+
+        nodes = []
+        for _, tree in frame.groupby('Tree', sort=True):
+            tree = tree.sort_values('Node')
+            local = {node_id: i for i, node_id in enumerate(tree['ID'])}
+            is_leaf = (tree['Feature'] == 'Leaf').to_numpy()
+            feature = np.array([position.get(name, -2) for name in tree['Feature']])
+            threshold = tree['Split'].fillna(0).to_numpy(dtype=np.float32)
+            left = np.array([local[y] if not leaf else -1 for y, leaf in zip(tree['Yes'], is_leaf)])
+            right = np.array([local[n] if not leaf else -1 for n, leaf in zip(tree['No'], is_leaf)])
+            value = np.where(is_leaf, tree['Gain'].to_numpy(dtype=np.float64), 0.0)
+            # XGBoost learns a default direction for missing values at every split
+            missing_left = (tree['Missing'] == tree['Yes']).to_numpy() & ~is_leaf
+            nodes.append((np.where(is_leaf, -2, feature), threshold, left, right, value, missing_left))
+        return cls._flatten(binner, nodes, 'logistic')
+
+    @classmethod
+    def _flatten(cls, binner, trees, link):
+        """Renumber every tree breadth-first so each node's children are adjacent"""
+        feature, threshold, child, value, roots, depths = [], [], [], [], [], []
+        missing_left = []
+        supports_missing = all(tree[5] is not None for tree in trees)
+        for tree_feature, tree_threshold, left, right, tree_value, tree_missing_left in trees:
+            offset = len(feature)
+            roots.append(offset)
+            queue, levels = [0], [0]
+            # The queue grows while it is walked, which gives breadth-first order
+            for position, node in enumerate(queue):
+                if left[node] < 0:
+                    feature.append(0)
+                    threshold.append(LEAF_THRESHOLD)
+                    child.append(offset + position)
+                    value.append(tree_value[node])
+                    missing_left.append(False)
+                else:
+                    f = int(tree_feature[node])
+                    feature.append(f)
+                    threshold.append(binner.threshold_index(f, tree_threshold[node]))
+                    child.append(offset + len(queue))
+                    value.append(0.0)
+                    missing_left.append(bool(tree_missing_left[node]) if supports_missing else False)
+                    queue += [left[node], right[node]]
+                    levels += [levels[position] + 1] * 2
+            depths.append(max(levels))
+
+        # Deepest trees first, so level d only has to step the first trees_below[d] trees
+        order = np.argsort(depths, kind='stable')[::-1]
+        depths = np.asarray(depths)[order]
+        trees_below = [int((depths > level).sum()) for level in range(int(depths.max(initial=0)))]
+
+        return cls(binner,
+                   feature=np.asarray(feature, dtype=np.int64),
+                   threshold=np.asarray(threshold, dtype=np.int32),
+                   child=np.asarray(child, dtype=np.int64),
+                   value=np.asarray(value, dtype=np.float64),
+                   roots=np.asarray(roots, dtype=np.int64)[order],
+                   trees_below=trees_below,
+                   link=link,
+                   missing_left=np.asarray(missing_left, dtype=bool) if supports_missing else None)
+
+    def _calibrate(self, model, n_features):
+        """Recover the ensemble's constant offset (prior / base score) from one zero row"""
+        if self.link == 'identity':
+            return
+        zero = np.zeros((1, n_features), dtype=np.float32)
+        if hasattr(model, 'get_booster'):
+            margin = model.predict(zero, output_margin=True)
+        else:
+            margin = model.decision_function(zero)
+        self.base = float(np.ravel(margin)[0] - self.raw_score(self.binner.transform(zero))[0])
+
+    def raw_score(self, codes):
+        """Sum of leaf values over all trees (plus the base offset) for each row of codes"""
+        out = np.empty(len(codes), dtype=np.float64)
+        for start in range(0, len(codes), BLOCK_ROWS):
+            block = codes[start:start + BLOCK_ROWS]
+            n = len(block)
+            # Feature-major codes, so code j of row i is flat[j * n + i]
+            flat = np.ascontiguousarray(block.T).ravel()
+            offsets = self.feature * n
+            columns = np.arange(n)[None, :]
+            # (trees, rows): each tree's rows walk the same few nodes together
+            node = np.repeat(self.roots[:, None], n, axis=1)
+            missing = self.binner.missing_code if (flat == self.binner.missing_code).any() else None
+            if missing is not None and self.missing_left is None:
+                raise ValueError("Input contains NaN, which this model does not accept")
+            for active in self.trees_below:
+                step = node[:active]
+                code = flat[offsets[step] + columns]
+                right = code > self.threshold[step]
+                if missing is not None:
+                    right &= ~((code == missing) & self.missing_left[step])
+                node[:active] = self.child[step] + right
+            out[start:start + n] = self.value[node].sum(axis=0) + self.base
+        return out
+
+    def predict_proba_codes(self, codes):
+        raw = self.raw_score(codes)
+        fraud = raw if self.link == 'identity' else 1.0 / (1.0 + np.exp(-raw))
+        return np.column_stack([1.0 - fraud, fraud])
+
+    def predict_proba(self, X):
+        return self.predict_proba_codes(self.binner.transform(X))
+
+
+def save_binned_table(path, codes, providers, feature_names, binner):
+    """Store a binned feature table with the bin edges needed to interpret it"""
+    np.savez_compressed(path, codes=codes, providers=np.asarray(providers, dtype=str),
+                        feature_names=np.asarray(feature_names, dtype=str), strict=binner.strict,
+                        **{f'edges_{i}': edges for i, edges in enumerate(binner.edges)})
+
+
+def load_binned_table(path):
+    """(codes, providers, feature_names, binner) from save_binned_table"""
+    data = np.load(path)
+    feature_names = list(data['feature_names'])
+    binner = FeatureBinner([data[f'edges_{i}'] for i in range(len(feature_names))],
+                           strict=bool(data['strict']))
+    return data['codes'], list(data['providers']), feature_names, binner
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Bin provider features on model split points and verify scoring')
+    parser.add_argument('--model', default='./optimal_fraud_model.pkl', help='Tree model artifact')
+    parser.add_argument('--features', default=None,
+                        help='Provider feature CSV (default: training providers built from --data-dir)')
+    parser.add_argument('--data-dir', default='./content', help='Claim CSVs, when --features is not given')
+    parser.add_argument('--output', default='./provider_features.bins.npz', help='Binned table to write')
+    args = parser.parse_args()
+
+    import pandas as pd
+    from model_registry import load_model_version
+
+    version = load_model_version('binned', args.model)
+    if args.features:
+        features = pd.read_csv(args.features)
+    else:
+        from feature_cache import FeatureCache
+        from optimal_model import provider_feature_stage
+        features = provider_feature_stage(FeatureCache(), 'train', args.data_dir).value
+
+    X = version.transform(features)
+    binned = BinnedModel.from_model(version.model, X.shape[1])
+    codes = binned.binner.transform(X)
+
+    start = time.perf_counter()
+    expected = version.model.predict_proba(X)[:, 1]
+    model_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    actual = binned.predict_proba_codes(codes)[:, 1]
+    binned_seconds = time.perf_counter() - start
+
+    save_binned_table(args.output, codes, features['Provider'], version.feature_names, binned.binner)
+
+    float64_bytes = X.shape[0] * X.shape[1] * 8
+    print(f"Bin codes: {codes.dtype}, max {max(len(e) for e in binned.binner.edges)} thresholds per feature")
+    print(f"Feature table: {float64_bytes / 1e6:.2f} MB as float64, {codes.nbytes / 1e6:.2f} MB as codes "
+          f"({float64_bytes / codes.nbytes:.1f}x smaller)")
+    print(f"Scoring {len(codes)} rows: model {model_seconds * 1000:.1f} ms, "
+          f"lookup tables {binned_seconds * 1000:.1f} ms")
+    print(f"Max probability difference: {np.abs(expected - actual).max():.2e}; "
+          f"decisions changed: {int(((expected >= 0.5) != (actual >= 0.5)).sum())}")
+    print(f"Binned table saved to {args.output} ({os.path.getsize(args.output) / 1e6:.2f} MB on disk)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+# -*- coding: utf-8 -*-
+"""
+Healthcare Fraud Detection - Feature Stage Cache
+Memoizes pipeline stages on disk as typed columnar files. Each stage is keyed by
+the hash of its code, its parameters, the raw files it reads and the keys of the
+stages it depends on, so only stages downstream of a change are recomputed.
+"""
+
+import hashlib
+import inspect
+import json
+import os
+import shutil
+import uuid
+
+import joblib
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+
+CACHE_DIR = os.environ.get('FRAUD_FEATURE_CACHE_DIR', './.feature_cache')
+
+# Bump to invalidate every cached stage, e.g. after changing the storage format
+CACHE_FORMAT_VERSION = 1
+
+
+def _hash_parts(parts):
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(str(part).encode())
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+def code_fingerprint(obj):
+    """Hash of the source of a function, class or module"""
+    try:
+        source = inspect.getsource(obj)
+    except (OSError, TypeError):
+        source = repr(obj)
+    return hashlib.sha256(source.encode()).hexdigest()
+
+
+class Stage:
+    """One memoized pipeline stage; ``value`` loads from disk or computes on first use"""
+
+    def __init__(self, cache, name, fn, key, upstream):
+        self.cache = cache
+        self.name = name
+        self.fn = fn
+        self.key = key
+        self.upstream = upstream
+        self._computed = False
+        self._value = None
+
+    @property
+    def value(self):
+        if not self._computed:
+            self._value = self.cache.load_or_compute(self)
+            self._computed = True
+        return self._value
+
+
+class FeatureCache:
+    """On-disk store of stage outputs.
+
+    DataFrames and Series are stored as Parquet, dense arrays as .npy, sparse
+    matrices as .npz, and anything else (e.g. fitted transformers) with joblib.
+    Tuples, lists and dicts of these are stored part by part.
+    """
+
+    def __init__(self, root=CACHE_DIR, enabled=None):
+        if enabled is None:
+            enabled = os.environ.get('FRAUD_FEATURE_CACHE', '1') != '0'
+        self.root = root
+        self.enabled = enabled
+        self._fingerprint_path = os.path.join(root, 'fingerprints.json')
+        self._fingerprints = None
+
+    def file_fingerprint(self, path):
+        """Content hash of a raw input file, re-hashed only when its size or mtime changes"""
+        stat = os.stat(path)
+        if not self.enabled:
+            # Nothing is loaded or saved, so keys only need to be well-formed; skip reading the file
+            return f'{stat.st_size}:{stat.st_mtime_ns}'
+
+        if self._fingerprints is None:
+            self._fingerprints = {}
+            if os.path.exists(self._fingerprint_path):
+                with open(self._fingerprint_path) as f:
+                    self._fingerprints = json.load(f)
+
+        entry = self._fingerprints.get(os.path.abspath(path))
+        if entry and entry['size'] == stat.st_size and entry['mtime_ns'] == stat.st_mtime_ns:
+            return entry['sha256']
+
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+
+        self._fingerprints[os.path.abspath(path)] = {
+            'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha256': digest.hexdigest()}
+        os.makedirs(self.root, exist_ok=True)
+        with open(self._fingerprint_path, 'w') as f:
+            json.dump(self._fingerprints, f, indent=2)
+        return digest.hexdigest()
+
+    def stage(self, name, fn, upstream=(), files=(), code=(), params=None):
+        """Declare a stage; ``fn`` receives the values of ``upstream`` stages as arguments"""
+        parts = [CACHE_FORMAT_VERSION, name, code_fingerprint(fn)]
+        parts += [code_fingerprint(obj) for obj in code]
+        parts += [self.file_fingerprint(path) for path in files]
+        parts += [stage.key for stage in upstream]
+        parts.append(json.dumps(params, sort_keys=True, default=str))
+        return Stage(self, name, fn, _hash_parts(parts)[:20], list(upstream))
+
+    def _stage_dir(self, stage):
+        return os.path.join(self.root, f'{stage.name}-{stage.key}')
+
+    def load_or_compute(self, stage):
+        path = self._stage_dir(stage)
+        if self.enabled and os.path.exists(os.path.join(path, 'manifest.json')):
+            print(f"Reusing cached stage '{stage.name}' ({stage.key})")
+            with open(os.path.join(path, 'manifest.json')) as f:
+                return self._decode(json.load(f), path)
+
+        print(f"Computing stage '{stage.name}' ({stage.key})")
+        value = stage.fn(*[upstream.value for upstream in stage.upstream])
+        if self.enabled:
+            self._save(value, path)
+        return value
+
+    def _save(self, value, path):
+        # Write into a scratch directory and rename, so readers never see half a stage
+        tmp_path = f'{path}.tmp-{uuid.uuid4().hex[:8]}'
+        os.makedirs(tmp_path)
+        manifest = self._encode(value, tmp_path, 'value')
+        with open(os.path.join(tmp_path, 'manifest.json'), 'w') as f:
+            json.dump(manifest, f)
+        if os.path.exists(path):
+            shutil.rmtree(path)
+        os.replace(tmp_path, path)
+
+    def _encode(self, value, path, name):
+        if isinstance(value, pd.DataFrame):
+            try:
+                value.to_parquet(os.path.join(path, f'{name}.parquet'))
+                return {'type': 'frame', 'file': f'{name}.parquet'}
+            except (TypeError, ValueError):
+                # Mixed-type object columns have no Parquet type; keep them pickled
+                pass
+        if isinstance(value, pd.Series):
+            value.to_frame(name='values').to_parquet(os.path.join(path, f'{name}.parquet'))
+            return {'type': 'series', 'file': f'{name}.parquet', 'name': value.name}
+        if isinstance(value, np.ndarray) and value.dtype != object:
+            np.save(os.path.join(path, f'{name}.npy'), value)
+            return {'type': 'array', 'file': f'{name}.npy'}
+        if sp.issparse(value):
+            sp.save_npz(os.path.join(path, f'{name}.npz'), value.tocsr())
+            return {'type': 'sparse', 'file': f'{name}.npz'}
+        if isinstance(value, (tuple, list)):
+            return {'type': type(value).__name__,
+                    'items': [self._encode(item, path, f'{name}_{i}') for i, item in enumerate(value)]}
+        if isinstance(value, dict) and all(isinstance(k, str) for k in value):
+            return {'type': 'dict',
+                    'items': {k: self._encode(v, path, f'{name}_{k}') for k, v in value.items()}}
+        if value is None or isinstance(value, (bool, int, float, str)):
+            return {'type': 'json', 'value': value}
+        joblib.dump(value, os.path.join(path, f'{name}.pkl'))
+        return {'type': 'pickle', 'file': f'{name}.pkl'}
+
+    def _decode(self, manifest, path):
+        kind = manifest['type']
+        if kind == 'frame':
+            return pd.read_parquet(os.path.join(path, manifest['file']))
+        if kind == 'series':
+            series = pd.read_parquet(os.path.join(path, manifest['file']))['values']
+            return series.rename(manifest['name'])
+        if kind == 'array':
+            return np.load(os.path.join(path, manifest['file']))
+        if kind == 'sparse':
+            return sp.load_npz(os.path.join(path, manifest['file']))
+        if kind in ('tuple', 'list'):
+            items = [self._decode(item, path) for item in manifest['items']]
+            return tuple(items) if kind == 'tuple' else items
+        if kind == 'dict':
+            return {k: self._decode(v, path) for k, v in manifest['items'].items()}
+        if kind == 'json':
+            return manifest['value']
+        return joblib.load(os.path.join(path, manifest['file']))
@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+"""
+Healthcare Fraud Detection - Fitted Feature Transformer
+Holds the preprocessing state learned in training (column order, median fills and
+standard scaling) as NumPy arrays, so serving reproduces it in one vectorized pass
+"""
+
+import numpy as np
+import pandas as pd
+
+
+class ProviderFeatureTransformer:
+    """Column selection, inf/NaN median fill and optional scaling over a float32 matrix.
+
+    ``medians`` may be None for models trained without a fill step, in which case
+    missing values are passed through as NaN. ``scaling`` decides whether
+    ``transform`` standardizes by default; the scaling statistics are always fitted
+    so the scaled space is available to callers that need it.
+    """
+
+    def __init__(self, feature_names, medians=None, mean=None, scale=None, scaling=False):
+        self.feature_names = list(feature_names)
+        self.medians = medians
+        self.mean = mean
+        self.scale = scale
+        self.scaling = scaling
+
+    @classmethod
+    def fit(cls, data, feature_names, scaling=False):
+        """Learn medians and scaling statistics from a training frame"""
+        # Own copy: pandas copy-on-write may hand back a read-only view
+        X = data.reindex(columns=feature_names).to_numpy(dtype=np.float64, copy=True)
+        X[~np.isfinite(X)] = np.nan
+
+        medians = np.nanmedian(X, axis=0)
+        medians[np.isnan(medians)] = 0.0
+        X = np.where(np.isnan(X), medians, X)
+
+        # Same statistics as StandardScaler: population std, constant columns left unscaled
+        mean = X.mean(axis=0)
+        scale = X.std(axis=0)
+        scale[scale == 0] = 1.0
+
+        return cls(feature_names, medians.astype(np.float32), mean.astype(np.float32),
+                   scale.astype(np.float32), scaling=scaling)
+
+    @classmethod
+    def from_legacy(cls, feature_names, scaler=None):
+        """Wrap a feature list and optional StandardScaler from older model artifacts"""
+        if scaler is None:
+            return cls(feature_names)
+        return cls(feature_names, mean=scaler.mean_.astype(np.float32),
+                   scale=scaler.scale_.astype(np.float32), scaling=True)
+
+    def matrix(self, data):
+        """Arrange a DataFrame, list of records or array into a float32 matrix in feature order"""
+        if isinstance(data, pd.DataFrame):
+            return data.reindex(columns=self.feature_names).to_numpy(dtype=np.float32)
+        if isinstance(data, np.ndarray):
+            return np.array(data, dtype=np.float32, ndmin=2)
+        return np.array([[record.get(name, np.nan) for name in self.feature_names]
+                         for record in data], dtype=np.float32)
+
+    def transform(self, data, scale=None):
+        """Fill non-finite values with training medians and optionally standardize"""
+        X = self.matrix(data)
+        if self.medians is not None:
+            X = np.where(np.isfinite(X), X, self.medians)
+        if scale is None:
+            scale = self.scaling
+        if scale:
+            X = self.apply_scaling(X)
+        return X
+
+    def apply_scaling(self, X):
+        """Standardize an already filled matrix"""
+        return (X - self.mean) / self.scale
@@ -0,0 +1,180 @@
+# -*- coding: utf-8 -*-
+"""
+Healthcare Fraud Detection - Incremental Retraining
+Updates a trained model with newly arrived claims instead of retraining on the
+full history: boosted models continue boosting from the existing booster and
+forests grow extra trees fitted on the new providers. Work is proportional to the
+new data. With --validate, the update is checked against a full retrain on a
+holdout of the new providers before it is saved.
+"""
+
+import runtime_config
+
+# Same core split as the full training scripts, before numpy loads
+THREAD_BUDGET = runtime_config.configure('training')
+
+import argparse
+import copy
+import json
+import time
+
+import joblib
+import numpy as np
+from sklearn.base import clone
+from sklearn.ensemble import (ExtraTreesClassifier, GradientBoostingClassifier,
+                              RandomForestClassifier)
+from sklearn.metrics import f1_score, roc_auc_score
+from sklearn.model_selection import train_test_split
+
+from feature_cache import FeatureCache
+from model_registry import load_model_version
+from optimal_model import provider_feature_stage
+
+FOREST_MODELS = (RandomForestClassifier, ExtraTreesClassifier)
+
+
+def labelled_matrix(version, features):
+    """Model matrix and 0/1 labels for a provider feature table"""
+    if not version.accepts(features.columns):
+        missing = sorted(set(version.feature_names) - set(features.columns))
+        raise ValueError(f"Model '{version.name}' needs features the provider table lacks: "
+                         f"{', '.join(missing[:10])}")
+    X = version.transform(features)
+    y = (features['PotentialFraud'] == 'Yes').astype(int).to_numpy()
+    return X, y
+
+
+def update_model(model, X_new, y_new, add_estimators=50):
+    """Add `add_estimators` trees/rounds fitted on the new rows; returns the updated model"""
+    if len(np.unique(y_new)) < 2:
+        raise ValueError("New data must contain both fraud and non-fraud providers")
+
+    if hasattr(model, 'get_booster'):
+        # XGBoost: continue boosting from the existing booster
+        params = dict(model.get_params(), n_estimators=add_estimators)
+        updated = type(model)(**params)
+        updated.fit(X_new, y_new, xgb_model=model.get_booster())
+        return updated
+
+    if isinstance(model, FOREST_MODELS + (GradientBoostingClassifier,)):
+        # Forests add independent trees; gradient boosting adds stages fitted to the
+        # residuals of the existing ensemble on the new rows
+        model.set_params(warm_start=True, n_estimators=model.n_estimators + add_estimators)
+        model.fit(X_new, y_new)
+        model.set_params(warm_start=False)
+        return model
+
+    raise ValueError(f"{type(model).__name__} has no incremental update; run a full retrain")
+
+
+def _holdout_metrics(model, X, y):
+    proba = model.predict_proba(X)[:, 1]
+    return {
+        'AUC': float(roc_auc_score(y, proba)),
+        'F1': float(f1_score(y, (proba >= 0.5).astype(int))),
+    }
+
+
+def validate_update(version, X_hist, y_hist, X_new, y_new, add_estimators=50,
+                    holdout_size=0.2, max_auc_drop=0.02):
+    """Compare an incremental update against a full retrain on a holdout of the new data"""
+    X_update, X_hold, y_update, y_hold = train_test_split(
+        X_new, y_new, test_size=holdout_size, random_state=42, stratify=y_new)
+
+    before = _holdout_metrics(version.model, X_hold, y_hold)
+
+    full = clone(version.model)
+    start = time.perf_counter()
+    full.fit(np.concatenate([X_hist, X_update]), np.concatenate([y_hist, y_update]))
+    full_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    # Update a copy so validation never touches the model that may be saved
+    incremental = update_model(copy.deepcopy(version.model), X_update, y_update, add_estimators)
+    incremental_time = time.perf_counter() - start
+
+    report = {
+        'holdout_providers': int(len(y_hold)),
+        'update_providers': int(len(y_update)),
+        'history_providers': int(len(y_hist)),
+        'before_update': before,
+        'incremental': dict(_holdout_metrics(incremental, X_hold, y_hold),
+                            fit_seconds=incremental_time),
+        'full_retrain': dict(_holdout_metrics(full, X_hold, y_hold), fit_seconds=full_time),
+        'max_auc_drop': max_auc_drop,
+    }
+    report['auc_drop_vs_full'] = report['full_retrain']['AUC'] - report['incremental']['AUC']
+    report['passed'] = report['auc_drop_vs_full'] <= max_auc_drop
+    return report
+
+
+def save_updated(source, path, model, update_info):
+    """Write the updated model in the same artifact format as the source artifact"""
+    artifact = joblib.load(source)
+    if isinstance(artifact, dict):
+        artifact = dict(artifact, model=model)
+        artifact['incremental_updates'] = artifact.get('incremental_updates', []) + [update_info]
+        joblib.dump(artifact, path)
+    else:
+        joblib.dump(model, path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Update a trained model with newly arrived claims')
+    parser.add_argument('new_data', help='Directory with the new Train-format provider and claim CSVs')
+    parser.add_argument('--model', default='./optimal_fraud_model.pkl', help='Model artifact to update')
+    parser.add_argument('--output', default=None, help='Where to save the update (default: --model)')
+    parser.add_argument('--add-estimators', type=int, default=50, help='Trees or boosting rounds to add')
+    parser.add_argument('--validate', action='store_true',
+                        help='Compare against a full retrain on a holdout before saving')
+    parser.add_argument('--history', default='./content', help='Original training data, for --validate')
+    parser.add_argument('--max-auc-drop', type=float, default=0.02,
+                        help='Largest holdout AUC gap to the full retrain that still passes')
+    parser.add_argument('--report', default='incremental_report.json', help='Validation report path')
+    args = parser.parse_args()
+
+    version = load_model_version('incremental', args.model)
+    runtime_config.set_model_threads(version.model, THREAD_BUDGET.model_threads)
+
+    cache = FeatureCache()
+    print(f"Building provider features for new claims in {args.new_data}")
+    new_features = provider_feature_stage(cache, 'train', args.new_data).value
+    X_new, y_new = labelled_matrix(version, new_features)
+    print(f"New data: {len(y_new)} providers, {int(y_new.sum())} labelled fraud")
+
+    if args.validate:
+        history = provider_feature_stage(cache, 'train', args.history).value
+        X_hist, y_hist = labelled_matrix(version, history)
+        report = validate_update(version, X_hist, y_hist, X_new, y_new,
+                                 add_estimators=args.add_estimators, max_auc_drop=args.max_auc_drop)
+        with open(args.report, 'w') as f:
+            json.dump(report, f, indent=2)
+
+        print(f"Holdout AUC: before {report['before_update']['AUC']:.4f}, "
+              f"incremental {report['incremental']['AUC']:.4f} "
+              f"({report['incremental']['fit_seconds']:.1f}s), "
+              f"full retrain {report['full_retrain']['AUC']:.4f} "
+              f"({report['full_retrain']['fit_seconds']:.1f}s)")
+        print(f"Report saved to {args.report}")
+        if not report['passed']:
+            print(f"Incremental update is {report['auc_drop_vs_full']:.4f} AUC behind a full retrain; "
+                  f"not saving it")
+            return report
+
+    start = time.perf_counter()
+    updated = update_model(version.model, X_new, y_new, args.add_estimators)
+    fit_seconds = time.perf_counter() - start
+
+    output = args.output or args.model
+    save_updated(args.model, output, updated, {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'providers': int(len(y_new)),
+        'added_estimators': args.add_estimators,
+        'fit_seconds': fit_seconds,
+    })
+    print(f"Added {args.add_estimators} estimators on {len(y_new)} providers in {fit_seconds:.1f}s")
+    print(f"Updated model saved to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,394 +1,476 @@
 # -*- coding: utf-8 -*-
-"""CTS_with_LIME.ipynb
-
-Automatically generated by Colab.
-
-Original file is located at
-    https://colab.research.google.com/drive/1DJn-wYY8FEGh4_YmxzqtI6wtoPcPwyeu
+"""
+Healthcare Fraud Detection - Claim-Level Training Pipeline
+Cleans and merges the claim files, builds sparse claim-level features, compares
+several classifiers and saves the best one with LIME/SHAP explanations. Started
+life as a Colab notebook (CTS_with_LIME.ipynb); now importable, with each stage
+selectable from the command line:
+
+    python model.py                              # prepare, train, explain, save
+    python model.py --stages train save          # scheduled retrain
+    python model.py --stages explain             # explain with the saved model
+    python model.py --stages report              # EDA figures to HTML
+
+Heavy optional libraries (XGBoost, SHAP, LIME, imbalanced-learn, plotly) are
+only imported by the stages that use them.
 """
 
-
-
-import pandas as pd
-import numpy as np
-import plotly.express as px
-import seaborn as sns
-import matplotlib.pyplot as plt
-import random
-import joblib
+import argparse
+import importlib.util
 import json
+import os
+import random
+import sys
+import warnings
 from collections import Counter
 
-# Try to import optional libraries
-try:
-    import xgboost as xgb
-    XGB_AVAILABLE = True
-except ImportError:
+import joblib
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+
+import runtime_config
+from explainers import get_explainer
+from feature_cache import FeatureCache
+
+# Planned on first use by run() rather than at import, so importing this module
+# leaves os.environ and the native thread pools alone
+THREAD_BUDGET = None
+
+def thread_budget():
+    """Split the cores between parallel CV fits and each model's threads, once"""
+    global THREAD_BUDGET
+    if THREAD_BUDGET is None:
+        THREAD_BUDGET = runtime_config.configure('training')
+    return THREAD_BUDGET
+
+# Optional libraries are located now but imported only by the stages that need them
+XGB_AVAILABLE = importlib.util.find_spec('xgboost') is not None
+if not XGB_AVAILABLE:
     print("XGBoost not available, will use RandomForest as best alternative")
-    XGB_AVAILABLE = False
 
-try:
-    import shap
-    SHAP_AVAILABLE = True
-except ImportError:
+SHAP_AVAILABLE = importlib.util.find_spec('shap') is not None
+if not SHAP_AVAILABLE:
     print("SHAP not available, explanations will be limited")
-    SHAP_AVAILABLE = False
 
-try:
-    from lime.lime_tabular import LimeTabularExplainer
-    LIME_AVAILABLE = True
-except ImportError:
+LIME_AVAILABLE = importlib.util.find_spec('lime') is not None
+if not LIME_AVAILABLE:
     print("LIME not available, will use SHAP for explanations if available")
-    LIME_AVAILABLE = False
 
-try:
-    from imblearn.over_sampling import SMOTE
-    SMOTE_AVAILABLE = True
-except ImportError:
+SMOTE_AVAILABLE = importlib.util.find_spec('imblearn') is not None
+if not SMOTE_AVAILABLE:
     print("imbalanced-learn not available, will skip SMOTE oversampling")
-    SMOTE_AVAILABLE = False
-
-"""**Data Cleaning**"""
-
-# Data loading with error handling
-try:
-    Test = pd.read_csv("./content/Test-1542969243754.csv")
-    Test_Inpatientdata = pd.read_csv("./content/Test_Inpatientdata-1542969243754.csv")
-    Test_Outpatientdata = pd.read_csv("./content/Test_Outpatientdata-1542969243754.csv")
-    Test_Beneficiarydata = pd.read_csv("./content/Test_Beneficiarydata-1542969243754.csv")
-
-    Train = pd.read_csv("./content/Train-1542865627584.csv")
-    Train_Beneficiarydata = pd.read_csv("./content/Train_Beneficiarydata-1542865627584.csv")
-    Train_Inpatientdata = pd.read_csv("./content/Train_Inpatientdata-1542865627584.csv")
-    Train_Outpatientdata = pd.read_csv("./content/Train_Outpatientdata-1542865627584.csv")
-
-    print("Data files loaded successfully")
-except FileNotFoundError as e:
-    print(f"Error loading data files: {e}")
-    print("Please ensure the CSV files are in the /content/ directory")
-    raise
-except Exception as e:
-    print(f"Unexpected error loading data: {e}")
-    raise
-
-print("The Training inpatient: {} rows and {} columns. \n" .format(Train_Inpatientdata.shape[0], Train_Inpatientdata.shape[1]))
-print("The Training outpatient: {} rows and {} columns. \n" .format(Train_Outpatientdata.shape[0], Train_Outpatientdata.shape[1]))
-print("The Training Benficiary: {} rows and {} columns. \n" .format(Train_Beneficiarydata.shape[0], Train_Beneficiarydata.shape[1]))
-
-print("The Test inpatient: {} rows and {} columns. \n" .format(Test_Inpatientdata.shape[0], Test_Inpatientdata.shape[1]))
-print("The Test outpatient: {} rows and {} columns. \n" .format(Test_Outpatientdata.shape[0], Test_Outpatientdata.shape[1]))
-print("The Test Benficiary: {} rows and {} columns. \n" .format(Test_Beneficiarydata.shape[0], Test_Beneficiarydata.shape[1]))
-
-"""**Beneficiarydata**"""
-
-Train_Beneficiarydata.head()
 
-Train_Beneficiarydata.isna().sum()
-
-print(Train_Beneficiarydata.duplicated().sum())
-print(Test_Beneficiarydata.duplicated().sum())
-
-Train_Beneficiarydata['DOB'] = pd.to_datetime(Train_Beneficiarydata['DOB'], format='%Y-%m-%d')
-Train_Beneficiarydata['DOD'] = pd.to_datetime(Train_Beneficiarydata['DOD'], format='%Y-%m-%d', errors='ignore')
-Test_Beneficiarydata['DOB'] = pd.to_datetime(Test_Beneficiarydata['DOB'], format='%Y-%m-%d')
-Test_Beneficiarydata['DOD'] = pd.to_datetime(Test_Beneficiarydata['DOD'], format='%Y-%m-%d', errors='ignore')
-
-Train_Beneficiarydata['Age'] = round((Train_Beneficiarydata['DOD'] - Train_Beneficiarydata['DOB']).dt.days / 365)
-Test_Beneficiarydata['Age'] = round((Test_Beneficiarydata['DOD'] - Test_Beneficiarydata['DOB']).dt.days / 365)
-
-Train_Beneficiarydata['Age'] = Train_Beneficiarydata['Age'].fillna(round((pd.to_datetime('2009-12-01') - Train_Beneficiarydata['DOB']).dt.days / 365))
-Test_Beneficiarydata['Age'] = Test_Beneficiarydata['Age'].fillna(round((pd.to_datetime('2009-12-01') - Test_Beneficiarydata['DOB']).dt.days / 365))
-
-Train_Beneficiarydata['AliveorDead'] = Train_Beneficiarydata['DOD'].notna().astype(int)
-Test_Beneficiarydata['AliveorDead'] = Test_Beneficiarydata['DOD'].notna().astype(int)
+def peak_rss_mb():
+    """Peak resident memory of this process in MB"""
+    try:
+        import resource
+    except ImportError:
+        return float('nan')
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and kilobytes on Linux
+    return peak / 1024 ** 2 if sys.platform == 'darwin' else peak / 1024
+
+def _mix64(x):
+    """splitmix64 finalizer over a uint64 array"""
+    x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return x ^ (x >> np.uint64(31))
+
+def sparse_row_hashes(X, y=None):
+    """64-bit hash of each CSR row's (column, value) pairs, optionally mixed with its label"""
+    X = X.tocsr(copy=True)
+    X.sum_duplicates()
+    X.eliminate_zeros()
+
+    values = X.data.astype(np.float64).view(np.uint64)
+    columns = X.indices.astype(np.uint64)
+    mixed = _mix64(values ^ _mix64(columns + np.uint64(0x9E3779B97F4A7C15)))
+
+    hashes = np.zeros(X.shape[0], dtype=np.uint64)
+    row_nnz = np.diff(X.indptr)
+    non_empty = row_nnz > 0
+    if mixed.size:
+        hashes[non_empty] = np.add.reduceat(mixed, X.indptr[:-1][non_empty])
+    if y is not None:
+        hashes ^= _mix64(np.asarray(y).astype(np.uint64) + np.uint64(1))
+    return hashes
+
+# Encoded claim matrices are (numeric, one_hot) pairs: a dense float32 block for
+# the numeric columns, which are nearly all non-zero and would take twice the
+# memory as CSR, and a CSR block for the one-hot ChronicCond columns
+
+def stack_sparse(X):
+    """One CSR matrix from a (numeric, one_hot) pair"""
+    numeric, one_hot = X
+    return sp.hstack([sp.csr_matrix(numeric), one_hot], format='csr', dtype=np.float32)
+
+def stack_dense(X):
+    """One dense float32 array from a (numeric, one_hot) pair, as the API scores rows"""
+    numeric, one_hot = X
+    return np.hstack([numeric, one_hot.toarray()]).astype(np.float32, copy=False)
+
+def split_blocks(X, n_numeric):
+    """(numeric, one_hot) pair from a CSR matrix whose first n_numeric columns are numeric"""
+    X = sp.csr_matrix(X, dtype=np.float32)
+    return X[:, :n_numeric].toarray(), X[:, n_numeric:].tocsr()
+
+# Data cleaning
+
+DATA_DIR = './content'
+DATA_FILES = ["Test-1542969243754.csv", "Test_Inpatientdata-1542969243754.csv",
+              "Test_Outpatientdata-1542969243754.csv", "Test_Beneficiarydata-1542969243754.csv",
+              "Train-1542865627584.csv", "Train_Beneficiarydata-1542865627584.csv",
+              "Train_Inpatientdata-1542865627584.csv", "Train_Outpatientdata-1542865627584.csv"]
+
+def build_claim_frames(data_dir=DATA_DIR):
+    """Load, clean and merge the raw claim files into claim-level train and test frames"""
+    # Data loading with error handling
+    try:
+        Test = pd.read_csv(f"{data_dir}/Test-1542969243754.csv")
+        Test_Inpatientdata = pd.read_csv(f"{data_dir}/Test_Inpatientdata-1542969243754.csv")
+        Test_Outpatientdata = pd.read_csv(f"{data_dir}/Test_Outpatientdata-1542969243754.csv")
+        Test_Beneficiarydata = pd.read_csv(f"{data_dir}/Test_Beneficiarydata-1542969243754.csv")
+
+        Train = pd.read_csv(f"{data_dir}/Train-1542865627584.csv")
+        Train_Beneficiarydata = pd.read_csv(f"{data_dir}/Train_Beneficiarydata-1542865627584.csv")
+        Train_Inpatientdata = pd.read_csv(f"{data_dir}/Train_Inpatientdata-1542865627584.csv")
+        Train_Outpatientdata = pd.read_csv(f"{data_dir}/Train_Outpatientdata-1542865627584.csv")
+
+        print("Data files loaded successfully")
+    except FileNotFoundError as e:
+        print(f"Error loading data files: {e}")
+        print(f"Please ensure the CSV files are in the {data_dir} directory")
+        raise
+    except Exception as e:
+        print(f"Unexpected error loading data: {e}")
+        raise
 
-Train_Beneficiarydata.groupby(['AliveorDead'])['BeneID'].nunique()
+    print("The Training inpatient: {} rows and {} columns. \n" .format(Train_Inpatientdata.shape[0], Train_Inpatientdata.shape[1]))
+    print("The Training outpatient: {} rows and {} columns. \n" .format(Train_Outpatientdata.shape[0], Train_Outpatientdata.shape[1]))
+    print("The Training Benficiary: {} rows and {} columns. \n" .format(Train_Beneficiarydata.shape[0], Train_Beneficiarydata.shape[1]))
 
-"""**Inpatientdata**"""
+    print("The Test inpatient: {} rows and {} columns. \n" .format(Test_Inpatientdata.shape[0], Test_Inpatientdata.shape[1]))
+    print("The Test outpatient: {} rows and {} columns. \n" .format(Test_Outpatientdata.shape[0], Test_Outpatientdata.shape[1]))
+    print("The Test Benficiary: {} rows and {} columns. \n" .format(Test_Beneficiarydata.shape[0], Test_Beneficiarydata.shape[1]))
 
-Train_Inpatientdata.head()
+    # Beneficiary data
 
-Train_Inpatientdata.isna().sum()
+    print(Train_Beneficiarydata.duplicated().sum())
+    print(Test_Beneficiarydata.duplicated().sum())
 
-Train_Inpatientdata['AdmissionDt'] = pd.to_datetime(Train_Inpatientdata['AdmissionDt'], format='%Y-%m-%d')
-Train_Inpatientdata['DischargeDt'] = pd.to_datetime(Train_Inpatientdata['DischargeDt'], format='%Y-%m-%d')
-Test_Inpatientdata['AdmissionDt'] = pd.to_datetime(Test_Inpatientdata['AdmissionDt'], format='%Y-%m-%d')
-Test_Inpatientdata['DischargeDt'] = pd.to_datetime(Test_Inpatientdata['DischargeDt'], format='%Y-%m-%d')
+    Train_Beneficiarydata['DOB'] = pd.to_datetime(Train_Beneficiarydata['DOB'], format='%Y-%m-%d')
+    Train_Beneficiarydata['DOD'] = pd.to_datetime(Train_Beneficiarydata['DOD'], format='%Y-%m-%d', errors='ignore')
+    Test_Beneficiarydata['DOB'] = pd.to_datetime(Test_Beneficiarydata['DOB'], format='%Y-%m-%d')
+    Test_Beneficiarydata['DOD'] = pd.to_datetime(Test_Beneficiarydata['DOD'], format='%Y-%m-%d', errors='ignore')
 
-Train_Inpatientdata['NumberofDaysAdmitted'] = (Train_Inpatientdata['DischargeDt'] - Train_Inpatientdata['AdmissionDt']).dt.days + 1
-Test_Inpatientdata['NumberofDaysAdmitted'] = (Test_Inpatientdata['DischargeDt'] - Test_Inpatientdata['AdmissionDt']).dt.days + 1
+    Train_Beneficiarydata['Age'] = round((Train_Beneficiarydata['DOD'] - Train_Beneficiarydata['DOB']).dt.days / 365)
+    Test_Beneficiarydata['Age'] = round((Test_Beneficiarydata['DOD'] - Test_Beneficiarydata['DOB']).dt.days / 365)
 
-Train_Inpatientdata['ClaimEndDt'] = pd.to_datetime(Train_Inpatientdata['ClaimEndDt'], format='%Y-%m-%d')
-Train_Inpatientdata['ClaimStartDt'] = pd.to_datetime(Train_Inpatientdata['ClaimStartDt'], format='%Y-%m-%d')
+    Train_Beneficiarydata['Age'] = Train_Beneficiarydata['Age'].fillna(round((pd.to_datetime('2009-12-01') - Train_Beneficiarydata['DOB']).dt.days / 365))
+    Test_Beneficiarydata['Age'] = Test_Beneficiarydata['Age'].fillna(round((pd.to_datetime('2009-12-01') - Test_Beneficiarydata['DOB']).dt.days / 365))
 
-Test_Inpatientdata['ClaimEndDt'] = pd.to_datetime(Test_Inpatientdata['ClaimEndDt'], format='%Y-%m-%d')
-Test_Inpatientdata['ClaimStartDt'] = pd.to_datetime(Test_Inpatientdata['ClaimStartDt'], format='%Y-%m-%d')
+    Train_Beneficiarydata['AliveorDead'] = Train_Beneficiarydata['DOD'].notna().astype(int)
+    Test_Beneficiarydata['AliveorDead'] = Test_Beneficiarydata['DOD'].notna().astype(int)
 
-Train_Inpatientdata['DurationofClaim'] = (Train_Inpatientdata['ClaimEndDt'] - Train_Inpatientdata['ClaimStartDt']).dt.days
-Test_Inpatientdata['DurationofClaim'] = (Test_Inpatientdata['ClaimEndDt'] - Test_Inpatientdata['ClaimStartDt']).dt.days
+    # Inpatient data
 
-Train_Inpatientdata['Admitted'] =1
-Test_Inpatientdata['Admitted'] =1
+    Train_Inpatientdata['AdmissionDt'] = pd.to_datetime(Train_Inpatientdata['AdmissionDt'], format='%Y-%m-%d')
+    Train_Inpatientdata['DischargeDt'] = pd.to_datetime(Train_Inpatientdata['DischargeDt'], format='%Y-%m-%d')
+    Test_Inpatientdata['AdmissionDt'] = pd.to_datetime(Test_Inpatientdata['AdmissionDt'], format='%Y-%m-%d')
+    Test_Inpatientdata['DischargeDt'] = pd.to_datetime(Test_Inpatientdata['DischargeDt'], format='%Y-%m-%d')
 
-px.histogram(Train_Inpatientdata, x = 'NumberofDaysAdmitted', title='NumberofDaysAdmitted',
-    width=600,
-    height=400)
+    Train_Inpatientdata['NumberofDaysAdmitted'] = (Train_Inpatientdata['DischargeDt'] - Train_Inpatientdata['AdmissionDt']).dt.days + 1
+    Test_Inpatientdata['NumberofDaysAdmitted'] = (Test_Inpatientdata['DischargeDt'] - Test_Inpatientdata['AdmissionDt']).dt.days + 1
 
-px.box(Train_Inpatientdata, x = 'NumberofDaysAdmitted',
-    width=600,
-    height=400)
+    Train_Inpatientdata['ClaimEndDt'] = pd.to_datetime(Train_Inpatientdata['ClaimEndDt'], format='%Y-%m-%d')
+    Train_Inpatientdata['ClaimStartDt'] = pd.to_datetime(Train_Inpatientdata['ClaimStartDt'], format='%Y-%m-%d')
 
-px.histogram(Train_Inpatientdata, x = 'DurationofClaim', title='DurationofClaim',width=600,height=400)
+    Test_Inpatientdata['ClaimEndDt'] = pd.to_datetime(Test_Inpatientdata['ClaimEndDt'], format='%Y-%m-%d')
+    Test_Inpatientdata['ClaimStartDt'] = pd.to_datetime(Test_Inpatientdata['ClaimStartDt'], format='%Y-%m-%d')
 
-"""**Outpatientdata**"""
+    Train_Inpatientdata['DurationofClaim'] = (Train_Inpatientdata['ClaimEndDt'] - Train_Inpatientdata['ClaimStartDt']).dt.days
+    Test_Inpatientdata['DurationofClaim'] = (Test_Inpatientdata['ClaimEndDt'] - Test_Inpatientdata['ClaimStartDt']).dt.days
 
-Train_Outpatientdata.head()
+    Train_Inpatientdata['Admitted'] =1
+    Test_Inpatientdata['Admitted'] =1
 
-print(Train_Outpatientdata.duplicated().sum())
-print(Test_Outpatientdata.duplicated().sum())
+    # Outpatient data
 
-Train_Outpatientdata.isnull().sum()
+    print(Train_Outpatientdata.duplicated().sum())
+    print(Test_Outpatientdata.duplicated().sum())
 
-Train_Outpatientdata['Admitted'] = 0
-Test_Outpatientdata['Admitted'] = 0
+    Train_Outpatientdata['Admitted'] = 0
+    Test_Outpatientdata['Admitted'] = 0
 
-Train_Outpatientdata['ClaimEndDt'] = pd.to_datetime(Train_Outpatientdata['ClaimEndDt'], format='%Y-%m-%d')
-Train_Outpatientdata['ClaimStartDt'] = pd.to_datetime(Train_Outpatientdata['ClaimStartDt'], format='%Y-%m-%d')
+    Train_Outpatientdata['ClaimEndDt'] = pd.to_datetime(Train_Outpatientdata['ClaimEndDt'], format='%Y-%m-%d')
+    Train_Outpatientdata['ClaimStartDt'] = pd.to_datetime(Train_Outpatientdata['ClaimStartDt'], format='%Y-%m-%d')
 
-Test_Outpatientdata['ClaimEndDt'] = pd.to_datetime(Test_Outpatientdata['ClaimEndDt'], format='%Y-%m-%d')
-Test_Outpatientdata['ClaimStartDt'] = pd.to_datetime(Test_Outpatientdata['ClaimStartDt'], format='%Y-%m-%d')
+    Test_Outpatientdata['ClaimEndDt'] = pd.to_datetime(Test_Outpatientdata['ClaimEndDt'], format='%Y-%m-%d')
+    Test_Outpatientdata['ClaimStartDt'] = pd.to_datetime(Test_Outpatientdata['ClaimStartDt'], format='%Y-%m-%d')
 
-Train_Outpatientdata['DurationofClaim'] = (Train_Outpatientdata['ClaimEndDt'] - Train_Outpatientdata['ClaimStartDt']).dt.days
-Test_Outpatientdata['DurationofClaim'] = (Test_Outpatientdata['ClaimEndDt'] - Test_Outpatientdata['ClaimStartDt']).dt.days
+    Train_Outpatientdata['DurationofClaim'] = (Train_Outpatientdata['ClaimEndDt'] - Train_Outpatientdata['ClaimStartDt']).dt.days
+    Test_Outpatientdata['DurationofClaim'] = (Test_Outpatientdata['ClaimEndDt'] - Test_Outpatientdata['ClaimStartDt']).dt.days
 
-"""*Merging*"""
+    # Merging
 
-common_cols = list(set(Train_Inpatientdata.columns).intersection(set(Train_Outpatientdata.columns)))
+    common_cols = list(set(Train_Inpatientdata.columns).intersection(set(Train_Outpatientdata.columns)))
 
-print(common_cols)
+    print(common_cols)
 
-Train_Allpatientdata = pd.merge(Train_Outpatientdata, Train_Inpatientdata, on=common_cols, how='outer')
-Test_Allpatientdata = pd.merge(Test_Outpatientdata, Test_Inpatientdata, on=common_cols, how='outer')
+    Train_Allpatientdata = pd.merge(Train_Outpatientdata, Train_Inpatientdata, on=common_cols, how='outer')
+    Test_Allpatientdata = pd.merge(Test_Outpatientdata, Test_Inpatientdata, on=common_cols, how='outer')
 
-print(Train_Allpatientdata.shape)
-print(Test_Allpatientdata.shape)
+    print(Train_Allpatientdata.shape)
+    print(Test_Allpatientdata.shape)
 
-df_train = Train_Allpatientdata.merge(Train_Beneficiarydata, on='BeneID', how='inner')
-df_test = Test_Allpatientdata.merge(Test_Beneficiarydata, on='BeneID', how='inner')
+    df_train = Train_Allpatientdata.merge(Train_Beneficiarydata, on='BeneID', how='inner')
+    df_test = Test_Allpatientdata.merge(Test_Beneficiarydata, on='BeneID', how='inner')
 
-print('Training data shape: ', df_train.shape)
-print('Test data shape: ', df_test.shape)
+    print('Training data shape: ', df_train.shape)
+    print('Test data shape: ', df_test.shape)
 
-df_train1 = pd.merge(Train, df_train,on='Provider')
-df_test1 = pd.merge(Test, df_test,on='Provider')
+    df_train1 = pd.merge(Train, df_train,on='Provider')
+    df_test1 = pd.merge(Test, df_test,on='Provider')
 
-# Remove duplicates to prevent data leakage
-print(f"Rows before deduplication: {df_train1.shape[0]}")
-df_train1 = df_train1.drop_duplicates()
-print(f"Rows after deduplication: {df_train1.shape[0]}")
+    # Remove duplicates to prevent data leakage
+    print(f"Rows before deduplication: {df_train1.shape[0]}")
+    df_train1 = df_train1.drop_duplicates()
+    print(f"Rows after deduplication: {df_train1.shape[0]}")
 
-df_train1['RenalDiseaseIndicator'] = df_train1['RenalDiseaseIndicator'].replace('Y','1')
-df_train1['RenalDiseaseIndicator'] = df_train1['RenalDiseaseIndicator'].astype(int)
+    df_train1['RenalDiseaseIndicator'] = df_train1['RenalDiseaseIndicator'].replace('Y','1')
+    df_train1['RenalDiseaseIndicator'] = df_train1['RenalDiseaseIndicator'].astype(int)
 
-df_test1['RenalDiseaseIndicator'] = df_test1['RenalDiseaseIndicator'].replace('Y','1')
-df_test1['RenalDiseaseIndicator'] = df_test1['RenalDiseaseIndicator'].astype(int)
+    df_test1['RenalDiseaseIndicator'] = df_test1['RenalDiseaseIndicator'].replace('Y','1')
+    df_test1['RenalDiseaseIndicator'] = df_test1['RenalDiseaseIndicator'].astype(int)
 
-df_train1 = df_train1.drop(columns=['DOB', 'DOD'], axis=1)
-df_test1 = df_test1.drop(columns=['DOB', 'DOD'], axis=1)
+    df_train1 = df_train1.drop(columns=['DOB', 'DOD'], axis=1)
+    df_test1 = df_test1.drop(columns=['DOB', 'DOD'], axis=1)
 
-df_train1['ClmDiagnosisCodeIndex'] = df_train1.filter(regex='ClmDiagnosisCode_').notnull().sum(axis=1)
-df_test1['ClmDiagnosisCodeIndex'] = df_test1.filter(regex='ClmDiagnosisCode_').notnull().sum(axis=1)
+    df_train1['ClmDiagnosisCodeIndex'] = df_train1.filter(regex='ClmDiagnosisCode_').notnull().sum(axis=1)
+    df_test1['ClmDiagnosisCodeIndex'] = df_test1.filter(regex='ClmDiagnosisCode_').notnull().sum(axis=1)
 
-df_train1['ClmProcedureCodeIndex'] = df_train1.filter(regex='ClmProcedureCode_').notnull().sum(axis=1)
-df_test1['ClmProcedureCodeIndex'] = df_test1.filter(regex='ClmProcedureCode_').notnull().sum(axis=1)
+    df_train1['ClmProcedureCodeIndex'] = df_train1.filter(regex='ClmProcedureCode_').notnull().sum(axis=1)
+    df_test1['ClmProcedureCodeIndex'] = df_test1.filter(regex='ClmProcedureCode_').notnull().sum(axis=1)
 
-columns_to_drop = df_train1.filter(regex='ClmProcedureCode_|ClmDiagnosisCode_').columns
-df_train1 = df_train1.drop(columns_to_drop, axis=1)
-df_test1 = df_test1.drop(columns_to_drop, axis=1)
+    columns_to_drop = df_train1.filter(regex='ClmProcedureCode_|ClmDiagnosisCode_').columns
+    df_train1 = df_train1.drop(columns_to_drop, axis=1)
+    df_test1 = df_test1.drop(columns_to_drop, axis=1)
 
-df_train1['NumberofDaysAdmitted'] = df_train1['NumberofDaysAdmitted'].fillna(0)
-df_test1['NumberofDaysAdmitted'] = df_test1['NumberofDaysAdmitted'].fillna(0)
+    df_train1['NumberofDaysAdmitted'] = df_train1['NumberofDaysAdmitted'].fillna(0)
+    df_test1['NumberofDaysAdmitted'] = df_test1['NumberofDaysAdmitted'].fillna(0)
 
-df_train1 = df_train1.dropna(subset=['AttendingPhysician'])
-df_test1 = df_test1.dropna(subset=['AttendingPhysician'])
+    df_train1 = df_train1.dropna(subset=['AttendingPhysician'])
+    df_test1 = df_test1.dropna(subset=['AttendingPhysician'])
 
-df_train1['DeductibleAmtPaid'] = df_train1['DeductibleAmtPaid'].fillna(df_train1['DeductibleAmtPaid'].mean())
-df_test1['DeductibleAmtPaid'] = df_test1['DeductibleAmtPaid'].fillna(df_test1['DeductibleAmtPaid'].mean())
+    df_train1['DeductibleAmtPaid'] = df_train1['DeductibleAmtPaid'].fillna(df_train1['DeductibleAmtPaid'].mean())
+    df_test1['DeductibleAmtPaid'] = df_test1['DeductibleAmtPaid'].fillna(df_test1['DeductibleAmtPaid'].mean())
 
-columns_to_transform = ["InscClaimAmtReimbursed", "DeductibleAmtPaid", "IPAnnualReimbursementAmt", "IPAnnualDeductibleAmt","OPAnnualReimbursementAmt", "OPAnnualDeductibleAmt", "Age", "NoOfMonths_PartACov", "NoOfMonths_PartBCov","DurationofClaim","NumberofDaysAdmitted"]
+    columns_to_transform = ["InscClaimAmtReimbursed", "DeductibleAmtPaid", "IPAnnualReimbursementAmt", "IPAnnualDeductibleAmt","OPAnnualReimbursementAmt", "OPAnnualDeductibleAmt", "Age", "NoOfMonths_PartACov", "NoOfMonths_PartBCov","DurationofClaim","NumberofDaysAdmitted"]
 
-for column in columns_to_transform:
-    df_train1[f"PerProviderAvg_{column}"] = df_train1.groupby('Provider')[column].transform('mean')
-    df_test1[f"PerProviderAvg_{column}"] = df_test1.groupby('Provider')[column].transform('mean')
+    for column in columns_to_transform:
+        df_train1[f"PerProviderAvg_{column}"] = df_train1.groupby('Provider')[column].transform('mean')
+        df_test1[f"PerProviderAvg_{column}"] = df_test1.groupby('Provider')[column].transform('mean')
 
-columns_to_transform = [
-    "InscClaimAmtReimbursed",
-    "DeductibleAmtPaid",
-    "IPAnnualReimbursementAmt",
-    "IPAnnualDeductibleAmt",
-    "OPAnnualReimbursementAmt",
-    "OPAnnualDeductibleAmt",
-    "DurationofClaim",
-    "NumberofDaysAdmitted"
-]
+    columns_to_transform = [
+        "InscClaimAmtReimbursed",
+        "DeductibleAmtPaid",
+        "IPAnnualReimbursementAmt",
+        "IPAnnualDeductibleAmt",
+        "OPAnnualReimbursementAmt",
+        "OPAnnualDeductibleAmt",
+        "DurationofClaim",
+        "NumberofDaysAdmitted"
+    ]
 
-for column in columns_to_transform:
-    df_train1[f"PerBeneIDAvg_{column}"] = df_train1.groupby('BeneID')[column].transform('mean')
-    df_test1[f"PerBeneIDAvg_{column}"] = df_test1.groupby('BeneID')[column].transform('mean')
+    for column in columns_to_transform:
+        df_train1[f"PerBeneIDAvg_{column}"] = df_train1.groupby('BeneID')[column].transform('mean')
+        df_test1[f"PerBeneIDAvg_{column}"] = df_test1.groupby('BeneID')[column].transform('mean')
 
-    df_train1[f"PerAttendingPhysician Avg_{column}"] = df_train1.groupby('AttendingPhysician')[column].transform('mean')
-    df_test1[f"PerAttendingPhysician Avg_{column}"] = df_test1.groupby('AttendingPhysician')[column].transform('mean')
+        df_train1[f"PerAttendingPhysician Avg_{column}"] = df_train1.groupby('AttendingPhysician')[column].transform('mean')
+        df_test1[f"PerAttendingPhysician Avg_{column}"] = df_test1.groupby('AttendingPhysician')[column].transform('mean')
 
-df_train1.drop(columns=['ClmAdmitDiagnosisCode', 'Provider', 'State', 'Race', 'Gender', 'County', 'AdmissionDt', 'AttendingPhysician', 'OtherPhysician', 'OperatingPhysician',
-                        'DischargeDt', 'ClaimID', 'ClaimEndDt', 'DiagnosisGroupCode', 'ClaimStartDt', 'BeneID', 'ClaimID'], axis=1, inplace=True)
+    df_train1.drop(columns=['ClmAdmitDiagnosisCode', 'Provider', 'State', 'Race', 'Gender', 'County', 'AdmissionDt', 'AttendingPhysician', 'OtherPhysician', 'OperatingPhysician',
+                            'DischargeDt', 'ClaimID', 'ClaimEndDt', 'DiagnosisGroupCode', 'ClaimStartDt', 'BeneID', 'ClaimID'], axis=1, inplace=True)
 
-df_test1.drop(columns=['ClmAdmitDiagnosisCode', 'State', 'Race', 'County', 'Gender', 'AdmissionDt', 'DiagnosisGroupCode', 'OperatingPhysician', 'DischargeDt', 'AttendingPhysician', 'OtherPhysician',
-                       'ClaimID', 'ClaimEndDt', 'ClaimStartDt', 'ClaimID'], axis=1, inplace=True)
+    df_test1.drop(columns=['ClmAdmitDiagnosisCode', 'State', 'Race', 'County', 'Gender', 'AdmissionDt', 'DiagnosisGroupCode', 'OperatingPhysician', 'DischargeDt', 'AttendingPhysician', 'OtherPhysician',
+                           'ClaimID', 'ClaimEndDt', 'ClaimStartDt', 'ClaimID'], axis=1, inplace=True)
 
-#fraud reported
-px.histogram(df_train1, x="PotentialFraud",color='PotentialFraud',title="PotentialFraud", height=500, width=700)
+    df_train1['PotentialFraud'] = df_train1['PotentialFraud'].replace({'No':0, 'Yes': 1})
 
-px.histogram(df_train1, x="RenalDiseaseIndicator",color='PotentialFraud',title="RenalDiseaseIndicator", height=500, width=700)
+    return df_train1, df_test1
 
-px.histogram(df_train1, x="Admitted",color='PotentialFraud',title="Admitted", height=500, width=700)
 
-px.histogram(df_train1, x="ClmProcedureCodeIndex",color='PotentialFraud',title="ChronicDiseaseIndex", height=500, width=700)
+# Data preprocessing
 
-px.histogram(df_train1, x="ClmDiagnosisCodeIndex",color='PotentialFraud',title="ChronicDiseaseIndex", height=500, width=700)
+def build_training_matrices(df_train1, df_test1):
+    """Split, aggregate, one-hot encode and resample into (numeric, one_hot) train/val/test matrices"""
+    from sklearn.model_selection import train_test_split
+    from sklearn.preprocessing import OneHotEncoder
 
-df_train1['PotentialFraud'] = df_train1['PotentialFraud'].replace({'No':0, 'Yes': 1})
+    df_train1 = df_train1.copy()
+    df_test1 = df_test1.copy()
 
-"""**Data Preprocessing**"""
+    # Split BEFORE feature engineering to prevent data leakage
+    df_train2 , df_val = train_test_split(df_train1, test_size=0.10, random_state=42, stratify=df_train1['PotentialFraud'])
 
-from sklearn.preprocessing import LabelEncoder
-from sklearn.preprocessing import MinMaxScaler
-from sklearn.preprocessing import LabelEncoder
-from sklearn.model_selection import train_test_split
-from sklearn.preprocessing import OneHotEncoder
+    # Now perform feature engineering on training data only
+    def create_aggregated_features(df):
+        """Create aggregated features from training data to prevent data leakage"""
+        # Per Provider averages
+        provider_cols = ["InscClaimAmtReimbursed", "DeductibleAmtPaid", "IPAnnualReimbursementAmt",
+                         "IPAnnualDeductibleAmt", "OPAnnualReimbursementAmt", "OPAnnualDeductibleAmt",
+                         "Age", "NoOfMonths_PartACov", "NoOfMonths_PartBCov", "DurationofClaim", "NumberofDaysAdmitted"]
 
-# Split BEFORE feature engineering to prevent data leakage
-df_train2 , df_val = train_test_split(df_train1, test_size=0.10, random_state=42, stratify=df_train1['PotentialFraud'])
+        for col in provider_cols:
+            if 'Provider' in df.columns:
+                df[f"PerProviderAvg_{col}"] = df.groupby('Provider')[col].transform('mean')
 
-# Now perform feature engineering on training data only
-def create_aggregated_features(df):
-    """Create aggregated features from training data to prevent data leakage"""
-    # Per Provider averages
-    provider_cols = ["InscClaimAmtReimbursed", "DeductibleAmtPaid", "IPAnnualReimbursementAmt",
+        # Per BeneID averages
+        bene_cols = ["InscClaimAmtReimbursed", "DeductibleAmtPaid", "IPAnnualReimbursementAmt",
                      "IPAnnualDeductibleAmt", "OPAnnualReimbursementAmt", "OPAnnualDeductibleAmt",
-                     "Age", "NoOfMonths_PartACov", "NoOfMonths_PartBCov", "DurationofClaim", "NumberofDaysAdmitted"]
-
-    for col in provider_cols:
-        if 'Provider' in df.columns:
-            df[f"PerProviderAvg_{col}"] = df.groupby('Provider')[col].transform('mean')
-
-    # Per BeneID averages
-    bene_cols = ["InscClaimAmtReimbursed", "DeductibleAmtPaid", "IPAnnualReimbursementAmt",
-                 "IPAnnualDeductibleAmt", "OPAnnualReimbursementAmt", "OPAnnualDeductibleAmt",
-                 "DurationofClaim", "NumberofDaysAdmitted"]
-
-    for col in bene_cols:
-        if 'BeneID' in df.columns:
-            df[f"PerBeneIDAvg_{col}"] = df.groupby('BeneID')[col].transform('mean')
-
-    # Per Attending Physician averages
-    for col in bene_cols:
-        if 'AttendingPhysician' in df.columns:
-            df[f"PerAttendingPhysicianAvg_{col}"] = df.groupby('AttendingPhysician')[col].transform('mean')
-
-    return df
-
-# Apply feature engineering to training data
-df_train2 = create_aggregated_features(df_train2)
-df_val = create_aggregated_features(df_val)
-df_test1 = create_aggregated_features(df_test1)
-
-# Drop unnecessary columns
-cols_to_drop = ['ClmAdmitDiagnosisCode', 'Provider', 'State', 'Race', 'Gender', 'County',
-                'AdmissionDt', 'AttendingPhysician', 'OtherPhysician', 'OperatingPhysician',
-                'DischargeDt', 'ClaimID', 'ClaimEndDt', 'DiagnosisGroupCode', 'ClaimStartDt', 'BeneID']
-
-# Handle duplicate ClaimID in drop list
-cols_to_drop = [col for col in cols_to_drop if col in df_train2.columns]
-
-df_train2 = df_train2.drop(columns=cols_to_drop, axis=1)
-df_val = df_val.drop(columns=cols_to_drop, axis=1)
-df_test1 = df_test1.drop(columns=[col for col in cols_to_drop if col in df_test1.columns], axis=1)
-
-y_train = df_train2.pop('PotentialFraud')
-X_train = df_train2
-
-y_val = df_val.pop('PotentialFraud')
-X_val = df_val
-
-X_test = df_test1
-
-print("After fixing data leakage:")
-print(f"X_train shape: {X_train.shape}, X_val shape: {X_val.shape}, X_test shape: {X_test.shape}")
-
-categorical_cols = [col for col in X_train.columns if col.startswith('ChronicCond_')]
-
-encoder = OneHotEncoder(handle_unknown='ignore')
-encoder.fit(X_train[categorical_cols])
-encoded_data_train = encoder.transform(X_train[categorical_cols])
-encoded_data_test = encoder.transform(X_test[categorical_cols])
-encoded_data_val = encoder.transform(X_val[categorical_cols])
-
-encoded_df_train = pd.DataFrame(encoded_data_train.toarray(), columns=encoder.get_feature_names_out())
-encoded_df_test = pd.DataFrame(encoded_data_test.toarray(), columns=encoder.get_feature_names_out())
-encoded_df_val = pd.DataFrame(encoded_data_val.toarray(), columns=encoder.get_feature_names_out())
-
-X_train = X_train.reset_index(drop=True)
-X_test = X_test.reset_index(drop=True)
-X_val = X_val.reset_index(drop=True)
-
-X_train = pd.concat([X_train.drop(categorical_cols, axis=1), encoded_df_train], axis=1)
-X_test = pd.concat([X_test.drop(categorical_cols, axis=1), encoded_df_test], axis=1)
-X_val = pd.concat([X_val.drop(categorical_cols, axis=1), encoded_df_val], axis=1)
-
-# Apply SMOTE if available
-if SMOTE_AVAILABLE:
-    counter = Counter(y_train)
-    print('Before SMOTE:', counter)
-    smt = SMOTE(random_state=42)
-    X_train, y_train = smt.fit_resample(X_train, y_train)
-    counter = Counter(y_train)
-    print('After SMOTE:', counter)
-    
-    # Remove any duplicates created by SMOTE
-    train_df = pd.concat([X_train, pd.Series(y_train, name='target')], axis=1)
-    train_df = train_df.drop_duplicates()
-    y_train = train_df['target'].values
-    X_train = train_df.drop('target', axis=1)
-    print(f'After removing SMOTE duplicates: {X_train.shape[0]} samples')
-else:
-    print("SMOTE not available, proceeding without oversampling")
-
-# Check for potential data leakage (e.g., identical rows in train and val)
-duplicates_train_val = pd.concat([X_train, X_val]).duplicated().sum()
-print(f"Number of duplicate rows between train and val: {duplicates_train_val}")
-
-X_train.head()
-
-import warnings
-warnings.filterwarnings('ignore')
-
-from sklearn.model_selection import cross_val_score
-from sklearn.linear_model import LogisticRegression
-from sklearn.tree import DecisionTreeClassifier
-from sklearn.ensemble import RandomForestClassifier, GradientBoostingClassifier
-from sklearn.metrics import accuracy_score, precision_score, recall_score, f1_score, roc_auc_score
-from sklearn.metrics import classification_report, confusion_matrix
-
-# Only import XGBoost if available
-if XGB_AVAILABLE:
-    import xgboost as xgb
-if SHAP_AVAILABLE:
-    import shap
-if LIME_AVAILABLE:
-    from lime.lime_tabular import LimeTabularExplainer
+                     "DurationofClaim", "NumberofDaysAdmitted"]
+
+        for col in bene_cols:
+            if 'BeneID' in df.columns:
+                df[f"PerBeneIDAvg_{col}"] = df.groupby('BeneID')[col].transform('mean')
+
+        # Per Attending Physician averages
+        for col in bene_cols:
+            if 'AttendingPhysician' in df.columns:
+                df[f"PerAttendingPhysicianAvg_{col}"] = df.groupby('AttendingPhysician')[col].transform('mean')
+
+        return df
+
+    # Apply feature engineering to training data
+    df_train2 = create_aggregated_features(df_train2)
+    df_val = create_aggregated_features(df_val)
+    df_test1 = create_aggregated_features(df_test1)
+
+    # Drop unnecessary columns
+    cols_to_drop = ['ClmAdmitDiagnosisCode', 'Provider', 'State', 'Race', 'Gender', 'County',
+                    'AdmissionDt', 'AttendingPhysician', 'OtherPhysician', 'OperatingPhysician',
+                    'DischargeDt', 'ClaimID', 'ClaimEndDt', 'DiagnosisGroupCode', 'ClaimStartDt', 'BeneID']
+
+    # Handle duplicate ClaimID in drop list
+    cols_to_drop = [col for col in cols_to_drop if col in df_train2.columns]
+
+    df_train2 = df_train2.drop(columns=cols_to_drop, axis=1)
+    df_val = df_val.drop(columns=cols_to_drop, axis=1)
+    df_test1 = df_test1.drop(columns=[col for col in cols_to_drop if col in df_test1.columns], axis=1)
+
+    y_train = df_train2.pop('PotentialFraud')
+    X_train = df_train2
+
+    y_val = df_val.pop('PotentialFraud')
+    X_val = df_val
+
+    X_test = df_test1
+
+    print("After fixing data leakage:")
+    print(f"X_train shape: {X_train.shape}, X_val shape: {X_val.shape}, X_test shape: {X_test.shape}")
+
+    print(f"Peak memory before encoding: {peak_rss_mb():.1f} MB")
+
+    categorical_cols = [col for col in X_train.columns if col.startswith('ChronicCond_')]
+    numeric_cols = [col for col in X_train.columns if col not in categorical_cols]
+
+    # One-hot ChronicCond columns stay CSR from here through resampling; numeric columns stay dense
+    encoder = OneHotEncoder(handle_unknown='ignore', dtype=np.float32)
+    encoder.fit(X_train[categorical_cols])
+
+    def to_blocks(df):
+        """Dense float32 numeric columns and CSR one-hot ChronicCond columns"""
+        numeric = df.reindex(columns=numeric_cols).to_numpy(dtype=np.float32)
+        return numeric, encoder.transform(df[categorical_cols]).tocsr()
+
+    feature_names = numeric_cols + list(encoder.get_feature_names_out())
+
+    X_train = to_blocks(X_train)
+    X_test = to_blocks(X_test)
+    X_val = to_blocks(X_val)
+    y_train = y_train.to_numpy()
+    y_val = y_val.to_numpy()
+
+    # Apply SMOTE if available
+    if SMOTE_AVAILABLE:
+        from imblearn.over_sampling import SMOTE
+        counter = Counter(y_train)
+        print('Before SMOTE:', counter)
+        smt = SMOTE(random_state=42)
+        X_resampled, y_train = smt.fit_resample(stack_sparse(X_train), y_train)
+        X_resampled = sp.csr_matrix(X_resampled, dtype=np.float32)
+        y_train = np.asarray(y_train)
+        counter = Counter(y_train)
+        print('After SMOTE:', counter)
+
+        # Remove any duplicates created by SMOTE, hashing sparse rows instead of densifying
+        keep = ~pd.Series(sparse_row_hashes(X_resampled, y_train)).duplicated().to_numpy()
+        X_train = split_blocks(X_resampled[keep], len(numeric_cols))
+        y_train = y_train[keep]
+        del X_resampled
+        print(f'After removing SMOTE duplicates: {len(y_train)} samples')
+    else:
+        print("SMOTE not available, proceeding without oversampling")
+
+    # Check for potential data leakage (e.g., identical rows in train and val)
+    row_hashes = np.concatenate([sparse_row_hashes(stack_sparse(X_train)),
+                                 sparse_row_hashes(stack_sparse(X_val))])
+    duplicates_train_val = pd.Series(row_hashes).duplicated().sum()
+    print(f"Number of duplicate rows between train and val: {duplicates_train_val}")
+
+    numeric, one_hot = X_train
+    print(f"X_train: {numeric.shape[0]} rows, {numeric.shape[1]} dense numeric columns "
+          f"({numeric.nbytes / 1024 ** 2:.1f} MB), {one_hot.shape[1]} one-hot columns with "
+          f"{one_hot.nnz} stored values")
+    print(f"Peak memory after encoding and resampling: {peak_rss_mb():.1f} MB")
+
+    return X_train, y_train, X_val, y_val, X_test, feature_names
+
+def prepare_matrices(data_dir=DATA_DIR, cache=None):
+    """Cached stages for the claim frames and the encoded train/val/test matrices.
+
+    Cleaned claims and encoded matrices are keyed by the raw files and the code
+    that builds them, so iterating on the models skips data preparation.
+    """
+    cache = cache or FeatureCache()
+    claim_frames = cache.stage('claim_frames', lambda: build_claim_frames(data_dir),
+                               files=[os.path.join(data_dir, name) for name in DATA_FILES],
+                               code=[build_claim_frames])
+    # claim_frames holds a (train, test) pair; unpack it into the two arguments
+    training_matrices = cache.stage('training_matrices',
+                                    lambda frames: build_training_matrices(*frames),
+                                    upstream=[claim_frames],
+                                    code=[build_training_matrices, sparse_row_hashes, _mix64,
+                                          stack_sparse, split_blocks],
+                                    params={'smote': SMOTE_AVAILABLE})
+    return claim_frames, training_matrices
+
+def sparse_estimators():
+    """Estimators that fit on CSR input and treat unstored entries as zeros.
+
+    XGBoost is deliberately absent: it treats unstored entries as missing, while
+    the API scores dense rows where the same zeros are real zeros.
+    """
+    from sklearn.ensemble import RandomForestClassifier, GradientBoostingClassifier
+    from sklearn.linear_model import LogisticRegression
+    from sklearn.tree import DecisionTreeClassifier
+
+    return (LogisticRegression, DecisionTreeClassifier,
+            RandomForestClassifier, GradientBoostingClassifier)
+
+def as_model_input(model, X):
+    """CSR for estimators in sparse_estimators(), otherwise one dense float32 array"""
+    if isinstance(model, sparse_estimators()):
+        return stack_sparse(X)
+    return stack_dense(X)
 
 def evaluate_model(model, X_train, X_val, y_train, y_val, model_name):
     """Evaluate model performance with multiple metrics"""
+    from sklearn.metrics import accuracy_score, precision_score, recall_score, f1_score, roc_auc_score
+
+    X_train = as_model_input(model, X_train)
+    X_val = as_model_input(model, X_val)
     model.fit(X_train, y_train)
 
     # Predictions
@@ -419,73 +501,117 @@ def evaluate_model(model, X_train, X_val, y_train, y_val, model_name):
 
     return model, metrics
 
-# Model comparison
-models_to_compare = {
-    'LogisticRegression': LogisticRegression(random_state=42, max_iter=1000),
-    'RandomForest': RandomForestClassifier(n_estimators=100, random_state=42, max_depth=15),
-}
+def candidate_models(names=None):
+    """The classifiers compared during training, optionally only those in `names`"""
+    from sklearn.ensemble import RandomForestClassifier, GradientBoostingClassifier
+    from sklearn.linear_model import LogisticRegression
 
-if XGB_AVAILABLE:
-    models_to_compare['XGBoost'] = xgb.XGBClassifier(random_state=42, eval_metric='logloss')
-
-models_to_compare['GradientBoosting'] = GradientBoostingClassifier(random_state=42)
+    models = {
+        'LogisticRegression': LogisticRegression(random_state=42, max_iter=1000),
+        'RandomForest': RandomForestClassifier(n_estimators=100, random_state=42, max_depth=15),
+    }
+    if XGB_AVAILABLE:
+        import xgboost as xgb
+        models['XGBoost'] = xgb.XGBClassifier(random_state=42, eval_metric='logloss')
+    models['GradientBoosting'] = GradientBoostingClassifier(random_state=42)
+
+    if names:
+        unknown = [name for name in names if name not in models]
+        if unknown:
+            raise ValueError(f"Unknown or unavailable models: {', '.join(unknown)}")
+        models = {name: models[name] for name in names}
+
+    for model in models.values():
+        runtime_config.set_model_threads(model, thread_budget().model_threads)
+    return models
+
+def train_models(X_train, y_train, X_val, y_val, model_names=None, cross_validate=True):
+    """Compare the candidate models, pick the best and report its validation performance"""
+    from sklearn.metrics import accuracy_score, precision_score, recall_score, f1_score, roc_auc_score
+    from sklearn.metrics import classification_report
+    from sklearn.model_selection import cross_val_score
+
+    print("=== Model Comparison ===")
+    model_results = []
+    trained_models = {}
+
+    for name, model in candidate_models(model_names).items():
+        try:
+            trained_model, metrics = evaluate_model(model, X_train, X_val, y_train, y_val, name)
+            trained_models[name] = trained_model
+            model_results.append(metrics)
+            print(f"  Train AUC = {metrics['Train AUC']:.4f}, Train F1 = {metrics['Train F1']:.4f}")
+            print(f"  Val AUC = {metrics['Val AUC']:.4f}, Val F1 = {metrics['Val F1']:.4f}")
+        except Exception as e:
+            print(f"Error training {name}: {e}")
+
+    # Select best model (XGBoost if available, otherwise RandomForest)
+    if XGB_AVAILABLE and 'XGBoost' in trained_models:
+        best_model_name = 'XGBoost'
+    elif 'RandomForest' in trained_models:
+        best_model_name = 'RandomForest'
+    else:
+        best_model_name = list(trained_models.keys())[0]  # Fallback to first available model
+
+    best_model = trained_models[best_model_name]
+    print(f"\nSelected best model: {best_model_name}")
+
+    # Cross-validation evaluation (no hyperparameter tuning to save time)
+    cv_scores = None
+    if cross_validate:
+        cv_scores = cross_val_score(best_model, as_model_input(best_model, X_train), y_train, cv=5,
+                                    scoring='roc_auc', n_jobs=thread_budget().training_jobs)
+        print(f"Cross-validation AUC scores: {cv_scores}")
+        print(f"Mean CV AUC: {cv_scores.mean():.4f} (+/- {cv_scores.std() * 2:.4f})")
+
+    # Final evaluation
+    final_pred = best_model.predict(as_model_input(best_model, X_val))
+    final_proba = best_model.predict_proba(as_model_input(best_model, X_val))[:, 1]
+
+    print(f"Peak memory after model fitting: {peak_rss_mb():.1f} MB")
+
+    print("\n=== Final Model Performance ===")
+    print(f"Accuracy: {accuracy_score(y_val, final_pred):.4f}")
+    print(f"Precision: {precision_score(y_val, final_pred):.4f}")
+    print(f"Recall: {recall_score(y_val, final_pred):.4f}")
+    print(f"F1-Score: {f1_score(y_val, final_pred):.4f}")
+    print(f"AUC: {roc_auc_score(y_val, final_proba):.4f}")
+
+    print("\nClassification Report:")
+    print(classification_report(y_val, final_pred))
+
+    return {
+        'model': best_model,
+        'model_name': best_model_name,
+        'results': model_results,
+        'cv_auc': float(cv_scores.mean()) if cv_scores is not None else None,
+        'val_auc': float(roc_auc_score(y_val, final_proba)),
+    }
 
-print("=== Model Comparison ===")
-model_results = []
-trained_models = {}
+def build_lime_explainer(X_train, feature_names):
+    """LIME explainer over the training data, or None when LIME is not installed"""
+    if not LIME_AVAILABLE:
+        return None
+    from lime.lime_tabular import LimeTabularExplainer
 
-for name, model in models_to_compare.items():
+    # LIME needs dense training data; use compact float32 rather than float64
+    return LimeTabularExplainer(
+        stack_dense(X_train),
+        feature_names=feature_names,
+        class_names=['Not Fraud', 'Fraud'],
+        discretize_continuous=True
+    )
+
+def build_attribution_explainer(model, X_train, feature_names):
+    """Cheapest exact attribution explainer for the model, or None when none applies"""
+    numeric, one_hot = X_train
     try:
-        trained_model, metrics = evaluate_model(model, X_train, X_val, y_train, y_val, name)
-        trained_models[name] = trained_model
-        model_results.append(metrics)
-        print(f"  Train AUC = {metrics['Train AUC']:.4f}, Train F1 = {metrics['Train F1']:.4f}")
-        print(f"  Val AUC = {metrics['Val AUC']:.4f}, Val F1 = {metrics['Val F1']:.4f}")
-    except Exception as e:
-        print(f"Error training {name}: {e}")
-
-# Select best model (XGBoost if available, otherwise RandomForest)
-if XGB_AVAILABLE and 'XGBoost' in trained_models:
-    best_model_name = 'XGBoost'
-elif 'RandomForest' in trained_models:
-    best_model_name = 'RandomForest'
-else:
-    best_model_name = list(trained_models.keys())[0]  # Fallback to first available model
-
-best_model = trained_models[best_model_name]
-print(f"\nSelected best model: {best_model_name}")
-
-print(f"\nSelected best model: {best_model_name}")
-
-# Cross-validation evaluation (no hyperparameter tuning to save time)
-cv_scores = cross_val_score(best_model, X_train, y_train, cv=5, scoring='roc_auc')
-print(f"Cross-validation AUC scores: {cv_scores}")
-print(f"Mean CV AUC: {cv_scores.mean():.4f} (+/- {cv_scores.std() * 2:.4f})")
-
-# Final evaluation
-final_pred = best_model.predict(X_val)
-final_proba = best_model.predict_proba(X_val)[:, 1]
-
-print("\n=== Final Model Performance ===")
-print(f"Accuracy: {accuracy_score(y_val, final_pred):.4f}")
-print(f"Precision: {precision_score(y_val, final_pred):.4f}")
-print(f"Recall: {recall_score(y_val, final_pred):.4f}")
-print(f"F1-Score: {f1_score(y_val, final_pred):.4f}")
-print(f"AUC: {roc_auc_score(y_val, final_proba):.4f}")
-
-print("\nClassification Report:")
-print(classification_report(y_val, final_pred))
-
-import random
-import joblib
-import json
-
-lime_explainer = LimeTabularExplainer(
-    X_train.values,
-    feature_names=X_train.columns.tolist(),
-    class_names=['Not Fraud', 'Fraud'],
-    discretize_continuous=True
-)
+        # Linear attributions are measured from the mean training claim
+        return get_explainer(model, feature_names, background_mean=np.concatenate(
+            [numeric.mean(axis=0), np.asarray(one_hot.mean(axis=0)).ravel()]))
+    except ValueError as e:
+        print(f"No attribution explainer: {e}")
+        return None
 
 def make_sentence(feature, weight):
     templates_pos = [
@@ -503,98 +629,213 @@ def make_sentence(feature, weight):
     else:
         return random.choice(templates_neg)
 
-def explain_single_claim(data_row, top_n=3):
-    fraud_proba = best_model.predict_proba(data_row.to_frame().T)[0,1]
-    pred_class = best_model.predict(data_row.to_frame().T)[0]
+def explain_single_claim(model, data_row, feature_names, lime_explainer=None, top_n=3,
+                         attribution_explainer=None):
+    # The model was fitted on unnamed columns, so score the row as a plain float32 array
+    row = data_row.to_numpy(dtype=np.float32).reshape(1, -1)
+    fraud_proba = model.predict_proba(row)[0,1]
+    pred_class = model.predict(row)[0]
 
     if pred_class == 0:
         return {"prediction": "Not Fraud", "fraud_probability": fraud_proba, "explanation": []}
 
-    if LIME_AVAILABLE:
+    if lime_explainer is not None:
         exp = lime_explainer.explain_instance(
             data_row.values,
-            best_model.predict_proba,
+            model.predict_proba,
             num_features=top_n
         )
         explanation = [make_sentence(feat, weight) for feat, weight in exp.as_list()]
-    else:
-        # Fallback to SHAP if LIME not available
-        explainer = shap.TreeExplainer(best_model)
-        shap_values = explainer.shap_values(data_row.to_frame().T)
+    elif attribution_explainer is not None or SHAP_AVAILABLE:
+        # Fallback to SHAP-style attributions if LIME not available; explainers are cached per model
+        explainer = attribution_explainer or get_explainer(model, feature_names)
+        attributions = explainer.explain(row)
         # Simple explanation based on top features
-        feature_importance = dict(zip(X_train.columns, abs(shap_values[1][0])))
+        feature_importance = dict(zip(feature_names, abs(attributions.values[0])))
         top_features = sorted(feature_importance.items(), key=lambda x: x[1], reverse=True)[:top_n]
         explanation = [f"Feature '{feat}' contributed significantly to the prediction" for feat, _ in top_features]
+    else:
+        explanation = []
 
     return {"prediction": "Fraud", "fraud_probability": fraud_proba, "explanation": explanation}
 
-def explain_batch_claims(dataframe, top_n=3):
+def explain_batch_claims(model, dataframe, feature_names, lime_explainer=None, top_n=3,
+                         attribution_explainer=None):
     results = []
     for i in range(len(dataframe)):
         row = dataframe.iloc[i]
-        results.append(explain_single_claim(row, top_n=top_n))
+        results.append(explain_single_claim(model, row, feature_names, lime_explainer, top_n=top_n,
+                                            attribution_explainer=attribution_explainer))
     return results
 
-user_row = X_val.iloc[0].to_dict()
-single_df = pd.DataFrame([user_row], columns=X_val.columns)
-
-single_result = explain_single_claim(single_df.iloc[0])
-print("\n=== User Single Claim ===")
-print("Prediction:", single_result["prediction"])
-print("Fraud Probability:", single_result["fraud_probability"])
-for s in single_result["explanation"]:
-    print("-", s)
-
-# Example: Explain a batch of validation samples (first 5)
-batch_df = X_val.head(5).copy()
-batch_results = explain_batch_claims(batch_df)
-
-print(f"\n=== Batch Claims Explanation (First 5 validation samples) ===")
-for i, res in enumerate(batch_results):
-    print(f"\nClaim {i}: {res['prediction']} (Prob: {res['fraud_probability']:.2f})")
-    for s in res["explanation"]:
+def explain_examples(model, X_val, feature_names, lime_explainer=None, attribution_explainer=None):
+    """Print explanations for a single claim and the first five validation claims"""
+    # The explanation helpers work row by row on frames, so densify only the rows they need
+    numeric, one_hot = X_val
+    X_val_head = pd.DataFrame(stack_dense((numeric[:5], one_hot[:5])), columns=feature_names)
+
+    single_result = explain_single_claim(model, X_val_head.iloc[0], feature_names, lime_explainer,
+                                         attribution_explainer=attribution_explainer)
+    print("\n=== User Single Claim ===")
+    print("Prediction:", single_result["prediction"])
+    print("Fraud Probability:", single_result["fraud_probability"])
+    for s in single_result["explanation"]:
         print("-", s)
 
-# Save model and artifacts
-print("\n=== Saving Model and Artifacts ===")
-joblib.dump(best_model, "fraud_model.pkl")
-
-# Save LIME explainer if available
-if LIME_AVAILABLE:
-    try:
-        lime_explainer = LimeTabularExplainer(
-            X_train.values,
-            feature_names=X_train.columns.tolist(),
-            class_names=['Not Fraud', 'Fraud'],
-            discretize_continuous=True
-        )
-        joblib.dump(lime_explainer, "lime_explainer.pkl")
-        print("LIME explainer saved")
-    except Exception as e:
-        print(f"Failed to save LIME explainer: {e}")
-        print("Skipping LIME explainer save")
-else:
-    print("LIME not available, skipping explainer save")
-
-# Save feature columns
-with open("columns.json", "w") as f:
-    json.dump(list(X_train.columns), f)
-
-# Save model metadata
-model_metadata = {
-    'model_type': best_model_name,
-    'best_params': 'no hyperparameter tuning (default params)',
-    'cv_auc': cv_scores.mean(),
-    'val_auc': roc_auc_score(y_val, final_proba),
-    'features': list(X_train.columns),
-    'lime_available': LIME_AVAILABLE
-}
-
-with open("model_metadata.json", "w") as f:
-    json.dump(model_metadata, f, indent=2)
-
-print("Model and metadata saved for backend use.")
-print(f"- fraud_model.pkl: Trained {best_model_name} model")
-print(f"- columns.json: Feature column names")
-print(f"- model_metadata.json: Model information and performance")
+    batch_results = explain_batch_claims(model, X_val_head, feature_names, lime_explainer,
+                                         attribution_explainer=attribution_explainer)
+
+    print(f"\n=== Batch Claims Explanation (First 5 validation samples) ===")
+    for i, res in enumerate(batch_results):
+        print(f"\nClaim {i}: {res['prediction']} (Prob: {res['fraud_probability']:.2f})")
+        for s in res["explanation"]:
+            print("-", s)
+
+def save_artifacts(training, feature_names, lime_explainer=None, output_dir='.'):
+    """Save the model, LIME explainer, feature columns and metadata for the API"""
+    print("\n=== Saving Model and Artifacts ===")
+    os.makedirs(output_dir, exist_ok=True)
+    joblib.dump(training['model'], os.path.join(output_dir, "fraud_model.pkl"))
+
+    # Save LIME explainer if available
+    if lime_explainer is not None:
+        try:
+            joblib.dump(lime_explainer, os.path.join(output_dir, "lime_explainer.pkl"))
+            print("LIME explainer saved")
+        except Exception as e:
+            print(f"Failed to save LIME explainer: {e}")
+            print("Skipping LIME explainer save")
+    else:
+        print("LIME not available, skipping explainer save")
+
+    # Save feature columns
+    with open(os.path.join(output_dir, "columns.json"), "w") as f:
+        json.dump(feature_names, f)
+
+    # Save model metadata
+    model_metadata = {
+        'model_type': training['model_name'],
+        'best_params': 'no hyperparameter tuning (default params)',
+        'cv_auc': training['cv_auc'],
+        'val_auc': training['val_auc'],
+        'features': feature_names,
+        'lime_available': LIME_AVAILABLE
+    }
 
+    with open(os.path.join(output_dir, "model_metadata.json"), "w") as f:
+        json.dump(model_metadata, f, indent=2)
+
+    print("Model and metadata saved for backend use.")
+    print(f"- fraud_model.pkl: Trained {training['model_name']} model")
+    print(f"- columns.json: Feature column names")
+    print(f"- model_metadata.json: Model information and performance")
+
+def load_artifacts(feature_names, output_dir='.'):
+    """Model saved by save_artifacts, checked against the current feature columns"""
+    model_path = os.path.join(output_dir, "fraud_model.pkl")
+    columns_path = os.path.join(output_dir, "columns.json")
+    if not os.path.exists(model_path) or not os.path.exists(columns_path):
+        raise FileNotFoundError(f"No saved model in {output_dir}; run the train and save stages first")
+
+    with open(columns_path) as f:
+        saved_columns = json.load(f)
+    if saved_columns != list(feature_names):
+        raise ValueError(f"The model in {output_dir} was trained on different feature columns; "
+                         f"run the train and save stages again")
+    print(f"Loaded saved model from {model_path}")
+    return joblib.load(model_path)
+
+def eda_report(df_train1, path):
+    """Write the exploratory figures from the original notebook to one HTML file"""
+    import plotly.express as px
+
+    inpatient = df_train1[df_train1['Admitted'] == 1]
+    figures = [
+        px.histogram(inpatient, x='NumberofDaysAdmitted', title='NumberofDaysAdmitted', width=600, height=400),
+        px.box(inpatient, x='NumberofDaysAdmitted', width=600, height=400),
+        px.histogram(inpatient, x='DurationofClaim', title='DurationofClaim', width=600, height=400),
+    ]
+    for column in ['PotentialFraud', 'RenalDiseaseIndicator', 'Admitted',
+                   'ClmProcedureCodeIndex', 'ClmDiagnosisCodeIndex']:
+        figures.append(px.histogram(df_train1, x=column, color='PotentialFraud', title=column,
+                                    height=500, width=700))
+
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'w') as f:
+        f.write('<html><head><meta charset="utf-8"></head><body>\n')
+        for i, figure in enumerate(figures):
+            f.write(figure.to_html(full_html=False, include_plotlyjs='cdn' if i == 0 else False))
+        f.write('</body></html>\n')
+    print(f"EDA report saved to {path}")
+
+STAGES = ['prepare', 'train', 'explain', 'save', 'report']
+DEFAULT_STAGES = ['prepare', 'train', 'explain', 'save']
+
+# Stages pull in the stage they depend on; the report only needs the cached claim frames.
+# explain uses the model saved by an earlier run unless train is selected too
+STAGE_REQUIRES = {'train': 'prepare', 'explain': 'prepare', 'save': 'train'}
+
+def resolve_stages(requested):
+    """Requested stages plus their dependencies, in pipeline order"""
+    stages = set()
+    for stage in requested:
+        while stage is not None and stage not in stages:
+            stages.add(stage)
+            stage = STAGE_REQUIRES.get(stage)
+    return [stage for stage in STAGES if stage in stages]
+
+def run(stages=DEFAULT_STAGES, data_dir=DATA_DIR, model_names=None, cross_validate=True,
+        output_dir='.', report_path='./reports/eda.html'):
+    """Run the selected pipeline stages and return what they produced"""
+    stages = resolve_stages(stages)
+    thread_budget()
+    print(f"Running stages: {', '.join(stages)}")
+    claim_frames, training_matrices = prepare_matrices(data_dir)
+    state = {}
+
+    if 'prepare' in stages:
+        X_train, y_train, X_val, y_val, X_test, feature_names = training_matrices.value
+        state.update(feature_names=feature_names)
+
+    if 'train' in stages:
+        warnings.filterwarnings('ignore')
+        state['training'] = train_models(X_train, y_train, X_val, y_val, model_names, cross_validate)
+        model = state['training']['model']
+    elif 'explain' in stages:
+        model = load_artifacts(feature_names, output_dir)
+
+    if 'explain' in stages or 'save' in stages:
+        state['lime_explainer'] = build_lime_explainer(X_train, feature_names)
+
+    if 'explain' in stages:
+        state['attribution_explainer'] = build_attribution_explainer(model, X_train, feature_names)
+        explain_examples(model, X_val, feature_names, state['lime_explainer'],
+                         state['attribution_explainer'])
+
+    if 'save' in stages:
+        save_artifacts(state['training'], feature_names, state['lime_explainer'], output_dir)
+
+    if 'report' in stages:
+        df_train1, _ = claim_frames.value
+        eda_report(df_train1, report_path)
+
+    return state
+
+def main():
+    parser = argparse.ArgumentParser(description='Train the claim-level fraud model')
+    parser.add_argument('--stages', nargs='+', choices=STAGES, default=DEFAULT_STAGES,
+                        help='Stages to run; each also runs the stages it depends on')
+    parser.add_argument('--data-dir', default=DATA_DIR, help='Directory with the eight claim CSVs')
+    parser.add_argument('--models', nargs='+', default=None,
+                        help='Only compare these models (LogisticRegression, RandomForest, XGBoost, GradientBoosting)')
+    parser.add_argument('--no-cv', action='store_true', help='Skip cross-validating the selected model')
+    parser.add_argument('--output-dir', default='.',
+                        help='Where model artifacts are saved, and loaded from by explain without train')
+    parser.add_argument('--report-path', default='./reports/eda.html', help='EDA report location')
+    args = parser.parse_args()
+
+    run(args.stages, data_dir=args.data_dir, model_names=args.models,
+        cross_validate=not args.no_cv, output_dir=args.output_dir, report_path=args.report_path)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,289 @@
+# -*- coding: utf-8 -*-
+"""
+Healthcare Fraud Detection - Model Registry
+Loads several trained model versions, routes live traffic to a primary model and
+scores the same inputs with challenger models on a background thread
+"""
+
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+import warnings
+
+import joblib
+import numpy as np
+
+from feature_transformer import ProviderFeatureTransformer
+
+# Models fitted on DataFrames warn when scored from the transformer's plain matrices
+warnings.filterwarnings('ignore', message='X does not have valid feature names')
+
+# Model versions produced by model.py, optimal_model.py and the original notebook
+DEFAULT_MODELS = {
+    'best_model': {'path': './models/best_model.pkl'},
+    'fraud_model': {'path': './fraud_model.pkl', 'columns': './columns.json'},
+    'optimal_fraud_model': {'path': './optimal_fraud_model.pkl'},
+}
+
+DEFAULT_PRIMARY = 'best_model'
+DEFAULT_STORE = './shadow_scores.db'
+
+
+class ModelVersion:
+    """A loaded model together with the fitted transformer for its inputs"""
+
+    def __init__(self, name, model, transformer=None, path=None):
+        self.name = name
+        self.model = model
+        self.transformer = transformer
+        self.path = path
+
+    @property
+    def feature_names(self):
+        return self.transformer.feature_names if self.transformer is not None else None
+
+    def accepts(self, columns):
+        """Whether inputs with these columns carry every feature we need"""
+        if self.transformer is None:
+            return False
+        return set(self.feature_names).issubset(columns)
+
+    def transform(self, data):
+        """Build the float32 model matrix from a DataFrame or a list of records"""
+        return self.transformer.transform(data)
+
+    def predict_proba(self, X):
+        """Fraud probability for each row of an already transformed matrix"""
+        return self.model.predict_proba(X)[:, 1]
+
+    def score(self, data):
+        return self.predict_proba(self.transform(data))
+
+
+def load_model_version(name, path, columns=None):
+    """Load a pickled model artifact in any of the formats the training scripts write"""
+    artifact = joblib.load(path)
+
+    if isinstance(artifact, dict):
+        # optimal_model.py saves a dict with the model and its fitted transformer
+        model = artifact['model']
+        transformer = artifact.get('transformer')
+        if transformer is None:
+            transformer = ProviderFeatureTransformer.from_legacy(
+                artifact['feature_names'], artifact.get('scaler'))
+        return ModelVersion(name, model, transformer, path=path)
+
+    model = artifact
+    feature_names = None
+    if columns is not None and os.path.exists(columns):
+        with open(columns) as f:
+            feature_names = json.load(f)
+    elif hasattr(model, 'feature_names_in_'):
+        feature_names = list(model.feature_names_in_)
+
+    transformer = ProviderFeatureTransformer(feature_names) if feature_names is not None else None
+    return ModelVersion(name, model, transformer, path=path)
+
+
+def _input_columns(data):
+    return data.columns if hasattr(data, 'columns') else data[0].keys()
+
+
+class ShadowStore:
+    """Local SQLite store for challenger-vs-primary disagreement statistics"""
+
+    def __init__(self, path=DEFAULT_STORE):
+        self.path = path
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS shadow_scores (
+                    ts REAL,
+                    primary_model TEXT,
+                    challenger TEXT,
+                    status TEXT,
+                    n_rows INTEGER,
+                    label_agreements INTEGER,
+                    sum_abs_diff REAL,
+                    max_abs_diff REAL,
+                    latency_ms REAL
+                )
+            """)
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=5)
+
+    def record(self, rows):
+        with self._connect() as conn:
+            conn.executemany(
+                "INSERT INTO shadow_scores VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows
+            )
+
+    def summary(self):
+        """Aggregate disagreement statistics per challenger"""
+        with self._connect() as conn:
+            cursor = conn.execute("""
+                SELECT challenger, status, COUNT(*), SUM(n_rows), SUM(label_agreements),
+                       SUM(sum_abs_diff), MAX(max_abs_diff), AVG(latency_ms)
+                FROM shadow_scores
+                GROUP BY challenger, status
+            """)
+            stats = {}
+            for challenger, status, requests, rows, agreements, sum_diff, max_diff, latency in cursor:
+                entry = stats.setdefault(challenger, {})
+                if status != 'scored':
+                    entry[f'{status}_requests'] = requests
+                    continue
+                entry.update({
+                    'scored_requests': requests,
+                    'scored_rows': rows,
+                    'label_agreement_rate': agreements / rows if rows else None,
+                    'mean_abs_prob_diff': sum_diff / rows if rows else None,
+                    'max_abs_prob_diff': max_diff,
+                    'avg_latency_ms': latency,
+                })
+            return stats
+
+
+class ModelRegistry:
+    """Serves a primary model and shadow-scores challengers off the request path.
+
+    Shadow jobs go through a bounded queue. When the queue is full, or a job has
+    waited longer than ``max_shadow_age`` seconds, the job is dropped and counted
+    instead of slowing down the primary path.
+    """
+
+    def __init__(self, versions, primary=DEFAULT_PRIMARY, store=None,
+                 shadow_queue_size=64, shadow_workers=1, max_shadow_age=5.0):
+        if primary not in versions:
+            raise ValueError(f"Primary model '{primary}' is not in the registry")
+
+        self.versions = versions
+        self.primary = versions[primary]
+        self.store = store
+        self.max_shadow_age = max_shadow_age
+
+        # Challengers only ever run on the shadow thread, so keep them single-threaded.
+        # Artifacts from older library versions can load but fail here; drop those
+        # challengers rather than the service.
+        self.challengers = []
+        for name, version in versions.items():
+            if name == primary:
+                continue
+            try:
+                if hasattr(version.model, 'n_jobs'):
+                    version.model.set_params(n_jobs=1)
+            except Exception as e:
+                print(f"Skipping challenger '{name}': {e}")
+                continue
+            self.challengers.append(version)
+
+        # Counters are bumped from request threads and shadow workers alike
+        self._counts_lock = threading.Lock()
+        self.submitted = 0
+        self.dropped = 0
+        self.expired = 0
+        self._queue = queue.Queue(maxsize=shadow_queue_size)
+        self._workers = []
+
+        if self.challengers and self.store is not None:
+            for i in range(shadow_workers):
+                worker = threading.Thread(target=self._shadow_loop, name=f'shadow-{i}', daemon=True)
+                worker.start()
+                self._workers.append(worker)
+
+    @classmethod
+    def from_config(cls, config_path=None, primary=None, store_path=None, **kwargs):
+        """Build a registry from a JSON config (name -> {path, columns}) or the defaults"""
+        config_path = config_path or os.environ.get('FRAUD_MODEL_REGISTRY')
+        primary = primary or os.environ.get('FRAUD_PRIMARY_MODEL', DEFAULT_PRIMARY)
+        store_path = store_path or os.environ.get('FRAUD_SHADOW_STORE', DEFAULT_STORE)
+
+        if config_path:
+            with open(config_path) as f:
+                specs = json.load(f)
+        else:
+            specs = DEFAULT_MODELS
+
+        versions = {}
+        for name, spec in specs.items():
+            try:
+                versions[name] = load_model_version(name, spec['path'], spec.get('columns'))
+            except Exception as e:
+                # A broken challenger must not take the service down; a broken primary should
+                if name == primary:
+                    raise
+                print(f"Skipping model '{name}': {e}")
+
+        return cls(versions, primary=primary, store=ShadowStore(store_path), **kwargs)
+
+    def shadow(self, data, primary_proba):
+        """Queue inputs (DataFrame or records) and primary scores for challenger scoring; never blocks"""
+        if not self._workers:
+            return
+        try:
+            self._queue.put_nowait((time.monotonic(), data, np.asarray(primary_proba)))
+        except queue.Full:
+            with self._counts_lock:
+                self.dropped += 1
+            return
+        with self._counts_lock:
+            self.submitted += 1
+
+    def _shadow_loop(self):
+        while True:
+            job = self._queue.get()
+            if job is None:
+                break
+            enqueued_at, data, primary_proba = job
+            if time.monotonic() - enqueued_at > self.max_shadow_age:
+                with self._counts_lock:
+                    self.expired += 1
+                continue
+            try:
+                self.store.record(self._score_challengers(data, primary_proba))
+            except Exception as e:
+                print(f"Shadow scoring failed: {e}")
+
+    def _score_challengers(self, data, primary_proba):
+        rows = []
+        primary_label = primary_proba >= 0.5
+        for version in self.challengers:
+            now = time.time()
+            if not version.accepts(_input_columns(data)):
+                rows.append((now, self.primary.name, version.name, 'missing_features',
+                             len(data), 0, 0.0, 0.0, 0.0))
+                continue
+
+            start = time.perf_counter()
+            proba = version.score(data)
+            latency_ms = (time.perf_counter() - start) * 1000
+
+            diff = np.abs(proba - primary_proba)
+            agreements = int(((proba >= 0.5) == primary_label).sum())
+            rows.append((now, self.primary.name, version.name, 'scored', len(data),
+                         agreements, float(diff.sum()), float(diff.max()), latency_ms))
+        return rows
+
+    def stats(self):
+        """Shadow queue counters plus the stored disagreement summary"""
+        with self._counts_lock:
+            submitted, dropped, expired = self.submitted, self.dropped, self.expired
+        return {
+            'primary': self.primary.name,
+            'challengers': [v.name for v in self.challengers],
+            'queue_depth': self._queue.qsize(),
+            'submitted': submitted,
+            'dropped': dropped,
+            'expired': expired,
+            'disagreement': self.store.summary() if self.store is not None else {},
+        }
+
+    def close(self):
+        for _ in self._workers:
+            try:
+                self._queue.put_nowait(None)
+            except queue.Full:
+                pass
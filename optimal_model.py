@@ -4,6 +4,11 @@ Healthcare Fraud Detection - Optimized Model
 Addresses data leakage by treating this as a provider-level prediction problem
 """
 
+import runtime_config
+
+# Split the cores between parallel CV fits and each model's threads before numpy loads
+THREAD_BUDGET = runtime_config.configure('training')
+
 import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
@@ -14,13 +19,20 @@ warnings.filterwarnings('ignore')
 
 # ML imports
 from sklearn.model_selection import train_test_split, cross_val_score, StratifiedKFold
-from sklearn.preprocessing import StandardScaler, LabelEncoder
+from sklearn.preprocessing import LabelEncoder
 from sklearn.ensemble import RandomForestClassifier, GradientBoostingClassifier
 from sklearn.linear_model import LogisticRegression
 from sklearn.metrics import (classification_report, confusion_matrix, 
                            roc_auc_score, f1_score, precision_score, recall_score, accuracy_score)
+import inspect
 import joblib
 import json
+import os
+
+from feature_cache import FeatureCache
+from feature_transformer import ProviderFeatureTransformer
+from graph_features import compute_graph_features
+from provider_windows import DEFAULT_WINDOWS, ProviderClaimIndex
 
 # Optional libraries
 try:
@@ -30,29 +42,37 @@ except ImportError:
     print("XGBoost not available")
     XGB_AVAILABLE = False
 
-def load_and_merge_data():
+# Raw input files of each split, relative to the data directory
+DATA_FILES = {
+    'train': ["Train-1542865627584.csv", "Train_Beneficiarydata-1542865627584.csv",
+              "Train_Inpatientdata-1542865627584.csv", "Train_Outpatientdata-1542865627584.csv"],
+    'test': ["Test-1542969243754.csv", "Test_Beneficiarydata-1542969243754.csv",
+             "Test_Inpatientdata-1542969243754.csv", "Test_Outpatientdata-1542969243754.csv"],
+}
+
+def data_paths(split, data_dir='./content'):
+    """Paths of the provider, beneficiary, inpatient and outpatient files of a split"""
+    return [os.path.join(data_dir, name) for name in DATA_FILES[split]]
+
+def load_split(split, data_dir='./content'):
+    """Load the provider, beneficiary, inpatient and outpatient files of a split"""
+    return tuple(pd.read_csv(path) for path in data_paths(split, data_dir))
+
+def load_and_merge_data(data_dir='./content'):
     """Load all data files and merge appropriately"""
     print("Loading data files...")
     
     # Load main files
-    train_providers = pd.read_csv("./content/Train-1542865627584.csv")
-    test_providers = pd.read_csv("./content/Test-1542969243754.csv")
-    
-    train_beneficiary = pd.read_csv("./content/Train_Beneficiarydata-1542865627584.csv")
-    test_beneficiary = pd.read_csv("./content/Test_Beneficiarydata-1542969243754.csv")
-    
-    train_inpatient = pd.read_csv("./content/Train_Inpatientdata-1542865627584.csv")
-    test_inpatient = pd.read_csv("./content/Test_Inpatientdata-1542969243754.csv")
-    
-    train_outpatient = pd.read_csv("./content/Train_Outpatientdata-1542865627584.csv")
-    test_outpatient = pd.read_csv("./content/Test_Outpatientdata-1542969243754.csv")
+    train_providers, train_beneficiary, train_inpatient, train_outpatient = load_split('train', data_dir)
+    test_providers, test_beneficiary, test_inpatient, test_outpatient = load_split('test', data_dir)
     
     print(f"Loaded {len(train_providers)} training providers, {len(test_providers)} test providers")
     
     return (train_providers, test_providers, train_beneficiary, test_beneficiary,
             train_inpatient, test_inpatient, train_outpatient, test_outpatient)
 
-def create_provider_features(providers_df, beneficiary_df, inpatient_df, outpatient_df):
+def create_provider_features(providers_df, beneficiary_df, inpatient_df, outpatient_df,
+                             graph_features=True, window_days=DEFAULT_WINDOWS):
     """Create aggregated features at provider level to avoid leakage"""
     
     # Combine inpatient and outpatient data
@@ -103,6 +123,17 @@ def create_provider_features(providers_df, beneficiary_df, inpatient_df, outpati
         provider_stats['OutpatientClaims'] = provider_stats['TotalClaims'] - provider_stats['InpatientClaims']
         provider_stats['InpatientRatio'] = provider_stats['InpatientClaims'] / provider_stats['TotalClaims']
         
+        # Shared beneficiaries and physicians across providers (fraud-ring signals)
+        if graph_features:
+            provider_stats = provider_stats.join(
+                compute_graph_features(claims_df, providers=provider_stats.index), how='left')
+        
+        # Rolling 30/90/365-day views anchored on the latest ClaimStartDt
+        if window_days:
+            claim_index = ProviderClaimIndex(claims_df)
+            provider_stats = provider_stats.join(
+                claim_index.window_features(provider_stats.index, windows=window_days), how='left')
+        
     else:
         # Create empty provider stats if no claims
         provider_stats = pd.DataFrame(index=providers_df['Provider'])
@@ -185,28 +216,21 @@ def prepare_features(train_data, test_data):
     # Select numeric features (exclude Provider and target)
     feature_cols = [col for col in train_data.columns 
                    if col not in ['Provider', 'PotentialFraud'] and 
-                   train_data[col].dtype in ['int64', 'float64']]
+                   pd.api.types.is_numeric_dtype(train_data[col]) and
+                   not pd.api.types.is_bool_dtype(train_data[col])]
     
     print(f"Selected {len(feature_cols)} features for modeling")
     
-    # Handle infinite values
-    for col in feature_cols:
-        train_data[col] = train_data[col].replace([np.inf, -np.inf], np.nan)
-        test_data[col] = test_data[col].replace([np.inf, -np.inf], np.nan)
+    # Fit medians and scaling once; inf/NaN fill and column order live in the transformer
+    transformer = ProviderFeatureTransformer.fit(train_data, feature_cols)
     
-    # Fill remaining NaN values with median
-    for col in feature_cols:
-        median_val = train_data[col].median()
-        train_data[col] = train_data[col].fillna(median_val)
-        test_data[col] = test_data[col].fillna(median_val)
-    
-    X_train = train_data[feature_cols]
+    X_train = transformer.transform(train_data)
     y_train = train_data['PotentialFraud'] if 'PotentialFraud' in train_data.columns else None
-    X_test = test_data[feature_cols]
+    X_test = transformer.transform(test_data)
     
-    return X_train, y_train, X_test, feature_cols
+    return X_train, y_train, X_test, feature_cols, transformer
 
-def evaluate_models(X_train, y_train):
+def evaluate_models(X_train, y_train, transformer):
     """Evaluate multiple models with proper cross-validation"""
     
     print(f"Training on {len(X_train)} providers")
@@ -216,7 +240,8 @@ def evaluate_models(X_train, y_train):
     models = {
         'LogisticRegression': LogisticRegression(random_state=42, max_iter=1000),
         'RandomForest': RandomForestClassifier(n_estimators=200, max_depth=10, 
-                                             min_samples_split=10, random_state=42),
+                                             min_samples_split=10, random_state=42,
+                                             n_jobs=THREAD_BUDGET.model_threads),
         'GradientBoosting': GradientBoostingClassifier(n_estimators=200, max_depth=6,
                                                      learning_rate=0.1, random_state=42)
     }
@@ -224,11 +249,10 @@ def evaluate_models(X_train, y_train):
     if XGB_AVAILABLE:
         models['XGBoost'] = xgb.XGBClassifier(n_estimators=200, max_depth=6,
                                             learning_rate=0.1, random_state=42,
-                                            eval_metric='logloss')
+                                            eval_metric='logloss', n_jobs=THREAD_BUDGET.model_threads)
     
-    # Scale features
-    scaler = StandardScaler()
-    X_scaled = scaler.fit_transform(X_train)
+    # Scale features with the statistics fitted in prepare_features
+    X_scaled = transformer.apply_scaling(X_train)
     
     # Stratified K-Fold for provider-level validation
     cv = StratifiedKFold(n_splits=5, shuffle=True, random_state=42)
@@ -245,8 +269,10 @@ def evaluate_models(X_train, y_train):
         X_model = X_scaled if name == 'LogisticRegression' else X_train
         
         # Cross-validation scores
-        cv_scores = cross_val_score(model, X_model, y_train, cv=cv, scoring='roc_auc')
-        cv_f1 = cross_val_score(model, X_model, y_train, cv=cv, scoring='f1')
+        cv_scores = cross_val_score(model, X_model, y_train, cv=cv, scoring='roc_auc',
+                                    n_jobs=THREAD_BUDGET.training_jobs)
+        cv_f1 = cross_val_score(model, X_model, y_train, cv=cv, scoring='f1',
+                                n_jobs=THREAD_BUDGET.training_jobs)
         
         # Train on full data for final model
         model.fit(X_model, y_train)
@@ -258,18 +284,18 @@ def evaluate_models(X_train, y_train):
             'CV_F1_std': cv_f1.std(),
         }
         
-        trained_models[name] = (model, scaler if name == 'LogisticRegression' else None)
+        trained_models[name] = (model, name == 'LogisticRegression')
         
         print(f"  CV AUC: {cv_scores.mean():.4f} (+/- {cv_scores.std()*2:.4f})")
         print(f"  CV F1:  {cv_f1.mean():.4f} (+/- {cv_f1.std()*2:.4f})")
     
     # Select best model based on CV AUC
     best_model_name = max(results.keys(), key=lambda x: results[x]['CV_AUC_mean'])
-    best_model, best_scaler = trained_models[best_model_name]
+    best_model, best_scaled = trained_models[best_model_name]
     
     print(f"\\nBest model: {best_model_name} (CV AUC: {results[best_model_name]['CV_AUC_mean']:.4f})")
     
-    return best_model, best_scaler, best_model_name, results
+    return best_model, best_scaled, best_model_name, results
 
 def analyze_feature_importance(model, feature_names, top_n=20):
     """Analyze and display feature importance"""
@@ -306,31 +332,41 @@ def analyze_feature_importance(model, feature_names, top_n=20):
     
     return feature_imp
 
-def main():
+def provider_feature_stage(cache, split, data_dir='./content'):
+    """Cached create_provider_features stage for one split of a data directory"""
+    return cache.stage(f'provider_features_{split}',
+                       lambda: create_provider_features(*load_split(split, data_dir)),
+                       files=data_paths(split, data_dir),
+                       code=[create_provider_features, load_split,
+                             inspect.getmodule(compute_graph_features),
+                             inspect.getmodule(ProviderClaimIndex)])
+
+def main(data_dir='./content'):
     """Main execution function"""
     
-    # Load data
-    (train_providers, test_providers, train_beneficiary, test_beneficiary,
-     train_inpatient, test_inpatient, train_outpatient, test_outpatient) = load_and_merge_data()
+    # Feature stages are memoized on disk, keyed by raw file contents and stage code,
+    # so a model-only change reuses them and a changed CSV only recomputes its split
+    cache = FeatureCache()
+    train_stage = provider_feature_stage(cache, 'train', data_dir)
+    test_stage = provider_feature_stage(cache, 'test', data_dir)
+    prepared_stage = cache.stage('prepared_features', prepare_features,
+                                 upstream=[train_stage, test_stage],
+                                 code=[inspect.getmodule(ProviderFeatureTransformer)])
     
-    # Create provider-level features
+    # Create provider-level features and prepare them for modeling
     print("\\nCreating provider-level features...")
-    train_features = create_provider_features(train_providers, train_beneficiary, 
-                                            train_inpatient, train_outpatient)
-    test_features = create_provider_features(test_providers, test_beneficiary,
-                                           test_inpatient, test_outpatient)
-    
-    # Prepare features for modeling
-    X_train, y_train, X_test, feature_cols = prepare_features(train_features, test_features)
+    X_train, y_train, X_test, feature_cols, transformer = prepared_stage.value
+    test_features = test_stage.value
     
     # Evaluate models
-    best_model, best_scaler, best_model_name, results = evaluate_models(X_train, y_train)
+    best_model, best_scaled, best_model_name, results = evaluate_models(X_train, y_train, transformer)
+    transformer.scaling = best_scaled
     
     # Analyze feature importance
     feature_imp = analyze_feature_importance(best_model, feature_cols)
     
     # Make predictions on test set
-    X_test_scaled = best_scaler.transform(X_test) if best_scaler else X_test
+    X_test_scaled = transformer.apply_scaling(X_test) if best_scaled else X_test
     test_predictions = best_model.predict_proba(X_test_scaled)[:, 1]
     test_pred_binary = best_model.predict(X_test_scaled)
     
@@ -351,7 +387,7 @@ def main():
     # Save model
     model_data = {
         'model': best_model,
-        'scaler': best_scaler,
+        'transformer': transformer,
         'feature_names': feature_cols,
         'model_name': best_model_name
     }
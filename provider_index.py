@@ -0,0 +1,256 @@
+# -*- coding: utf-8 -*-
+"""
+Healthcare Fraud Detection - Similar-Provider Index
+Exact nearest-neighbour search over standardized provider feature vectors, so an
+investigator looking at a flagged provider can pull up the most similar
+confirmed fraud providers. Vectors are float32 and searched with one matrix
+product per query batch; newly scored providers are added in place.
+"""
+
+import argparse
+import os
+import threading
+
+import numpy as np
+
+from feature_transformer import ProviderFeatureTransformer
+
+INDEX_PATH = os.environ.get('FRAUD_PROVIDER_INDEX', './provider_index.npz')
+
+# Label of providers that were scored but never confirmed either way
+UNLABELLED = ''
+
+
+class ProviderIndex:
+    """Provider vectors with labels and fraud probabilities, searchable by L2 distance.
+
+    Rows live in preallocated arrays that double when full, so adding providers
+    one chunk at a time stays amortized O(rows added). Adding a provider that is
+    already indexed replaces its row.
+    """
+
+    def __init__(self, transformer, capacity=1024):
+        dim = len(transformer.feature_names)
+        self.transformer = transformer
+        self.size = 0
+        self._vectors = np.zeros((capacity, dim), dtype=np.float32)
+        self._norms = np.zeros(capacity, dtype=np.float32)
+        self._labels = np.full(capacity, UNLABELLED, dtype=object)
+        self._probabilities = np.full(capacity, np.nan, dtype=np.float32)
+        self._providers = np.empty(capacity, dtype=object)
+        self._rows = {}
+        self._lock = threading.Lock()
+        # Set by adds, cleared by save, so callers know when the file is stale
+        self.modified = False
+
+    @classmethod
+    def for_model(cls, transformer, reference=None):
+        """Index using a model's fitted transformer; standardized even if the model is not.
+
+        Older transformers without scaling statistics get them from `reference`,
+        the provider feature frame the index is first built from.
+        """
+        medians, mean, scale = transformer.medians, transformer.mean, transformer.scale
+        if mean is None and reference is not None:
+            fitted = ProviderFeatureTransformer.fit(reference, transformer.feature_names)
+            mean, scale = fitted.mean, fitted.scale
+            medians = medians if medians is not None else fitted.medians
+        return cls(ProviderFeatureTransformer(transformer.feature_names, medians, mean, scale,
+                                              scaling=mean is not None))
+
+    @property
+    def feature_names(self):
+        return self.transformer.feature_names
+
+    def vectorize(self, features):
+        """Standardized float32 vectors for a feature frame, records or matrix"""
+        return np.ascontiguousarray(self.transformer.transform(features), dtype=np.float32)
+
+    def _grow(self, needed):
+        capacity = len(self._vectors)
+        if needed <= capacity:
+            return
+        while capacity < needed:
+            capacity *= 2
+        extra = capacity - len(self._vectors)
+        self._vectors = np.concatenate([self._vectors, np.zeros((extra, self._vectors.shape[1]), np.float32)])
+        self._norms = np.concatenate([self._norms, np.zeros(extra, np.float32)])
+        self._labels = np.concatenate([self._labels, np.full(extra, UNLABELLED, dtype=object)])
+        self._probabilities = np.concatenate([self._probabilities, np.full(extra, np.nan, np.float32)])
+        self._providers = np.concatenate([self._providers, np.empty(extra, dtype=object)])
+
+    def add_vectors(self, providers, vectors, labels=None, probabilities=None):
+        """Insert or replace providers with already standardized vectors.
+
+        Labels that are None leave an existing provider's label unchanged; new
+        providers without a label are UNLABELLED.
+        """
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(len(providers), self._vectors.shape[1])
+        labels = [None] * len(providers) if labels is None else labels
+        probabilities = [np.nan] * len(providers) if probabilities is None else probabilities
+
+        with self._lock:
+            new = [p for p in dict.fromkeys(providers) if p not in self._rows]
+            self._grow(self.size + len(new))
+            for provider in new:
+                self._rows[provider] = self.size
+                self._providers[self.size] = provider
+                self.size += 1
+
+            rows = np.array([self._rows[p] for p in providers], dtype=np.int64)
+            self._vectors[rows] = vectors
+            self._norms[rows] = np.einsum('ij,ij->i', vectors, vectors)
+            # A None label means "not known here": keep whatever label the provider already has
+            self._labels[rows] = [label if label is not None else self._labels[row]
+                                  for row, label in zip(rows, labels)]
+            self._probabilities[rows] = np.asarray(probabilities, dtype=np.float32)
+            self.modified = True
+        return len(new)
+
+    def add(self, features, providers=None, labels=None, probabilities=None):
+        """Insert or replace providers from a feature frame; returns how many were new"""
+        if providers is None:
+            providers = list(features['Provider'])
+        if labels is None and hasattr(features, 'columns') and 'PotentialFraud' in features.columns:
+            labels = [label if isinstance(label, str) else None for label in features['PotentialFraud']]
+        return self.add_vectors(list(providers), self.vectorize(features), labels, probabilities)
+
+    def vector(self, provider):
+        with self._lock:
+            row = self._rows.get(provider)
+            return None if row is None else self._vectors[row].copy()
+
+    def search(self, queries, k=10, label=None, exclude=None):
+        """Top-k nearest providers for each query vector.
+
+        label:   only return providers with this label (e.g. 'Yes' for confirmed fraud)
+        exclude: provider IDs to leave out, e.g. the query provider itself
+        """
+        queries = np.asarray(queries, dtype=np.float32).reshape(-1, self._vectors.shape[1])
+        with self._lock:
+            n = self.size
+            vectors = self._vectors[:n]
+            # ||v - q||^2 = ||v||^2 - 2 v.q + ||q||^2; the last term does not change the ranking
+            distances = self._norms[:n][None, :] - 2.0 * (queries @ vectors.T)
+
+            if label is not None:
+                distances[:, self._labels[:n] != label] = np.inf
+            for provider in exclude or ():
+                row = self._rows.get(provider)
+                if row is not None:
+                    distances[:, row] = np.inf
+
+            k = min(k, n)
+            if k <= 0:
+                return [[] for _ in range(len(queries))]
+            top = np.argpartition(distances, k - 1, axis=1)[:, :k]
+            query_norms = np.einsum('ij,ij->i', queries, queries)
+
+            results = []
+            for i, candidates in enumerate(top):
+                candidates = candidates[np.argsort(distances[i, candidates])]
+                neighbours = []
+                for row in candidates:
+                    if not np.isfinite(distances[i, row]):
+                        break
+                    probability = self._probabilities[row]
+                    neighbours.append({
+                        'provider': self._providers[row],
+                        'distance': float(np.sqrt(max(distances[i, row] + query_norms[i], 0.0))),
+                        'label': self._labels[row] or None,
+                        'fraud_probability': None if np.isnan(probability) else float(probability),
+                    })
+                results.append(neighbours)
+        return results
+
+    def search_features(self, features, k=10, label=None):
+        return self.search(self.vectorize(features), k=k, label=label)
+
+    def similar_to(self, provider, k=10, label=None):
+        """Neighbours of an indexed provider, excluding the provider itself; None if unknown"""
+        vector = self.vector(provider)
+        if vector is None:
+            return None
+        return self.search(vector, k=k, label=label, exclude=[provider])[0]
+
+    def stats(self):
+        with self._lock:
+            labels = self._labels[:self.size]
+            return {
+                'providers': self.size,
+                'capacity': len(self._vectors),
+                'dimensions': self._vectors.shape[1],
+                'confirmed_fraud': int((labels == 'Yes').sum()),
+                'confirmed_not_fraud': int((labels == 'No').sum()),
+                'unlabelled': int((labels == UNLABELLED).sum()),
+            }
+
+    def save(self, path=INDEX_PATH):
+        """Write the index atomically as a .npz file"""
+        with self._lock:
+            n = self.size
+            t = self.transformer
+            tmp_path = f'{path}.tmp.npz'
+            np.savez(tmp_path,
+                     feature_names=np.array(t.feature_names, dtype=str),
+                     medians=t.medians if t.medians is not None else np.zeros(0, np.float32),
+                     mean=t.mean if t.mean is not None else np.zeros(0, np.float32),
+                     scale=t.scale if t.scale is not None else np.zeros(0, np.float32),
+                     vectors=self._vectors[:n],
+                     providers=self._providers[:n].astype(str),
+                     labels=self._labels[:n].astype(str),
+                     probabilities=self._probabilities[:n])
+            os.replace(tmp_path, path)
+            self.modified = False
+
+    @classmethod
+    def load(cls, path=INDEX_PATH):
+        data = np.load(path)
+
+        def optional(name):
+            return data[name] if data[name].size else None
+
+        transformer = ProviderFeatureTransformer(list(data['feature_names']), optional('medians'),
+                                                 optional('mean'), optional('scale'),
+                                                 scaling=data['mean'].size > 0)
+        vectors = data['vectors']
+        index = cls(transformer, capacity=max(1024, len(vectors)))
+        index.add_vectors(list(data['providers']), vectors, list(data['labels']), data['probabilities'])
+        index.modified = False
+        return index
+
+
+def build_index(model_path='./optimal_fraud_model.pkl', data_dir='./content', include_test=True):
+    """Index the labelled training providers, plus the scored test providers"""
+    from feature_cache import FeatureCache
+    from model_registry import load_model_version
+    from optimal_model import provider_feature_stage
+
+    version = load_model_version('optimal_fraud_model', model_path)
+    cache = FeatureCache()
+    train = provider_feature_stage(cache, 'train', data_dir).value
+
+    index = ProviderIndex.for_model(version.transformer, reference=train)
+    index.add(train, probabilities=version.score(train))
+    if include_test:
+        test = provider_feature_stage(cache, 'test', data_dir).value
+        index.add(test, labels=[UNLABELLED] * len(test), probabilities=version.score(test))
+    return index
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build the similar-provider index')
+    parser.add_argument('--model', default='./optimal_fraud_model.pkl', help='Model whose features are indexed')
+    parser.add_argument('--data-dir', default='./content', help='Directory with the claim CSVs')
+    parser.add_argument('--output', default=INDEX_PATH, help='Index file to write')
+    parser.add_argument('--no-test', action='store_true', help='Only index the labelled training providers')
+    args = parser.parse_args()
+
+    index = build_index(args.model, args.data_dir, include_test=not args.no_test)
+    index.save(args.output)
+    print(f"Indexed {index.stats()['providers']} providers into {args.output}")
+    print(index.stats())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+# -*- coding: utf-8 -*-
+"""
+Healthcare Fraud Detection - Per-Request Profiling
+Admin-gated sampling profiler for single scoring requests. Writes folded stacks
+(flamegraph.pl / speedscope compatible) plus allocation counts and peak memory.
+Nothing here runs unless a request explicitly asks to be profiled.
+
+Stack samples only cover the profiled request's own work. The memory figures come
+from tracemalloc, which traces the whole process: they include allocations made
+by any request served while the profile was running, and are reported under
+'process_memory' to say so.
+"""
+
+import hmac
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+import uuid
+from collections import Counter
+
+PROFILE_DIR = os.environ.get('FRAUD_PROFILE_DIR', './profiles')
+
+# tracemalloc is process-wide, so only one request is profiled at a time
+_active = threading.Lock()
+
+
+def is_authorized(token):
+    """Profiling is only available when FRAUD_ADMIN_TOKEN is set and matches"""
+    expected = os.environ.get('FRAUD_ADMIN_TOKEN')
+    if not expected or not token:
+        return False
+    return hmac.compare_digest(expected.encode(), token.encode())
+
+
+def _folded_stack(frame):
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+
+def _own_snapshot():
+    """tracemalloc snapshot without the profiler's own allocations (snapshots, samples)"""
+    return tracemalloc.take_snapshot().filter_traces([
+        tracemalloc.Filter(False, __file__),
+        tracemalloc.Filter(False, tracemalloc.__file__),
+    ])
+
+
+class _Sampler:
+    """Samples one thread's Python stack at a fixed interval from a helper thread"""
+
+    def __init__(self, thread_id, stacks, lock, interval):
+        self.thread_id = thread_id
+        self.stacks = stacks
+        self.lock = lock
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='request-profiler', daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                stack = _folded_stack(frame)
+                with self.lock:
+                    self.stacks[stack] += 1
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+class RequestProfile:
+    """Profile of one request, possibly spread over several worker threads.
+
+    Wrap each piece of work with ``wrap`` so it is sampled on whichever thread
+    runs it, then call ``finish`` once the request is done.
+    """
+
+    def __init__(self, endpoint, interval=0.002, top_allocations=10):
+        if not _active.acquire(blocking=False):
+            raise RuntimeError('Another request is already being profiled')
+        try:
+            self._start_tracing(endpoint, interval, top_allocations)
+        except BaseException:
+            # Never leave profiling locked (or tracing) for every later request
+            if getattr(self, '_started_tracing', False):
+                tracemalloc.stop()
+            _active.release()
+            raise
+
+    def _start_tracing(self, endpoint, interval, top_allocations):
+        self.id = f"{time.strftime('%Y%m%d-%H%M%S')}-{endpoint}-{uuid.uuid4().hex[:8]}"
+        self.endpoint = endpoint
+        self.interval = interval
+        self.top_allocations = top_allocations
+        self.stacks = Counter()
+        self._lock = threading.Lock()
+
+        self._started_tracing = not tracemalloc.is_tracing()
+        if self._started_tracing:
+            tracemalloc.start()
+        tracemalloc.reset_peak()
+        self._snapshot = _own_snapshot()
+        self._start = time.perf_counter()
+
+    def wrap(self, fn):
+        def profiled(*args):
+            with _Sampler(threading.get_ident(), self.stacks, self._lock, self.interval):
+                return fn(*args)
+        return profiled
+
+    def finish(self):
+        """Stop tracing, store the folded profile and return a summary"""
+        try:
+            duration = time.perf_counter() - self._start
+            _, peak = tracemalloc.get_traced_memory()
+            diff = _own_snapshot().compare_to(self._snapshot, 'lineno')
+        finally:
+            if self._started_tracing:
+                tracemalloc.stop()
+            _active.release()
+
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        folded_path = os.path.join(PROFILE_DIR, f'{self.id}.folded')
+        with open(folded_path, 'w') as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f'{stack} {count}\n')
+
+        summary = {
+            'id': self.id,
+            'endpoint': self.endpoint,
+            'duration_ms': duration * 1000,
+            'samples': sum(self.stacks.values()),
+            'sample_interval_ms': self.interval * 1000,
+            # Process-wide: includes every request that ran concurrently with this one
+            'process_memory': {
+                'scope': 'process',
+                'peak_bytes': peak,
+                'allocated_blocks': sum(stat.count_diff for stat in diff if stat.count_diff > 0),
+                'allocated_bytes': sum(stat.size_diff for stat in diff if stat.size_diff > 0),
+                'top_allocations': [
+                    {'location': str(stat.traceback), 'size_bytes': stat.size_diff, 'blocks': stat.count_diff}
+                    for stat in diff[:self.top_allocations]
+                ],
+            },
+            'top_stacks': [{'stack': stack, 'samples': count} for stack, count in self.stacks.most_common(10)],
+            'folded_path': folded_path,
+        }
+        with open(os.path.join(PROFILE_DIR, f'{self.id}.json'), 'w') as f:
+            json.dump(summary, f, indent=2)
+        return summary
+
+
+def load_folded(profile_id):
+    """Folded stacks of a stored profile, or None if it does not exist"""
+    path = os.path.join(PROFILE_DIR, f'{os.path.basename(profile_id)}.folded')
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return f.read()
@@ -0,0 +1,287 @@
+# -*- coding: utf-8 -*-
+"""
+Healthcare Fraud Detection - CPU Thread Budget
+Detects the usable cores (affinity and cgroup CPU quota) and divides them between
+uvicorn workers, the scoring scheduler, XGBoost/scikit-learn n_jobs and BLAS, for
+the serving and training profiles. Run with --benchmark to find the best split.
+
+Import and call configure() before numpy is imported: BLAS pools read their
+thread counts from the environment at load time.
+"""
+
+import argparse
+import json
+import math
+import os
+import time
+
+CONFIG_PATH = './runtime_config.json'
+
+BLAS_ENV_VARS = ['OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS',
+                 'VECLIB_MAXIMUM_THREADS', 'NUMEXPR_NUM_THREADS']
+
+
+def cgroup_cpu_limit():
+    """CPU quota from cgroup v2 or v1, in cores, or None when unlimited"""
+    try:
+        with open('/sys/fs/cgroup/cpu.max') as f:
+            quota, period = f.read().split()[:2]
+        if quota != 'max':
+            return int(quota) / int(period)
+        return None
+    except (OSError, ValueError):
+        pass
+
+    try:
+        with open('/sys/fs/cgroup/cpu/cpu.cfs_quota_us') as f:
+            quota = int(f.read())
+        with open('/sys/fs/cgroup/cpu/cpu.cfs_period_us') as f:
+            period = int(f.read())
+        if quota > 0 and period > 0:
+            return quota / period
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def available_cpus():
+    """Cores this process may actually use"""
+    if hasattr(os, 'sched_getaffinity'):
+        cpus = len(os.sched_getaffinity(0))
+    else:
+        cpus = os.cpu_count() or 1
+
+    limit = cgroup_cpu_limit()
+    if limit is not None:
+        cpus = min(cpus, max(1, math.floor(limit)))
+    return max(1, cpus)
+
+
+class ThreadBudget:
+    """How many threads each layer of the stack may use.
+
+    serving:  uvicorn_workers processes, each with scheduler_workers scoring
+              threads, each running the model with model_threads threads.
+    training: training_jobs parallel fits (e.g. CV folds), each with
+              model_threads threads.
+    BLAS gets model_threads so NumPy never adds threads on top of a model's own.
+    """
+
+    def __init__(self, profile, cpus, uvicorn_workers=1, scheduler_workers=1,
+                 model_threads=1, training_jobs=1, starlette_threads=4):
+        self.profile = profile
+        self.cpus = cpus
+        self.uvicorn_workers = uvicorn_workers
+        self.scheduler_workers = scheduler_workers
+        self.model_threads = model_threads
+        self.training_jobs = training_jobs
+        self.starlette_threads = starlette_threads
+
+    @property
+    def blas_threads(self):
+        return self.model_threads
+
+    def as_dict(self):
+        return dict(vars(self), blas_threads=self.blas_threads)
+
+
+def plan_budget(profile='serving', cpus=None, overrides=None):
+    """Split the available cores for a profile.
+
+    Overrides fix a layer's size first; the layers that are not overridden then
+    share what is left, so e.g. more uvicorn workers means fewer scheduler
+    threads per worker rather than oversubscribed cores.
+    """
+    cpus = cpus or available_cpus()
+    overrides = {key: int(value) for key, value in (overrides or {}).items()}
+
+    if profile == 'serving':
+        # Many single-threaded scoring workers beat a few multi-threaded ones for
+        # small per-request batches
+        uvicorn_workers = max(1, overrides.pop('uvicorn_workers', 1))
+        model_threads = max(1, overrides.pop('model_threads', 1))
+        per_process = max(1, cpus // uvicorn_workers)
+        scheduler_workers = overrides.pop('scheduler_workers', max(1, per_process // model_threads))
+        budget = ThreadBudget(profile, cpus, uvicorn_workers=uvicorn_workers,
+                              scheduler_workers=scheduler_workers, model_threads=model_threads)
+    elif profile == 'training':
+        # One job per CV fold, remaining cores go to each model's own threads
+        jobs = max(1, overrides.pop('training_jobs', min(5, cpus)))
+        model_threads = overrides.pop('model_threads', max(1, cpus // jobs))
+        budget = ThreadBudget(profile, cpus, training_jobs=jobs, model_threads=model_threads)
+    else:
+        raise ValueError(f"Unknown profile '{profile}'")
+
+    for key, value in overrides.items():
+        setattr(budget, key, value)
+    return budget
+
+
+def _saved_overrides(profile, path=CONFIG_PATH):
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f).get(profile, {})
+
+
+def _env_overrides():
+    """FRAUD_UVICORN_WORKERS, FRAUD_SCHEDULER_WORKERS, FRAUD_MODEL_THREADS, ..."""
+    overrides = {}
+    for key in ['uvicorn_workers', 'scheduler_workers', 'model_threads',
+                'training_jobs', 'starlette_threads']:
+        value = os.environ.get(f'FRAUD_{key.upper()}')
+        if value:
+            overrides[key] = int(value)
+    return overrides
+
+
+def configure(profile='serving', config_path=CONFIG_PATH):
+    """Plan the budget (saved benchmark results, then env overrides) and apply BLAS limits"""
+    overrides = _saved_overrides(profile, config_path)
+    overrides.update(_env_overrides())
+    budget = plan_budget(profile, overrides=overrides)
+
+    for var in BLAS_ENV_VARS:
+        os.environ.setdefault(var, str(budget.blas_threads))
+    limit_native_threads(budget.blas_threads)
+    return budget
+
+
+def limit_native_threads(threads):
+    """Limit already-loaded BLAS/OpenMP pools, when threadpoolctl is available"""
+    try:
+        from threadpoolctl import threadpool_limits
+    except ImportError:
+        return None
+    return threadpool_limits(limits=threads)
+
+
+def set_model_threads(model, threads):
+    """Set n_jobs on estimators that have it (XGBoost, LightGBM, forests, ...)"""
+    if hasattr(model, 'get_params') and 'n_jobs' in model.get_params():
+        model.set_params(n_jobs=threads)
+    return model
+
+
+def _benchmark_serving(model, X, workers, threads, requests):
+    """Throughput and p99 latency of `requests` predict_proba calls on a thread pool"""
+    from concurrent.futures import ThreadPoolExecutor
+    import numpy as np
+
+    set_model_threads(model, threads)
+    limit_native_threads(threads)
+
+    def timed_call(_):
+        start = time.perf_counter()
+        model.predict_proba(X)
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        latencies = list(pool.map(timed_call, range(requests)))
+    elapsed = time.perf_counter() - start
+    return requests / elapsed, float(np.percentile(latencies, 99) * 1000)
+
+
+def _benchmark_serving_process(model_path, X, workers, threads, requests, barrier):
+    """One uvicorn-like worker process: load the model, wait for the others, then measure"""
+    import joblib
+
+    artifact = joblib.load(model_path)
+    model = artifact['model'] if isinstance(artifact, dict) else artifact
+    barrier.wait()
+    return _benchmark_serving(model, X, workers, threads, requests)
+
+
+def _benchmark_serving_split(model_path, X, processes, workers, threads, requests):
+    """Total throughput and worst p99 of `processes` worker processes scoring at once"""
+    from concurrent.futures import ProcessPoolExecutor
+    from multiprocessing import Manager
+
+    with Manager() as manager, ProcessPoolExecutor(max_workers=processes) as pool:
+        barrier = manager.Barrier(processes)
+        futures = [pool.submit(_benchmark_serving_process, model_path, X, workers, threads, requests, barrier)
+                   for _ in range(processes)]
+        results = [future.result() for future in futures]
+    return sum(rate for rate, _ in results), max(p99 for _, p99 in results)
+
+
+def _benchmark_training(model, X, y, jobs, threads):
+    """Wall time of fitting `jobs` clones in parallel, each with `threads` threads"""
+    from joblib import Parallel, delayed
+    from sklearn.base import clone
+
+    def fit_one():
+        set_model_threads(clone(model), threads).fit(X, y)
+
+    start = time.perf_counter()
+    Parallel(n_jobs=jobs, prefer='threads')(delayed(fit_one)() for _ in range(jobs))
+    return jobs / (time.perf_counter() - start), None
+
+
+def benchmark(profile, model_path, rows=64, requests=200, config_path=CONFIG_PATH):
+    """Try every split of the cores between the profile's layers and save the fastest one"""
+    import joblib
+    import numpy as np
+
+    cpus = available_cpus()
+    artifact = joblib.load(model_path)
+    model = artifact['model'] if isinstance(artifact, dict) else artifact
+    n_features = model.n_features_in_
+
+    rng = np.random.default_rng(42)
+    X = rng.normal(size=(rows, n_features)).astype(np.float32)
+    y = (rng.random(rows) < 0.3).astype(int)
+
+    print(f"Benchmarking '{profile}' profile on {cpus} usable cores")
+    results = []
+    if profile == 'serving':
+        # Every uvicorn workers x scheduler workers x model threads split of the cores
+        for processes in [p for p in range(1, cpus + 1) if cpus % p == 0]:
+            per_process = cpus // processes
+            for workers in [w for w in range(1, per_process + 1) if per_process % w == 0]:
+                threads = per_process // workers
+                rate, p99 = _benchmark_serving_split(model_path, X, processes, workers, threads, requests)
+                print(f"  {processes:3d} processes x {workers:3d} workers x {threads:3d} threads: "
+                      f"{rate:8.1f} req/s, p99 {p99:.1f} ms")
+                results.append((rate, {'uvicorn_workers': processes, 'scheduler_workers': workers,
+                                       'model_threads': threads}))
+    else:
+        for jobs in [j for j in range(1, cpus + 1) if cpus % j == 0]:
+            threads = cpus // jobs
+            rate, _ = _benchmark_training(model, X, y, jobs, threads)
+            print(f"  {jobs:3d} jobs x {threads:3d} threads: {rate:8.3f} fits/s")
+            results.append((rate, {'training_jobs': jobs, 'model_threads': threads}))
+
+    rate, best = max(results, key=lambda result: result[0])
+    print(f"Best split: {best} ({rate:.1f}/s)")
+
+    saved = {}
+    if os.path.exists(config_path):
+        with open(config_path) as f:
+            saved = json.load(f)
+    saved[profile] = best
+    with open(config_path, 'w') as f:
+        json.dump(saved, f, indent=2)
+    print(f"Saved to {config_path}")
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Show or benchmark the CPU thread budget')
+    parser.add_argument('--profile', choices=['serving', 'training'], default='serving')
+    parser.add_argument('--benchmark', action='store_true', help='Measure every split and save the best')
+    parser.add_argument('--model', default='./models/best_model.pkl', help='Model used for the benchmark')
+    parser.add_argument('--rows', type=int, default=64, help='Rows per request (serving) or per fit (training)')
+    parser.add_argument('--requests', type=int, default=200, help='Requests per serving measurement')
+    args = parser.parse_args()
+
+    if args.benchmark:
+        benchmark(args.profile, args.model, rows=args.rows, requests=args.requests)
+    else:
+        print(f"cgroup CPU limit: {cgroup_cpu_limit()}")
+        print(json.dumps(configure(args.profile).as_dict(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,196 @@
+# -*- coding: utf-8 -*-
+"""
+Healthcare Fraud Detection - Priority Scheduler
+Runs interactive scoring ahead of bulk work on a shared worker pool. Bulk jobs are
+split into slices and shared between tenants by weighted fair queueing
+"""
+
+import asyncio
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+import numpy as np
+
+INTERACTIVE = 'interactive'
+BULK = 'bulk'
+BULK_JOB = 'bulk_job'
+
+
+def parse_tenant_weights(spec, variable='FRAUD_BULK_TENANT_WEIGHTS'):
+    """Parse 'tenantA=2,tenantB=0.5' into a weight mapping; weights must be positive numbers"""
+    weights = {}
+    for item in filter(None, (part.strip() for part in (spec or '').split(','))):
+        tenant, separator, weight = item.partition('=')
+        tenant = tenant.strip()
+        if not separator or not tenant:
+            raise ValueError(f"{variable}: expected 'tenant=weight', got '{item}'")
+        try:
+            value = float(weight)
+        except ValueError:
+            raise ValueError(f"{variable}: weight for tenant '{tenant}' is not a number: '{weight.strip()}'")
+        if not np.isfinite(value) or value <= 0:
+            raise ValueError(f"{variable}: weight for tenant '{tenant}' must be positive, got {weight.strip()}")
+        weights[tenant] = value
+    return weights
+
+
+class LatencyTracker:
+    """Recent latencies for one workload class, summarized as percentiles"""
+
+    def __init__(self, window=2048):
+        self.samples = deque(maxlen=window)
+        self.waits = deque(maxlen=window)
+        self.completed = 0
+
+    def record(self, latency, wait=None):
+        self.samples.append(latency)
+        if wait is not None:
+            self.waits.append(wait)
+        self.completed += 1
+
+    def summary(self):
+        stats = {'completed': self.completed}
+        if self.samples:
+            p50, p95, p99 = (float(v) for v in np.percentile(np.array(self.samples), [50, 95, 99]) * 1000)
+            stats.update({'p50_ms': p50, 'p95_ms': p95, 'p99_ms': p99})
+        if self.waits:
+            stats['queue_wait_p99_ms'] = float(np.percentile(np.array(self.waits), 99) * 1000)
+        return stats
+
+
+class _Tenant:
+    def __init__(self, name, weight):
+        self.name = name
+        self.weight = weight
+        self.queue = deque()
+        self.vtime = 0.0
+
+
+class PriorityScheduler:
+    """Fixed worker pool with strict priority for interactive tasks.
+
+    Between bulk tenants the next slice goes to the active tenant with the lowest
+    virtual time; running a slice advances that tenant's virtual time by
+    ``cost / weight``. A tenant that becomes active again starts from the current
+    minimum, so idle periods do not bank credit. Tenants without a configured
+    weight are forgotten once their queue drains, so arbitrary X-Tenant values
+    cannot grow the tenant table.
+    """
+
+    def __init__(self, workers=None, tenant_weights=None, default_weight=1.0):
+        self.workers = workers or os.cpu_count() or 1
+        if default_weight <= 0:
+            raise ValueError(f"default_weight must be positive, got {default_weight}")
+        self.tenant_weights = tenant_weights or {}
+        self.default_weight = default_weight
+
+        self._interactive = deque()
+        self._tenants = {}
+        self._cond = threading.Condition()
+        self._closed = False
+        self.latency = {INTERACTIVE: LatencyTracker(), BULK: LatencyTracker(), BULK_JOB: LatencyTracker()}
+
+        self._threads = [threading.Thread(target=self._worker_loop, name=f'scheduler-{i}', daemon=True)
+                         for i in range(self.workers)]
+        for thread in self._threads:
+            thread.start()
+
+    @classmethod
+    def from_env(cls, workers=None):
+        workers = workers or int(os.environ.get('FRAUD_SCHEDULER_WORKERS', 0)) or None
+        weights = parse_tenant_weights(os.environ.get('FRAUD_BULK_TENANT_WEIGHTS'))
+        return cls(workers=workers, tenant_weights=weights)
+
+    def submit_interactive(self, fn, *args):
+        future = Future()
+        with self._cond:
+            self._interactive.append((future, fn, args, time.perf_counter()))
+            self._cond.notify()
+        return future
+
+    def submit_bulk(self, tenant, fn, slices):
+        """Queue one task per slice for a tenant; a slice's cost is its length"""
+        futures = []
+        with self._cond:
+            state = self._tenants.get(tenant)
+            if state is None:
+                weight = self.tenant_weights.get(tenant, self.default_weight)
+                state = self._tenants[tenant] = _Tenant(tenant, weight)
+            if not state.queue:
+                active = [t.vtime for t in self._tenants.values() if t.queue]
+                state.vtime = max(state.vtime, min(active)) if active else state.vtime
+
+            for chunk in slices:
+                future = Future()
+                state.queue.append((future, fn, (chunk,), time.perf_counter(), max(1, len(chunk))))
+                futures.append(future)
+            self._cond.notify(len(futures))
+        return futures
+
+    async def run_interactive(self, fn, *args):
+        return await asyncio.wrap_future(self.submit_interactive(fn, *args))
+
+    async def run_bulk(self, tenant, fn, slices):
+        """Run all slices of a bulk job and return their results in order"""
+        start = time.perf_counter()
+        futures = self.submit_bulk(tenant, fn, slices)
+        results = await asyncio.gather(*(asyncio.wrap_future(f) for f in futures))
+        self.latency[BULK_JOB].record(time.perf_counter() - start)
+        return results
+
+    def _next_task(self):
+        """Pick the next task; caller holds the condition lock"""
+        if self._interactive:
+            future, fn, args, enqueued = self._interactive.popleft()
+            return INTERACTIVE, future, fn, args, enqueued
+
+        active = [t for t in self._tenants.values() if t.queue]
+        if not active:
+            return None
+        tenant = min(active, key=lambda t: t.vtime)
+        future, fn, args, enqueued, cost = tenant.queue.popleft()
+        tenant.vtime += cost / tenant.weight
+        if not tenant.queue and tenant.name not in self.tenant_weights:
+            del self._tenants[tenant.name]
+        return BULK, future, fn, args, enqueued
+
+    def _worker_loop(self):
+        while True:
+            with self._cond:
+                task = self._next_task()
+                while task is None and not self._closed:
+                    self._cond.wait()
+                    task = self._next_task()
+                if task is None:
+                    return
+
+            workload, future, fn, args, enqueued = task
+            if not future.set_running_or_notify_cancel():
+                continue
+
+            started = time.perf_counter()
+            try:
+                future.set_result(fn(*args))
+            except BaseException as e:
+                future.set_exception(e)
+            finished = time.perf_counter()
+            self.latency[workload].record(finished - enqueued, wait=started - enqueued)
+
+    def stats(self):
+        with self._cond:
+            bulk_pending = {name: len(t.queue) for name, t in self._tenants.items() if t.queue}
+            interactive_pending = len(self._interactive)
+        return {
+            'workers': self.workers,
+            'interactive_pending': interactive_pending,
+            'bulk_pending_slices': bulk_pending,
+            'latency': {name: tracker.summary() for name, tracker in self.latency.items()},
+        }
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
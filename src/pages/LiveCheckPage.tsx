@@ -1,4 +1,4 @@
-import React, { useState } from 'react';
+import React, { useEffect, useRef, useState } from 'react';
 import { motion } from 'framer-motion';
 import { ParticleBackground } from '../components/ParticleBackground';
 import { GlassmorphicCard } from '../components/GlassmorphicCard';
@@ -15,7 +15,99 @@ type PredictionResult = {
   feature_names: string[];
 };
 
+type LiveMessage = {
+  type: 'schema' | 'score' | 'pending' | 'error' | 'reset';
+  id?: number;
+  fields?: string[];
+  feature_names?: string[];
+  prediction?: number;
+  probability?: number;
+  shap_updates?: [number, number][];
+  base_value?: number;
+  missing?: string[];
+  detail?: string;
+};
+
+const API_URL = 'http://localhost:8000';
+const LIVE_URL = 'ws://localhost:8000/ws/live';
+
+// Keeps one scoring session open: the schema arrives once, later checks send only
+// the fields that changed and patch the SHAP values that moved
+function useLiveScoring() {
+  const socketRef = useRef<WebSocket | null>(null);
+  const featureNamesRef = useRef<string[] | null>(null);
+  const shapRef = useRef<number[]>([]);
+  const baseValueRef = useRef(0);
+  const sentRef = useRef<Record<string, number>>({});
+  const pendingRef = useRef(new Map<number, (message: LiveMessage) => void>());
+  const nextIdRef = useRef(1);
+
+  useEffect(() => {
+    const socket = new WebSocket(LIVE_URL);
+    socketRef.current = socket;
+    socket.onmessage = event => {
+      const message: LiveMessage = JSON.parse(event.data);
+      if (message.type === 'schema') {
+        featureNamesRef.current = message.feature_names ?? [];
+        shapRef.current = new Array(featureNamesRef.current.length).fill(0);
+        sentRef.current = {};
+        return;
+      }
+      const resolve = message.id !== undefined ? pendingRef.current.get(message.id) : undefined;
+      if (resolve) {
+        pendingRef.current.delete(message.id!);
+        resolve(message);
+      }
+    };
+    socket.onclose = () => {
+      socketRef.current = null;
+      pendingRef.current.forEach(resolve => resolve({ type: 'error', detail: 'Connection closed' }));
+      pendingRef.current.clear();
+    };
+    return () => socket.close();
+  }, []);
+
+  // Resolves to null when the session is unavailable so the caller can fall back to HTTP
+  const score = async (values: Record<string, number>): Promise<PredictionResult | null> => {
+    const socket = socketRef.current;
+    const featureNames = featureNamesRef.current;
+    if (!socket || socket.readyState !== WebSocket.OPEN || !featureNames) {
+      return null;
+    }
+
+    const changed = Object.fromEntries(
+      Object.entries(values).filter(([name, value]) => sentRef.current[name] !== value)
+    );
+    const id = nextIdRef.current++;
+    const message = await new Promise<LiveMessage>(resolve => {
+      pendingRef.current.set(id, resolve);
+      socket.send(JSON.stringify({ id, set: changed }));
+    });
+    if (message.type !== 'score') {
+      return null;
+    }
+
+    sentRef.current = { ...sentRef.current, ...changed };
+    for (const [index, value] of message.shap_updates ?? []) {
+      shapRef.current[index] = value;
+    }
+    if (message.base_value !== undefined) {
+      baseValueRef.current = message.base_value;
+    }
+    return {
+      prediction: message.prediction!,
+      probability: message.probability!,
+      shap_values: [...shapRef.current],
+      base_value: baseValueRef.current,
+      feature_names: featureNames,
+    };
+  };
+
+  return score;
+}
+
 export function LiveCheckPage() {
+  const scoreLive = useLiveScoring();
   const [analysisState, setAnalysisState] = useState<AnalysisState>('idle');
   const [result, setResult] = useState<PredictionResult | null>(null);
   const [formData, setFormData] = useState({
@@ -42,24 +134,24 @@ export function LiveCheckPage() {
     e.preventDefault();
     setAnalysisState('analyzing');
 
+    const values = Object.fromEntries(
+      Object.entries(formData).map(([name, value]) => [name, parseFloat(value)])
+    );
+
     try {
-      const response = await fetch('http://localhost:8000/predict', {
+      const live = await scoreLive(values);
+      if (live) {
+        setResult(live);
+        setAnalysisState(live.prediction === 1 ? 'fraud' : 'success');
+        return;
+      }
+
+      const response = await fetch(`${API_URL}/predict`, {
         method: 'POST',
         headers: {
           'Content-Type': 'application/json',
         },
-        body: JSON.stringify({
-          BeneID: parseFloat(formData.BeneID),
-          ClaimID: parseFloat(formData.ClaimID),
-          InscClaimAmtReimbursed: parseFloat(formData.InscClaimAmtReimbursed),
-          DeductibleAmtPaid: parseFloat(formData.DeductibleAmtPaid),
-          NoOfMonths_PartACov: parseFloat(formData.NoOfMonths_PartACov),
-          NoOfMonths_PartBCov: parseFloat(formData.NoOfMonths_PartBCov),
-          IPAnnualReimbursementAmt: parseFloat(formData.IPAnnualReimbursementAmt),
-          IPAnnualDeductibleAmt: parseFloat(formData.IPAnnualDeductibleAmt),
-          OPAnnualReimbursementAmt: parseFloat(formData.OPAnnualReimbursementAmt),
-          OPAnnualDeductibleAmt: parseFloat(formData.OPAnnualDeductibleAmt),
-        }),
+        body: JSON.stringify(values),
       });
 
       if (!response.ok) {
@@ -0,0 +1,284 @@
+# -*- coding: utf-8 -*-
+"""
+Healthcare Fraud Detection - Synthetic Claims Generator
+Writes deterministic, schema-faithful stand-ins for the eight Kaggle CSVs (provider
+labels, beneficiaries, inpatient and outpatient claims for Train and Test) at any
+multiple of the original row counts. Fraud providers bill more, keep patients
+longer and share physicians in small rings, so the models have signal to find;
+how strongly varies by provider, and some labels are wrong, so they cannot
+separate the classes perfectly either.
+"""
+
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+# Same file names as the original data, so ./content can be swapped for a generated dir
+SPLIT_FILES = {
+    'train': {
+        'providers': "Train-1542865627584.csv",
+        'beneficiary': "Train_Beneficiarydata-1542865627584.csv",
+        'inpatient': "Train_Inpatientdata-1542865627584.csv",
+        'outpatient': "Train_Outpatientdata-1542865627584.csv",
+    },
+    'test': {
+        'providers': "Test-1542969243754.csv",
+        'beneficiary': "Test_Beneficiarydata-1542969243754.csv",
+        'inpatient': "Test_Inpatientdata-1542969243754.csv",
+        'outpatient': "Test_Outpatientdata-1542969243754.csv",
+    },
+}
+
+# Row counts of the original files (scale 1)
+BASE_ROWS = {
+    'train': {'providers': 5410, 'beneficiary': 138556, 'inpatient': 40474, 'outpatient': 517737},
+    'test': {'providers': 1353, 'beneficiary': 63968, 'inpatient': 9551, 'outpatient': 125841},
+}
+
+FRAUD_RATE = 0.094
+
+# Share of provider labels that disagree with how the provider behaves, as with
+# undetected fraud and unfounded accusations in the real labels
+LABEL_NOISE = 0.01
+
+# Share of fraud providers that belong to a physician-sharing ring
+RING_SHARE = 0.8
+
+CHRONIC_CONDITIONS = ['Alzheimer', 'Heartfailure', 'KidneyDisease', 'Cancer', 'ObstrPulmonary',
+                      'Depression', 'Diabetes', 'IschemicHeart', 'Osteoporasis',
+                      'rheumatoidarthritis', 'stroke']
+
+INPATIENT_COLUMNS = (
+    ['BeneID', 'ClaimID', 'ClaimStartDt', 'ClaimEndDt', 'Provider', 'InscClaimAmtReimbursed',
+     'AttendingPhysician', 'OperatingPhysician', 'OtherPhysician', 'AdmissionDt',
+     'ClmAdmitDiagnosisCode', 'DeductibleAmtPaid', 'DischargeDt', 'DiagnosisGroupCode']
+    + [f'ClmDiagnosisCode_{i}' for i in range(1, 11)]
+    + [f'ClmProcedureCode_{i}' for i in range(1, 7)]
+)
+OUTPATIENT_COLUMNS = [col for col in INPATIENT_COLUMNS
+                      if col not in ('AdmissionDt', 'DischargeDt', 'DiagnosisGroupCode')]
+
+# Claims are written in chunks so 100x outpatient files never sit in memory at once
+CHUNK_ROWS = 500_000
+
+# Physicians per provider, and providers per fraud ring sharing one physician pool
+PHYSICIANS_PER_PROVIDER = 6
+RING_SIZE = 5
+
+YEAR_START = np.datetime64('2009-01-01')
+
+# Offsets keep IDs from the two splits and the two claim types from colliding
+SPLIT_OFFSETS = {'train': 0, 'test': 1}
+TABLE_SEEDS = {'providers': 0, 'beneficiary': 1, 'inpatient': 2, 'outpatient': 3}
+
+
+def _rng(seed, split, table, chunk=0):
+    return np.random.default_rng([seed, SPLIT_OFFSETS[split], TABLE_SEEDS[table], chunk])
+
+
+def _ids(prefix, start, count):
+    return np.char.add(prefix, np.arange(start, start + count).astype(str))
+
+
+def _codes(rng, vocabulary, size, present):
+    """Zipf-distributed diagnosis/procedure codes, None where absent"""
+    ranks = np.minimum(rng.zipf(1.3, size=size), len(vocabulary)) - 1
+    codes = vocabulary[ranks].astype(object)
+    codes[rng.random(size) >= present] = None
+    return codes
+
+
+def _dates(days):
+    return (YEAR_START + days.astype('timedelta64[D]')).astype(str)
+
+
+class SplitPlan:
+    """Providers, labels and physician pools of one split, shared by all of its tables"""
+
+    def __init__(self, split, scale, seed):
+        self.split = split
+        self.rows = {table: max(1, int(round(count * scale))) for table, count in BASE_ROWS[split].items()}
+
+        rng = _rng(seed, split, 'providers')
+        n = self.rows['providers']
+        self.provider_ids = _ids('PRV', 51001 + SPLIT_OFFSETS[split] * 10_000_000, n)
+        # Behaviour follows `fraud`; the written label is flipped for LABEL_NOISE of providers
+        self.fraud = rng.random(n) < FRAUD_RATE
+        self.label = self.fraud ^ (rng.random(n) < LABEL_NOISE)
+        # How blatant each fraud provider is, from subtle (0.5) to obvious (1)
+        self.intensity = np.where(self.fraud, rng.uniform(0.5, 1.0, n), 0.0)
+
+        # Claim volume is heavy-tailed; fraud providers bill up to three times as much
+        weight = rng.lognormal(0.0, 1.0, n) * (1.0 + 2.0 * self.intensity)
+        self.provider_p = weight / weight.sum()
+
+        # Each provider has its own physicians; fraud providers in a ring share one pool
+        pool = np.arange(n)
+        ring_idx = np.flatnonzero(self.fraud & (rng.random(n) < RING_SHARE))
+        pool[ring_idx] = n + ring_idx // RING_SIZE
+        self.physician_pool = pool
+        self.physician_base = 330000 + SPLIT_OFFSETS[split] * 50_000_000
+
+        self.bene_start = 11001 + SPLIT_OFFSETS[split] * 100_000_000
+        self.claim_start = 100000 + SPLIT_OFFSETS[split] * 1_000_000_000
+
+        vocab_rng = np.random.default_rng([seed, 99])
+        self.diagnosis_codes = np.unique(np.concatenate([
+            vocab_rng.integers(1000, 99999, 3000).astype(str),
+            np.char.add('V', vocab_rng.integers(100, 9999, 300).astype(str)),
+            np.char.add('E', vocab_rng.integers(8000, 9999, 100).astype(str)),
+        ]))
+        vocab_rng.shuffle(self.diagnosis_codes)
+        self.supplementary_codes = np.array([c for c in self.diagnosis_codes if not c.isdigit()])
+        self.procedure_codes = vocab_rng.integers(1000, 9999, 1000).astype(float)
+        self.drg_codes = np.char.zfill(vocab_rng.integers(0, 999, 500).astype(str), 3)
+
+    def providers(self):
+        return pd.DataFrame({
+            'Provider': self.provider_ids,
+            **({'PotentialFraud': np.where(self.label, 'Yes', 'No')} if self.split == 'train' else {}),
+        })
+
+    def physicians(self, rng, provider_idx, present):
+        size = len(provider_idx)
+        pool = self.physician_pool[provider_idx]
+        ids = pool * PHYSICIANS_PER_PROVIDER + rng.integers(0, PHYSICIANS_PER_PROVIDER, size)
+        # A few claims go to physicians outside the provider's own pool
+        stray = rng.random(size) < 0.05
+        ids[stray] = rng.integers(0, (len(self.provider_ids) * 2) * PHYSICIANS_PER_PROVIDER, stray.sum())
+        result = np.char.add('PHY', (self.physician_base + ids).astype(str)).astype(object)
+        result[rng.random(size) >= present] = None
+        return result
+
+    def beneficiary_chunk(self, rng, start, size):
+        dob = rng.integers(-99 * 365, -20 * 365, size)  # born 1910-1989
+        dod_days = rng.integers(0, 365, size)
+        dead = rng.random(size) < 0.01
+        frame = {
+            'BeneID': _ids('BENE', self.bene_start + start, size),
+            'DOB': _dates(dob),
+            'DOD': np.where(dead, _dates(dod_days), None),
+            'Gender': rng.choice([1, 2], size, p=[0.43, 0.57]),
+            'Race': rng.choice([1, 2, 3, 5], size, p=[0.85, 0.1, 0.03, 0.02]),
+            'RenalDiseaseIndicator': np.where(rng.random(size) < 0.15, 'Y', '0'),
+            'State': rng.integers(1, 55, size),
+            'County': rng.integers(0, 1000, size),
+            'NoOfMonths_PartACov': np.where(rng.random(size) < 0.99, 12, rng.integers(0, 12, size)),
+            'NoOfMonths_PartBCov': np.where(rng.random(size) < 0.98, 12, rng.integers(0, 12, size)),
+        }
+        for i, condition in enumerate(CHRONIC_CONDITIONS):
+            prevalence = 0.1 + 0.03 * i
+            frame[f'ChronicCond_{condition}'] = np.where(rng.random(size) < prevalence, 1, 2)
+
+        inpatient = rng.random(size) < 0.2
+        frame['IPAnnualReimbursementAmt'] = np.where(inpatient, np.round(rng.lognormal(9, 0.8, size), -1), 0)
+        frame['IPAnnualDeductibleAmt'] = np.where(inpatient, 1068 * rng.integers(1, 3, size), 0)
+        frame['OPAnnualReimbursementAmt'] = np.round(rng.lognormal(7, 1.0, size), -1)
+        frame['OPAnnualDeductibleAmt'] = np.round(rng.lognormal(5, 1.0, size), -1)
+        return pd.DataFrame(frame)
+
+    def claim_chunk(self, rng, table, start, size):
+        inpatient = table == 'inpatient'
+        provider_idx = rng.choice(len(self.provider_ids), size, p=self.provider_p)
+        intensity = self.intensity[provider_idx]
+
+        start_days = rng.integers(0, 365, size)
+        if inpatient:
+            stay = rng.poisson(5 + 2 * intensity).astype(int)
+            amount = rng.lognormal(9.0, 0.7, size) * (1.0 + 0.3 * intensity)
+            deductible = np.where(rng.random(size) < 0.98, 1068.0, np.nan)
+        else:
+            stay = np.where(rng.random(size) < 0.8, 0, rng.integers(1, 21, size))
+            amount = rng.lognormal(5.2, 1.1, size) * (1.0 + 0.3 * intensity)
+            deductible = np.where(rng.random(size) < 0.95, 0.0, rng.choice([10.0, 40.0, 70.0, 100.0], size))
+
+        claim_offset = 0 if inpatient else 100_000_000
+        frame = {
+            'BeneID': np.char.add('BENE', (self.bene_start + rng.integers(
+                0, self.rows['beneficiary'], size)).astype(str)),
+            'ClaimID': _ids('CLM', self.claim_start + claim_offset + start, size),
+            'ClaimStartDt': _dates(start_days),
+            'ClaimEndDt': _dates(start_days + stay),
+            'Provider': self.provider_ids[provider_idx],
+            'InscClaimAmtReimbursed': np.round(amount, -1),
+            'AttendingPhysician': self.physicians(rng, provider_idx, 0.997),
+            'OperatingPhysician': self.physicians(rng, provider_idx, 0.6 if inpatient else 0.17),
+            'OtherPhysician': self.physicians(rng, provider_idx, 0.12 if inpatient else 0.37),
+            'ClmAdmitDiagnosisCode': _codes(rng, self.diagnosis_codes, size, 1.0 if inpatient else 0.25),
+            'DeductibleAmtPaid': deductible,
+        }
+        if inpatient:
+            frame['AdmissionDt'] = frame['ClaimStartDt']
+            frame['DischargeDt'] = frame['ClaimEndDt']
+            frame['DiagnosisGroupCode'] = self.drg_codes[rng.integers(0, len(self.drg_codes), size)]
+
+        # Later diagnosis/procedure slots are filled less and less often
+        for i in range(1, 11):
+            present = (0.99 if inpatient else 0.97) * (0.85 if inpatient else 0.6) ** (i - 1)
+            frame[f'ClmDiagnosisCode_{i}'] = _codes(rng, self.diagnosis_codes, size, present)
+
+        if start == 0:
+            # The first claim of each file lists V/E codes in every diagnosis slot. Otherwise
+            # a sparsely filled slot can hold only numeric-looking codes at small scales, and
+            # read_csv would parse it as float64 in one file and as strings in the other
+            for column in ['ClmAdmitDiagnosisCode'] + [f'ClmDiagnosisCode_{i}' for i in range(1, 11)]:
+                frame[column][0] = self.supplementary_codes[rng.integers(len(self.supplementary_codes))]
+
+        for i in range(1, 7):
+            present = (0.6 if inpatient else 0.0003) * 0.3 ** (i - 1)
+            procedures = self.procedure_codes[rng.integers(0, len(self.procedure_codes), size)]
+            frame[f'ClmProcedureCode_{i}'] = np.where(rng.random(size) < present, procedures, np.nan)
+
+        columns = INPATIENT_COLUMNS if inpatient else OUTPATIENT_COLUMNS
+        return pd.DataFrame(frame)[columns]
+
+
+def _write_chunked(path, rows, make_chunk, seed, split, table):
+    """Write `rows` rows in CHUNK_ROWS pieces; each chunk has its own seeded generator"""
+    for chunk, start in enumerate(range(0, rows, CHUNK_ROWS)):
+        size = min(CHUNK_ROWS, rows - start)
+        frame = make_chunk(_rng(seed, split, table, chunk + 1), start, size)
+        frame.to_csv(path, mode='w' if chunk == 0 else 'a', header=chunk == 0, index=False)
+
+
+def generate_split(out_dir, split, scale=1.0, seed=42):
+    """Write the four CSVs of one split and return their row counts"""
+    plan = SplitPlan(split, scale, seed)
+    files = SPLIT_FILES[split]
+
+    plan.providers().to_csv(os.path.join(out_dir, files['providers']), index=False)
+    _write_chunked(os.path.join(out_dir, files['beneficiary']), plan.rows['beneficiary'],
+                   plan.beneficiary_chunk, seed, split, 'beneficiary')
+    for table in ('inpatient', 'outpatient'):
+        _write_chunked(os.path.join(out_dir, files[table]), plan.rows[table],
+                       lambda rng, start, size, table=table: plan.claim_chunk(rng, table, start, size),
+                       seed, split, table)
+    return plan.rows
+
+
+def generate(out_dir, scale=1.0, seed=42):
+    """Write all eight CSVs at `scale` times the original row counts"""
+    os.makedirs(out_dir, exist_ok=True)
+    rows = {}
+    for split in SPLIT_FILES:
+        print(f"Generating {split} split at {scale:g}x into {out_dir}")
+        rows[split] = generate_split(out_dir, split, scale, seed)
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate synthetic claims data in the Kaggle schema')
+    parser.add_argument('--output', default='./synthetic/1x', help='Directory for the eight CSVs')
+    parser.add_argument('--scale', type=float, default=1.0, help='Multiple of the original row counts')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    rows = generate(args.output, args.scale, args.seed)
+    for split, counts in rows.items():
+        print(f"{split}: " + ", ".join(f"{table} {count}" for table, count in counts.items()))
+
+
+if __name__ == "__main__":
+    main()
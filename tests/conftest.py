@@ -0,0 +1,35 @@
+"""Shared fixtures: a small scoring service built from a freshly trained model"""
+
+import json
+
+import joblib
+import numpy as np
+import pytest
+from sklearn.linear_model import LogisticRegression
+
+# Same columns as app.PredictionInput, so every live-check field reaches the model
+SERVING_FEATURES = [
+    'BeneID', 'ClaimID', 'InscClaimAmtReimbursed', 'DeductibleAmtPaid', 'NoOfMonths_PartACov',
+    'NoOfMonths_PartBCov', 'IPAnnualReimbursementAmt', 'IPAnnualDeductibleAmt',
+    'OPAnnualReimbursementAmt', 'OPAnnualDeductibleAmt',
+]
+
+
+@pytest.fixture(scope='session')
+def app_module(tmp_path_factory):
+    """app.py serving a logistic regression over the live-check fields"""
+    root = tmp_path_factory.mktemp('serving')
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(300, len(SERVING_FEATURES))).astype(np.float32)
+    model = LogisticRegression().fit(X, (X[:, 2] + X[:, 3] > 0).astype(int))
+    joblib.dump(model, root / 'model.pkl')
+    (root / 'columns.json').write_text(json.dumps(SERVING_FEATURES))
+    (root / 'registry.json').write_text(json.dumps(
+        {'primary': {'path': str(root / 'model.pkl'), 'columns': str(root / 'columns.json')}}))
+
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setenv('FRAUD_MODEL_REGISTRY', str(root / 'registry.json'))
+        patch.setenv('FRAUD_PRIMARY_MODEL', 'primary')
+        patch.setenv('FRAUD_SHADOW_STORE', str(root / 'shadow.db'))
+        import app
+        yield app
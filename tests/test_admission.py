@@ -0,0 +1,96 @@
+"""Over-capacity requests are shed with 429/503 and Retry-After instead of piling up"""
+
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from admission import AdmissionController, EndpointGate
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+def test_full_queue_is_rejected_with_429():
+    async def scenario():
+        gate = EndpointGate('bulk', max_concurrent=1, max_queue=1, queue_timeout=5.0)
+        await gate.acquire()
+        waiting = asyncio.ensure_future(gate.acquire())
+        await asyncio.sleep(0)
+
+        with pytest.raises(HTTPException) as rejected:
+            await gate.acquire()
+
+        gate.release(0.1)
+        await waiting
+        return gate, rejected.value
+
+    gate, error = run(scenario())
+    assert error.status_code == 429
+    assert int(error.headers['Retry-After']) >= 1
+    assert gate.stats()['rejected_queue_full'] == 1
+    assert gate.stats()['admitted'] == 2
+
+
+def test_queue_deadline_is_rejected_with_503():
+    async def scenario():
+        gate = EndpointGate('predict', max_concurrent=1, max_queue=4, queue_timeout=0.05)
+        await gate.acquire()
+        with pytest.raises(HTTPException) as rejected:
+            await gate.acquire()
+        return gate, rejected.value
+
+    gate, error = run(scenario())
+    assert error.status_code == 503
+    assert 'Retry-After' in error.headers
+    assert gate.stats()['rejected_timeout'] == 1
+    assert gate.queue_depth == 0
+
+
+def test_released_slot_goes_to_the_oldest_waiter():
+    async def scenario():
+        gate = EndpointGate('bulk', max_concurrent=1, max_queue=4, queue_timeout=5.0)
+        order = []
+
+        async def request(name):
+            await gate.acquire()
+            order.append(name)
+
+        await gate.acquire()
+        waiters = [asyncio.ensure_future(request(name)) for name in ('first', 'second')]
+        await asyncio.sleep(0)
+        gate.release()
+        await waiters[0]
+        gate.release()
+        await waiters[1]
+        gate.release()
+        return gate, order
+
+    gate, order = run(scenario())
+    assert order == ['first', 'second']
+    assert gate.in_flight == 0
+
+
+def test_slot_is_released_when_the_request_fails():
+    async def scenario():
+        controller = AdmissionController({'predict': (1, 0, 0.05)})
+        with pytest.raises(RuntimeError):
+            async with controller.slot('predict'):
+                raise RuntimeError('scoring failed')
+        async with controller.slot('predict'):
+            pass
+        return controller.stats()['predict']
+
+    stats = run(scenario())
+    assert stats['in_flight'] == 0
+    assert stats['admitted'] == 2
+
+
+def test_limits_come_from_the_environment(monkeypatch):
+    monkeypatch.setenv('FRAUD_BULK_MAX_CONCURRENT', '3')
+    monkeypatch.setenv('FRAUD_BULK_QUEUE_TIMEOUT', '0.5')
+
+    gate = AdmissionController.from_env().gates['bulk']
+
+    assert (gate.max_concurrent, gate.queue_timeout) == (3, 0.5)
@@ -0,0 +1,58 @@
+"""An interrupted batch run must resume without losing rows or indexed providers"""
+
+import joblib
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.linear_model import LogisticRegression
+
+import batch_score
+from feature_transformer import ProviderFeatureTransformer
+from provider_index import ProviderIndex
+
+FEATURES = ['ClaimCount', 'TotalReimbursed', 'PhysicianCount']
+
+
+@pytest.fixture
+def scoring_run(tmp_path):
+    rng = np.random.default_rng(0)
+    features = pd.DataFrame(rng.normal(size=(50, len(FEATURES))), columns=FEATURES)
+    features.insert(0, 'Provider', [f'PRV{i:05d}' for i in range(len(features))])
+    features.to_csv(tmp_path / 'providers.csv', index=False)
+
+    transformer = ProviderFeatureTransformer.fit(features, FEATURES)
+    model = LogisticRegression().fit(transformer.transform(features), (features['ClaimCount'] > 0).astype(int))
+    joblib.dump({'model': model, 'transformer': transformer, 'feature_names': FEATURES}, tmp_path / 'model.pkl')
+    ProviderIndex.for_model(transformer).save(str(tmp_path / 'index.npz'))
+
+    def run(**kwargs):
+        return batch_score.score_file(str(tmp_path / 'providers.csv'), str(tmp_path / 'scores.csv'),
+                                      model_path=str(tmp_path / 'model.pkl'), chunksize=10, workers=1,
+                                      index_path=str(tmp_path / 'index.npz'), **kwargs)
+
+    return features, run, tmp_path
+
+
+def test_resume_after_interruption_keeps_every_provider(scoring_run, monkeypatch):
+    features, run, tmp_path = scoring_run
+    write = batch_score.ChunkWriter.write
+    calls = []
+
+    def interrupted_write(self, predictions):
+        calls.append(len(predictions))
+        if len(calls) == 3:
+            raise KeyboardInterrupt
+        write(self, predictions)
+
+    monkeypatch.setattr(batch_score.ChunkWriter, 'write', interrupted_write)
+    with pytest.raises(KeyboardInterrupt):
+        run()
+    monkeypatch.undo()
+
+    assert run()['rows_scored'] == 30
+
+    scores = pd.read_csv(tmp_path / 'scores.csv')
+    assert list(scores['Provider']) == list(features['Provider'])
+    index = ProviderIndex.load(str(tmp_path / 'index.npz'))
+    assert index.stats()['providers'] == len(features)
+    assert all(index.vector(provider) is not None for provider in features['Provider'])
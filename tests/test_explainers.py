@@ -0,0 +1,92 @@
+"""Each model gets the cheapest exact explainer, and pickled fallbacks only for their own model"""
+
+import pickle
+
+import numpy as np
+import pytest
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.linear_model import LogisticRegression
+from sklearn.neighbors import KNeighborsClassifier
+
+import explainers
+
+needs_shap = pytest.mark.skipif(not explainers.SHAP_AVAILABLE, reason='shap is not installed')
+
+
+class ConstantExplainer:
+    """Picklable stand-in for a stored SHAP explainer"""
+
+    def __call__(self, X):
+        class Result:
+            values = np.ones(X.shape)
+            base_values = np.zeros(len(X))
+        return Result()
+
+
+@pytest.fixture(scope='module')
+def data():
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(200, 4))
+    return X, (X[:, 0] + X[:, 1] > 0).astype(int)
+
+
+@pytest.fixture
+def pickled(tmp_path, monkeypatch):
+    model_path = tmp_path / 'knn.pkl'
+    model_path.write_bytes(b'')
+    explainer_path = tmp_path / 'knn_explainer.pkl'
+    explainer_path.write_bytes(pickle.dumps(ConstantExplainer()))
+    monkeypatch.setattr(explainers, 'PICKLED_EXPLAINERS', {str(model_path): str(explainer_path)})
+    return model_path
+
+
+def test_linear_attributions_add_up_to_the_log_odds(data):
+    X, y = data
+    model = LogisticRegression().fit(X, y)
+
+    explainer = explainers.make_explainer(model, background_mean=X.mean(axis=0))
+    result = explainer.explain(X[:10])
+
+    assert result.method == 'linear'
+    np.testing.assert_allclose(result.values.sum(axis=1) + result.base_values,
+                               model.decision_function(X[:10]))
+
+
+@needs_shap
+def test_tree_models_use_treeshap(data):
+    X, y = data
+    model = RandomForestClassifier(n_estimators=5, max_depth=3, random_state=0).fit(X, y)
+
+    result = explainers.make_explainer(model).explain(X[:5])
+
+    assert result.method == 'tree'
+    np.testing.assert_allclose(result.values.sum(axis=1) + result.base_values,
+                               model.predict_proba(X[:5])[:, 1], atol=1e-6)
+
+
+@needs_shap
+def test_other_models_fall_back_to_a_generic_explainer(data):
+    X, y = data
+    model = KNeighborsClassifier().fit(X, y)
+
+    assert explainers.make_explainer(model, background=X[:20]).explain(X[:2]).method == 'generic'
+
+
+def test_pickled_explainer_is_used_for_its_own_model(data, pickled):
+    X, y = data
+    model = KNeighborsClassifier().fit(X, y)
+
+    result = explainers.make_explainer(model, model_path=str(pickled)).explain(X[:3])
+
+    assert result.method == 'generic'
+    np.testing.assert_array_equal(result.values, np.ones((3, 4)))
+
+
+def test_pickled_explainer_is_not_used_for_another_model(data, pickled, tmp_path):
+    X, y = data
+    model = KNeighborsClassifier().fit(X, y)
+
+    with pytest.raises(ValueError, match='No explainer available'):
+        explainers.make_explainer(model, model_path=str(tmp_path / 'other.pkl'))
+    with pytest.raises(ValueError, match='No explainer available'):
+        explainers.make_explainer(model)
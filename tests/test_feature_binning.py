@@ -0,0 +1,91 @@
+"""Binned lookup-table scoring must reproduce the native model exactly"""
+
+import numpy as np
+import pytest
+import xgboost as xgb
+from sklearn.ensemble import GradientBoostingClassifier, RandomForestClassifier
+
+from feature_binning import BinnedModel, load_binned_table, save_binned_table
+
+N_FEATURES = 5
+
+
+def training_data(missing):
+    # Integer-valued features, so many inputs land exactly on split points
+    rng = np.random.default_rng(0)
+    X = rng.integers(0, 12, size=(600, N_FEATURES)).astype(np.float32)
+    y = ((X[:, 0] + X[:, 1] > 11) ^ (X[:, 2] > 8)).astype(int)
+    if missing:
+        X[rng.random(X.shape) < 0.1] = np.nan
+    return X, y
+
+
+def scoring_rows(binned, missing):
+    """Integers, half-integers, every model threshold and (optionally) NaN in each column"""
+    rng = np.random.default_rng(1)
+    X = rng.integers(-1, 13, size=(400, N_FEATURES)).astype(np.float32)
+    X[::3] += np.float32(0.5)
+    for j, edges in enumerate(binned.binner.edges):
+        # Trees fitted on NaN can split at +inf ("missing or not"); inputs must be finite
+        edges = edges[np.isfinite(edges)]
+        if len(edges):
+            X[1::3, j] = rng.choice(edges, len(X[1::3])).astype(np.float32)
+    if missing:
+        X[rng.random(X.shape) < 0.15] = np.nan
+    return X
+
+
+MODELS = {
+    'random_forest': lambda: RandomForestClassifier(n_estimators=30, max_depth=8, random_state=0),
+    'xgboost': lambda: xgb.XGBClassifier(n_estimators=40, max_depth=5, n_jobs=1, random_state=0),
+    'gradient_boosting': lambda: GradientBoostingClassifier(n_estimators=40, max_depth=4, random_state=0),
+}
+
+
+@pytest.mark.parametrize('name', list(MODELS))
+def test_matches_native_model_on_thresholds(name):
+    X, y = training_data(missing=False)
+    model = MODELS[name]().fit(X, y)
+    binned = BinnedModel.from_model(model, N_FEATURES)
+    rows = scoring_rows(binned, missing=False)
+
+    np.testing.assert_allclose(binned.predict_proba(rows), model.predict_proba(rows), atol=1e-6)
+
+
+@pytest.mark.parametrize('name, trained_with_missing', [
+    ('random_forest', True), ('random_forest', False), ('xgboost', True), ('xgboost', False)])
+def test_missing_values_follow_the_native_model(name, trained_with_missing):
+    X, y = training_data(missing=trained_with_missing)
+    model = MODELS[name]().fit(X, y)
+    binned = BinnedModel.from_model(model, N_FEATURES)
+    rows = scoring_rows(binned, missing=True)
+
+    np.testing.assert_allclose(binned.predict_proba(rows), model.predict_proba(rows), atol=1e-6)
+
+
+def test_nan_is_rejected_where_the_native_model_rejects_it():
+    X, y = training_data(missing=False)
+    model = MODELS['gradient_boosting']().fit(X, y)
+    binned = BinnedModel.from_model(model, N_FEATURES)
+    rows = scoring_rows(binned, missing=True)
+
+    with pytest.raises(ValueError, match='NaN'):
+        model.predict_proba(rows)
+    with pytest.raises(ValueError, match='NaN'):
+        binned.predict_proba(rows)
+
+
+def test_saved_table_scores_like_the_features(tmp_path):
+    X, y = training_data(missing=True)
+    model = MODELS['xgboost']().fit(X, y)
+    binned = BinnedModel.from_model(model, N_FEATURES)
+    rows = scoring_rows(binned, missing=True)
+    codes = binned.binner.transform(rows)
+
+    save_binned_table(str(tmp_path / 'table.npz'), codes, [f'PRV{i}' for i in range(len(rows))],
+                      [f'f{j}' for j in range(N_FEATURES)], binned.binner)
+    loaded, _, _, binner = load_binned_table(str(tmp_path / 'table.npz'))
+
+    assert loaded.dtype == np.uint8
+    np.testing.assert_array_equal(binner.transform(rows), loaded)
+    np.testing.assert_allclose(binned.predict_proba_codes(loaded), model.predict_proba(rows), atol=1e-6)
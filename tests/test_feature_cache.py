@@ -0,0 +1,109 @@
+"""Cached stages are reused until their code, inputs, parameters or upstream stages change"""
+
+import numpy as np
+import pandas as pd
+import pytest
+import scipy.sparse as sp
+
+from feature_cache import FeatureCache
+
+
+def double(frame):
+    return frame * 2
+
+
+def triple(frame):
+    return frame * 3
+
+
+@pytest.fixture
+def raw(tmp_path):
+    path = tmp_path / 'claims.csv'
+    path.write_text('amount\n1\n2\n')
+    return path
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return FeatureCache(str(tmp_path / 'cache'), enabled=True)
+
+
+def pipeline(cache, raw, transform=double, params=None):
+    calls = []
+
+    def load():
+        calls.append('load')
+        return pd.read_csv(raw)
+
+    def features(frame):
+        calls.append('features')
+        return transform(frame)
+
+    loaded = cache.stage('load', load, files=[raw])
+    return cache.stage('features', features, upstream=[loaded], code=[transform], params=params), calls
+
+
+def test_unchanged_stages_are_reused(cache, raw):
+    first, calls = pipeline(cache, raw)
+    expected = first.value
+    again, calls_again = pipeline(cache, raw)
+
+    assert again.key == first.key
+    pd.testing.assert_frame_equal(again.value, expected)
+    assert calls == ['load', 'features'] and calls_again == []
+
+
+def test_changed_input_file_recomputes_downstream(cache, raw):
+    first, _ = pipeline(cache, raw)
+    first.value
+    raw.write_text('amount\n1\n2\n3\n')
+
+    changed, calls = pipeline(cache, raw)
+
+    assert changed.key != first.key
+    assert len(changed.value) == 3
+    assert calls == ['load', 'features']
+
+
+def test_changed_code_recomputes_only_that_stage(cache, raw):
+    first, _ = pipeline(cache, raw)
+    first.value
+
+    changed, calls = pipeline(cache, raw, transform=triple)
+
+    assert changed.key != first.key
+    assert changed.upstream[0].key == first.upstream[0].key
+    assert changed.value['amount'].tolist() == [3, 6]
+    assert calls == ['features']
+
+
+def test_changed_params_change_the_key(cache, raw):
+    first, _ = pipeline(cache, raw, params={'scale': 0.1})
+    changed, _ = pipeline(cache, raw, params={'scale': 0.03})
+
+    assert changed.key != first.key
+    assert changed.upstream[0].key == first.upstream[0].key
+
+
+def test_claim_matrices_round_trip(cache):
+    numeric = np.arange(6, dtype=np.float32).reshape(3, 2)
+    one_hot = sp.csr_matrix(np.eye(3, dtype=np.float32))
+
+    stage = cache.stage('matrices', lambda: ((numeric, one_hot), ['a', 'b']))
+    stage.value
+    (cached_numeric, cached_one_hot), names = cache.stage('matrices', stage.fn).value
+
+    np.testing.assert_array_equal(cached_numeric, numeric)
+    assert sp.issparse(cached_one_hot)
+    np.testing.assert_array_equal(cached_one_hot.toarray(), one_hot.toarray())
+    assert names == ['a', 'b']
+
+
+def test_disabled_cache_writes_nothing(tmp_path, raw):
+    cache = FeatureCache(str(tmp_path / 'off'), enabled=False)
+
+    stage, calls = pipeline(cache, raw)
+    stage.value
+
+    assert calls == ['load', 'features']
+    assert not (tmp_path / 'off').exists()
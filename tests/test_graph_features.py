@@ -0,0 +1,31 @@
+"""Provider network features must survive feature selection in optimal_model"""
+
+import pandas as pd
+
+import synthetic_data
+from graph_features import compute_graph_features
+from optimal_model import create_provider_features, load_split, prepare_features
+
+GRAPH_COUNT_COLUMNS = [
+    'SharedBeneficiaryCount', 'SharedBeneficiaryProviders', 'PhysicianCount',
+    'SharedPhysicianCount', 'PhysicianOverlapProviders',
+]
+
+
+def test_graph_counts_are_int64(tmp_path):
+    synthetic_data.generate(str(tmp_path), scale=0.02, seed=7)
+    _, _, inpatient, outpatient = load_split('train', str(tmp_path))
+
+    stats = compute_graph_features(pd.concat([inpatient, outpatient], ignore_index=True))
+
+    assert (stats[GRAPH_COUNT_COLUMNS].dtypes == 'int64').all()
+
+
+def test_graph_columns_reach_feature_cols(tmp_path):
+    synthetic_data.generate(str(tmp_path), scale=0.02, seed=7)
+    train = create_provider_features(*load_split('train', str(tmp_path)))
+    test = create_provider_features(*load_split('test', str(tmp_path)))
+
+    _, _, _, feature_cols, _ = prepare_features(train, test)
+
+    assert set(GRAPH_COUNT_COLUMNS) <= set(feature_cols)
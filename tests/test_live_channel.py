@@ -0,0 +1,69 @@
+"""The live WebSocket session must survive bad messages and failed scores"""
+
+import pytest
+from fastapi.testclient import TestClient
+
+
+@pytest.fixture
+def fields(app_module):
+    return app_module.LIVE_FIELDS
+
+
+@pytest.fixture
+def values(fields):
+    return {name: 1.0 for name in fields}
+
+
+@pytest.fixture
+def live(app_module):
+    with TestClient(app_module.app).websocket_connect('/ws/live') as websocket:
+        assert websocket.receive_json()['type'] == 'schema'
+        yield websocket
+
+
+def test_deltas_are_scored_once_every_field_is_set(live, fields, values):
+    live.send_json({'id': 1, 'set': {'BeneID': 1}})
+    assert live.receive_json()['type'] == 'pending'
+
+    live.send_json({'id': 2, 'set': values})
+    first = live.receive_json()
+    assert first['type'] == 'score'
+    assert len(first['shap_updates']) == len(fields)
+
+    live.send_json({'id': 3, 'set': {'InscClaimAmtReimbursed': 3.0}})
+    second = live.receive_json()
+    assert second['id'] == 3
+    assert [i for i, _ in second['shap_updates']] == [fields.index('InscClaimAmtReimbursed')]
+    assert 'base_value' not in second
+
+
+@pytest.mark.parametrize('value', ['nan', 'inf', '-Infinity'])
+def test_non_finite_values_are_rejected(live, values, value):
+    live.send_json({'id': 1, 'set': dict(values, DeductibleAmtPaid=value)})
+    error = live.receive_json()
+    assert (error['type'], error['status']) == ('error', 422)
+    assert 'DeductibleAmtPaid' in error['detail']
+
+    live.send_json({'id': 2, 'set': values})
+    assert live.receive_json()['type'] == 'score'
+
+
+def test_non_object_messages_get_an_error(live):
+    live.send_json([1, 2, 3])
+    assert live.receive_json()['status'] == 400
+    live.send_json({'id': 1, 'set': [1, 2]})
+    assert live.receive_json()['status'] == 422
+
+
+def test_scoring_failure_keeps_the_session_open(live, values, app_module, monkeypatch):
+    def broken(_):
+        raise ValueError('Input X contains NaN')
+
+    monkeypatch.setattr(app_module, 'score_single', broken)
+    live.send_json({'id': 1, 'set': values})
+    error = live.receive_json()
+    assert (error['type'], error['id'], error['status']) == ('error', 1, 500)
+
+    monkeypatch.undo()
+    live.send_json({'id': 2, 'set': {'BeneID': 2.0}})
+    assert live.receive_json()['type'] == 'score'
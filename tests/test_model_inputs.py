@@ -0,0 +1,55 @@
+"""Models trained on the encoded claim matrices must score dense API rows the same way"""
+
+import numpy as np
+import pytest
+import scipy.sparse as sp
+
+import model
+
+
+def claim_matrix(rows, seed):
+    """(numeric, one_hot) pair with plenty of exact zeros in the numeric block"""
+    rng = np.random.default_rng(seed)
+    numeric = rng.normal(size=(rows, 6)).astype(np.float32)
+    numeric[rng.random(numeric.shape) < 0.4] = 0
+    one_hot = sp.csr_matrix(np.eye(4, dtype=np.float32)[rng.integers(0, 4, rows)])
+    y = ((numeric[:, 0] == 0) ^ (numeric[:, 1] > 0)).astype(int)
+    return (numeric, one_hot), y
+
+
+@pytest.mark.parametrize('name', list(model.candidate_models()))
+def test_training_input_matches_dense_serving_rows(name):
+    X, y = claim_matrix(400, seed=0)
+    X_new, _ = claim_matrix(200, seed=1)
+    estimator = model.candidate_models([name])[name]
+
+    estimator.fit(model.as_model_input(estimator, X), y)
+
+    expected = estimator.predict_proba(model.as_model_input(estimator, X_new))[:, 1]
+    served = estimator.predict_proba(model.stack_dense(X_new))[:, 1]
+    np.testing.assert_allclose(served, expected, atol=1e-6)
+
+
+def test_blocks_round_trip_through_csr():
+    X, _ = claim_matrix(50, seed=2)
+
+    numeric, one_hot = model.split_blocks(model.stack_sparse(X), X[0].shape[1])
+
+    np.testing.assert_array_equal(numeric, X[0])
+    assert sp.issparse(one_hot)
+    np.testing.assert_array_equal(one_hot.toarray(), X[1].toarray())
+
+
+def test_saved_model_must_match_feature_columns(tmp_path):
+    X, y = claim_matrix(100, seed=3)
+    estimator = model.candidate_models(['LogisticRegression'])['LogisticRegression']
+    estimator.fit(model.as_model_input(estimator, X), y)
+    names = [f'f{i}' for i in range(10)]
+    model.joblib.dump(estimator, tmp_path / 'fraud_model.pkl')
+    (tmp_path / 'columns.json').write_text(model.json.dumps(names))
+
+    assert model.load_artifacts(names, str(tmp_path)).coef_.shape == estimator.coef_.shape
+    with pytest.raises(ValueError):
+        model.load_artifacts(names[:-1], str(tmp_path))
+    with pytest.raises(FileNotFoundError):
+        model.load_artifacts(names, str(tmp_path / 'missing'))
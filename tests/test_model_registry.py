@@ -0,0 +1,91 @@
+"""Challenger shadow scoring must never take down or slow the primary path"""
+
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.linear_model import LogisticRegression
+from sklearn.tree import DecisionTreeClassifier
+
+from feature_transformer import ProviderFeatureTransformer
+from model_registry import ModelRegistry, ModelVersion, ShadowStore
+
+FEATURES = ['a', 'b', 'c']
+
+
+def version(name, model):
+    return ModelVersion(name, model, ProviderFeatureTransformer(FEATURES))
+
+
+def fitted(model):
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(200, len(FEATURES))).astype(np.float32)
+    return model.fit(X, (X[:, 0] > 0).astype(int))
+
+
+class StaleArtifact(RandomForestClassifier):
+    """Stands in for a pickle from an older library version that cannot be re-parameterised"""
+
+    def set_params(self, **params):
+        raise AttributeError("'XGBModel' object has no attribute 'feature_weights'")
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+def test_broken_challenger_is_dropped(tmp_path):
+    versions = {
+        'primary': version('primary', fitted(LogisticRegression())),
+        'stale': version('stale', fitted(StaleArtifact(n_estimators=5, max_depth=2))),
+        'tree': version('tree', fitted(DecisionTreeClassifier(max_depth=3))),
+    }
+
+    registry = ModelRegistry(versions, primary='primary', store=ShadowStore(str(tmp_path / 'shadow.db')))
+
+    assert [v.name for v in registry.challengers] == ['tree']
+    registry.close()
+
+
+def test_challengers_are_scored_off_the_request_path(tmp_path):
+    versions = {
+        'primary': version('primary', fitted(LogisticRegression())),
+        'tree': version('tree', fitted(DecisionTreeClassifier(max_depth=3))),
+    }
+    registry = ModelRegistry(versions, primary='primary', store=ShadowStore(str(tmp_path / 'shadow.db')))
+    data = pd.DataFrame(np.random.default_rng(1).normal(size=(20, 3)), columns=FEATURES)
+
+    registry.shadow(data, registry.primary.score(data))
+
+    assert wait_for(lambda: 'tree' in registry.stats()['disagreement'])
+    stats = registry.stats()['disagreement']['tree']
+    assert stats['scored_rows'] == 20
+    assert 0 <= stats['label_agreement_rate'] <= 1
+    registry.close()
+
+
+def test_full_queue_drops_jobs_and_counts_every_one():
+    versions = {
+        'primary': version('primary', fitted(LogisticRegression())),
+        'tree': version('tree', fitted(DecisionTreeClassifier(max_depth=3))),
+    }
+    # Without a store no shadow worker starts; mark one as running so jobs queue up unconsumed
+    registry = ModelRegistry(versions, primary='primary', store=None, shadow_queue_size=4)
+    registry._workers = [None]
+    data = pd.DataFrame(np.zeros((1, 3)), columns=FEATURES)
+
+    threads = [threading.Thread(target=lambda: [registry.shadow(data, [0.5]) for _ in range(250)])
+               for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    stats = registry.stats()
+    assert stats['submitted'] == 4
+    assert stats['submitted'] + stats['dropped'] == 2000
@@ -0,0 +1,65 @@
+"""Similar-provider index: labels, nearest neighbours and the API limits around them"""
+
+import numpy as np
+import pandas as pd
+import pytest
+from fastapi.testclient import TestClient
+
+from feature_transformer import ProviderFeatureTransformer
+from provider_index import ProviderIndex
+
+FEATURES = ['ClaimCount', 'TotalReimbursed']
+
+
+@pytest.fixture
+def index():
+    index = ProviderIndex(ProviderFeatureTransformer(FEATURES), capacity=2)
+    index.add(pd.DataFrame({'Provider': ['A', 'B', 'C'], 'ClaimCount': [0.0, 1.0, 5.0],
+                            'TotalReimbursed': [0.0, 1.0, 5.0], 'PotentialFraud': ['Yes', 'No', 'Yes']}))
+    return index
+
+
+def test_nearest_neighbours_are_exact_and_filtered_by_label(index):
+    assert [n['provider'] for n in index.similar_to('A', k=2, label=None)] == ['B', 'C']
+    assert [n['provider'] for n in index.similar_to('A', k=2, label='Yes')] == ['C']
+    assert index.similar_to('A', k=1, label='Yes')[0]['distance'] == pytest.approx(np.sqrt(50))
+
+
+def test_rescoring_keeps_confirmed_labels(index):
+    index.add(pd.DataFrame({'Provider': ['A', 'D'], 'ClaimCount': [0.5, 2.0], 'TotalReimbursed': [0.5, 2.0]}),
+              probabilities=[0.9, 0.1])
+
+    labels = {n['provider']: n['label'] for n in index.similar_to('B', k=3, label=None)}
+    assert labels == {'A': 'Yes', 'D': None, 'C': 'Yes'}
+    assert index.stats()['unlabelled'] == 1
+
+
+def test_save_and_load_round_trip(index, tmp_path):
+    index.save(str(tmp_path / 'index.npz'))
+    loaded = ProviderIndex.load(str(tmp_path / 'index.npz'))
+
+    assert dict(loaded.stats(), capacity=None) == dict(index.stats(), capacity=None)
+    assert loaded.similar_to('A', k=3) == index.similar_to('A', k=3)
+    empty = ProviderIndex(ProviderFeatureTransformer(FEATURES))
+    empty.save(str(tmp_path / 'empty.npz'))
+    assert ProviderIndex.load(str(tmp_path / 'empty.npz')).size == 0
+
+
+@pytest.mark.parametrize('k, status', [(0, 422), (-1, 422), (10 ** 6, 422), (2, 200)])
+def test_similar_endpoint_bounds_k(app_module, index, monkeypatch, k, status):
+    monkeypatch.setattr(app_module, 'provider_index', index)
+    response = TestClient(app_module.app).get(f'/providers/A/similar?k={k}')
+    assert response.status_code == status
+
+
+def test_index_is_read_only_with_several_workers(app_module, index, monkeypatch):
+    monkeypatch.setattr(app_module, 'provider_index', index)
+    monkeypatch.setattr(app_module, 'PROVIDER_INDEX_WRITABLE', False)
+    monkeypatch.setenv('FRAUD_ADMIN_TOKEN', 'secret')
+
+    response = TestClient(app_module.app).post(
+        '/providers/index', headers={'X-Admin-Token': 'secret'},
+        json=[{'provider': 'E', 'features': {'ClaimCount': 1.0, 'TotalReimbursed': 1.0}}])
+
+    assert response.status_code == 409
+    assert index.vector('E') is None
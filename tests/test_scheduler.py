@@ -0,0 +1,82 @@
+"""Bulk tenants share the pool by weight, and interactive work always goes first"""
+
+import threading
+
+import pytest
+
+from scheduler import PriorityScheduler, parse_tenant_weights
+
+
+@pytest.fixture
+def scheduler():
+    scheduler = PriorityScheduler(workers=1, tenant_weights={'heavy': 2.0})
+    yield scheduler
+    scheduler.close()
+
+
+def hold_worker(scheduler):
+    """Park the only worker so everything submitted afterwards queues up; set the event to go"""
+    started, release = threading.Event(), threading.Event()
+    scheduler.submit_interactive(lambda: (started.set(), release.wait()))
+    assert started.wait(5)
+    return release
+
+
+def test_slices_are_shared_by_tenant_weight(scheduler):
+    order = []
+    release = hold_worker(scheduler)
+    futures = scheduler.submit_bulk('light', order.append, [['light']] * 6)
+    futures += scheduler.submit_bulk('heavy', order.append, [['heavy']] * 6)
+    release.set()
+    for future in futures:
+        future.result(timeout=5)
+
+    # Weight 2 gets two slices for every one of the default-weight tenant
+    assert [chunk[0] for chunk in order[:6]] == ['light', 'heavy', 'heavy', 'light', 'heavy', 'heavy']
+
+
+def test_interactive_work_jumps_the_bulk_queue(scheduler):
+    order = []
+    release = hold_worker(scheduler)
+    bulk = scheduler.submit_bulk('light', lambda chunk: order.append('bulk'), [[0]] * 3)
+    interactive = scheduler.submit_interactive(order.append, 'interactive')
+    release.set()
+    for future in bulk + [interactive]:
+        future.result(timeout=5)
+
+    assert order[0] == 'interactive'
+
+
+def test_idle_tenants_do_not_bank_credit():
+    scheduler = PriorityScheduler(workers=1, tenant_weights={'busy': 1.0, 'idle': 1.0})
+    scheduler.submit_bulk('busy', len, [[0]] * 4)[-1].result(timeout=5)
+
+    order = []
+    release = hold_worker(scheduler)
+    futures = scheduler.submit_bulk('busy', order.append, [['busy']] * 4)
+    futures += scheduler.submit_bulk('idle', order.append, [['idle']] * 4)
+    release.set()
+    for future in futures:
+        future.result(timeout=5)
+    scheduler.close()
+
+    # 'idle' joins at the current virtual time instead of claiming the slices it missed
+    assert [chunk[0] for chunk in order[:4]] == ['busy', 'idle', 'busy', 'idle']
+
+
+def test_unconfigured_tenants_are_forgotten_once_drained(scheduler):
+    for tenant in ('heavy', 'one-off'):
+        scheduler.submit_bulk(tenant, len, [[0]])[0].result(timeout=5)
+
+    assert set(scheduler._tenants) == {'heavy'}
+
+
+@pytest.mark.parametrize('spec', ['a', 'a=', '=2', 'a=x', 'a=0', 'a=-1', 'a=nan', 'a=inf'])
+def test_bad_tenant_weights_are_rejected(spec):
+    with pytest.raises(ValueError, match='FRAUD_BULK_TENANT_WEIGHTS'):
+        parse_tenant_weights(spec)
+
+
+def test_tenant_weights_parse():
+    assert parse_tenant_weights(' a=2, b=0.5 ,') == {'a': 2.0, 'b': 0.5}
+    assert parse_tenant_weights(None) == {}
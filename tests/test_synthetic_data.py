@@ -0,0 +1,39 @@
+"""Generated data must load at every scale and leave the models something to learn"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import synthetic_data
+from model import build_claim_frames
+
+CODE_COLUMNS = ['ClmAdmitDiagnosisCode'] + [f'ClmDiagnosisCode_{i}' for i in range(1, 11)]
+
+
+@pytest.mark.parametrize('scale', [0.001, 0.01, 0.03])
+def test_diagnosis_codes_read_back_as_strings(tmp_path, scale):
+    synthetic_data.generate(str(tmp_path), scale=scale)
+
+    for files in synthetic_data.SPLIT_FILES.values():
+        for table in ('inpatient', 'outpatient'):
+            claims = pd.read_csv(tmp_path / files[table])
+            assert (claims[CODE_COLUMNS].dtypes == object).all(), (files[table], claims[CODE_COLUMNS].dtypes)
+
+
+def test_claim_frames_build_at_small_scale(tmp_path):
+    synthetic_data.generate(str(tmp_path), scale=0.03)
+
+    train, test = build_claim_frames(str(tmp_path))
+
+    assert len(train) and len(test)
+    assert set(train['PotentialFraud'].unique()) == {0, 1}
+
+
+def test_labels_are_noisy_and_fraud_varies():
+    plan = synthetic_data.SplitPlan('train', scale=0.5, seed=42)
+
+    flipped = (plan.label != plan.fraud).mean()
+    assert 0 < flipped < 3 * synthetic_data.LABEL_NOISE
+    intensity = plan.intensity[plan.fraud]
+    assert intensity.min() < 0.6 and intensity.max() > 0.9
+    assert np.all(plan.intensity[~plan.fraud] == 0)